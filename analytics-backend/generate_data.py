@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Gerador vetorizado de dados sintéticos para o Analytics Backend
+Produz histórico de progresso e metas semanais de milhares de usuários
+(geradores em synthetic_data.py) e carrega tudo em massa no banco SQLite
+
+Uso:
+  python generate_data.py --users 5000 --days 730 --seed 42 --replace
+  python generate_data.py --db analytics.db --users 20000 --goals-per-week 3 --missing-rate 0.05
+
+O destino padrão é loadtest.db; gravar no banco da API exige `--db analytics.db`.
+A série nunca passa de hoje: ao continuar um histórico, só os dias que
+faltam até hoje são gerados.
+
+Execute com a API parada: triggers, índices e tabelas derivadas
+(goal_stats_*, progress_rollup_*) são removidos durante a carga e
+reconstruídos pela API no próximo start. Com `--replace`, os arquivos de
+shard de metas (`<db>_goals_<n>.db`) também são esvaziados.
+"""
+
+import argparse
+import glob
+import os
+import re
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+from typing import List, Optional
+
+import numpy as np
+
+from synthetic_data import generate_progress_history, generate_weekly_goals, goal_rows, progress_rows
+
+DEV_USER = "yasmin@fradema.com.br"
+
+# Tabelas base (as derivadas são criadas pela API em DatabaseManager.init_database)
+BASE_TABLES = ["""
+    CREATE TABLE IF NOT EXISTS weekly_goals (
+        id TEXT PRIMARY KEY,
+        week_start DATE NOT NULL,
+        week_end DATE NOT NULL,
+        description TEXT NOT NULL,
+        target_value REAL NOT NULL,
+        actual_value REAL,
+        completed BOOLEAN,
+        completed_date DATETIME,
+        created_by TEXT NOT NULL,
+        category TEXT DEFAULT 'general',
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+""", """
+    CREATE TABLE IF NOT EXISTS progress_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date DATE NOT NULL,
+        progress_value REAL NOT NULL,
+        daily_increment REAL,
+        week_number INTEGER,
+        month_number INTEGER,
+        goals_completed INTEGER DEFAULT 0,
+        notes TEXT,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+"""]
+
+# Mantidas pela API a partir das tabelas base; recriadas com backfill no start
+DERIVED_TABLES = ["goal_stats_weekly", "goal_stats_user", "progress_rollup_week", "progress_rollup_month"]
+
+PROGRESS_INSERT = """
+    INSERT INTO progress_history
+    (date, progress_value, daily_increment, week_number, month_number, goals_completed)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+GOALS_INSERT = """
+    INSERT INTO weekly_goals
+    (id, week_start, week_end, description, target_value, actual_value, completed,
+     completed_date, created_by, category, created_at, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+def _table_exists(cursor, table: str) -> bool:
+    cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    return cursor.fetchone()[0] > 0
+
+def prepare_bulk_load(conn: sqlite3.Connection, replace: bool):
+    """Deixa o banco pronto para a carga: só tabelas base, sem triggers nem índices secundários"""
+    cursor = conn.cursor()
+    for statement in BASE_TABLES:
+        cursor.execute(statement)
+
+    cursor.execute("""
+        SELECT type, name FROM sqlite_master
+        WHERE tbl_name IN ('progress_history', 'weekly_goals')
+          AND (type = 'trigger' OR (type = 'index' AND sql IS NOT NULL))
+    """)
+    for kind, name in cursor.fetchall():
+        cursor.execute(f"DROP {kind.upper()} IF EXISTS {name}")
+    for table in DERIVED_TABLES:
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+
+    if replace:
+        cursor.execute("DELETE FROM progress_history")
+        cursor.execute("DELETE FROM weekly_goals")
+        for table in ("progress_anomalies", "history_archive", "retention_state", "progress_rollup_archived",
+                      "goal_shard_map"):
+            if _table_exists(cursor, table):
+                cursor.execute(f"DELETE FROM {table}")
+
+    # A carga não passa pelos triggers do log de eventos: o 'reset' faz a API
+    # regravar a linha de base e os consumidores descartarem o estado derivado
+    if _table_exists(cursor, "event_log"):
+        cursor.execute(
+            "INSERT INTO event_log (stream, kind, origin) VALUES ('*', 'reset', 'bulk_load')"
+        )
+
+    # Força a reconstrução do cache colunar de progresso na API
+    if _table_exists(cursor, "data_versions"):
+        cursor.execute("UPDATE data_versions SET version = version + 1")
+
+def goal_shard_files(db_path: str) -> List[str]:
+    """Arquivos de shard de metas da API (`<base>_goals_<n>.db`, ANALYTICS_GOAL_SHARDS > 0)"""
+    base = os.path.splitext(db_path)[0]
+    pattern = re.compile(re.escape(base) + r"_goals_\d+\.db$")
+    return sorted(path for path in glob.glob(f"{glob.escape(base)}_goals_*.db") if pattern.match(path))
+
+def reset_goal_shard(path: str):
+    """Esvazia as metas de um shard como `--replace` faz no banco principal.
+
+    Sem isso a API, ao migrar as metas novas do banco principal para os shards,
+    somaria a elas as metas antigas que continuam nos arquivos de shard.
+    """
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN")
+        if _table_exists(cursor, "weekly_goals"):
+            cursor.execute("""
+                SELECT type, name FROM sqlite_master
+                WHERE tbl_name = 'weekly_goals'
+                  AND (type = 'trigger' OR (type = 'index' AND sql IS NOT NULL))
+            """)
+            for kind, name in cursor.fetchall():
+                cursor.execute(f"DROP {kind.upper()} IF EXISTS {name}")
+            cursor.execute("DELETE FROM weekly_goals")
+        for table in ("goal_stats_weekly", "goal_stats_user"):
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        if _table_exists(cursor, "event_log"):
+            cursor.execute(
+                "INSERT INTO event_log (stream, kind, origin) VALUES ('*', 'reset', 'bulk_load')"
+            )
+        cursor.execute("COMMIT")
+    except Exception:
+        cursor.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+def bulk_insert(conn: sqlite3.Connection, query: str, rows, chunk_size: int = 100_000) -> int:
+    total = 0
+    rows = iter(rows)
+    while True:
+        chunk = [row for _, row in zip(range(chunk_size), rows)]
+        if not chunk:
+            return total
+        conn.executemany(query, chunk)
+        total += len(chunk)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Gera e carrega dados sintéticos no banco de analytics")
+    parser.add_argument("--db", default="loadtest.db",
+                        help="Arquivo SQLite de destino (o banco da API é analytics.db)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=730, help="Dias de histórico de progresso")
+    parser.add_argument("--start", type=date.fromisoformat, default=None,
+                        help="Primeiro dia (padrão: continua a série existente ou `--days` atrás); "
+                             "a série termina no máximo hoje")
+    parser.add_argument("--initial", type=float, default=50.0, help="Progresso inicial")
+    parser.add_argument("--daily-mean", type=float, default=13.8)
+    parser.add_argument("--daily-std", type=float, default=3.0)
+    parser.add_argument("--weekend-factor", type=float, default=1.0)
+    parser.add_argument("--missing-rate", type=float, default=0.0, help="Fração de dias sem registro")
+    parser.add_argument("--anomaly-rate", type=float, default=0.0, help="Fração de dias com pico/queda")
+    parser.add_argument("--goals-per-week", type=float, default=2.0, help="Média de metas por usuário/semana")
+    parser.add_argument("--completion-rate", type=float, default=0.7)
+    parser.add_argument("--no-dev-user", action="store_true",
+                        help=f"Não incluir {DEV_USER} entre os usuários gerados")
+    parser.add_argument("--replace", action="store_true", help="Apaga histórico e metas existentes antes")
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    today = date.today()
+    if args.start is not None and args.start > today:
+        parser.error("--start não pode ser uma data futura")
+    started = time.perf_counter()
+
+    conn = sqlite3.connect(args.db, isolation_level=None)
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA cache_size = -262144")
+
+    try:
+        if args.replace:
+            # Antes da carga: se ela falhar, os shards ficam vazios em vez de
+            # com metas antigas que a migração duplicaria
+            for path in goal_shard_files(args.db):
+                reset_goal_shard(path)
+                print(f"🧹 Metas removidas do shard {path}")
+
+        conn.execute("BEGIN")
+        prepare_bulk_load(conn, args.replace)
+
+        start, initial = args.start, args.initial
+        if start is None:
+            last = conn.execute(
+                "SELECT date, progress_value FROM progress_history ORDER BY date DESC, id DESC LIMIT 1"
+            ).fetchone()
+            if last:
+                start, initial = date.fromisoformat(last[0]) + timedelta(days=1), last[1]
+            else:
+                start = today - timedelta(days=args.days - 1)
+
+        # Nunca gera dias depois de hoje
+        days = min(args.days, (today - start).days + 1)
+        if days <= 0:
+            conn.execute("ROLLBACK")
+            conn.close()
+            print(f"ℹ️ O histórico já chega a {start - timedelta(days=1)}; nada a gerar")
+            return 0
+
+        users = [f"user{i:06d}@loadtest.local" for i in range(args.users)]
+        if not args.no_dev_user and users:
+            users[0] = DEV_USER
+
+        progress = generate_progress_history(
+            rng, start, days, initial=initial, daily_mean=args.daily_mean, daily_std=args.daily_std,
+            weekend_factor=args.weekend_factor, missing_rate=args.missing_rate, anomaly_rate=args.anomaly_rate,
+        )
+        weeks = (days + start.weekday()) // 7 + 1
+        goals = generate_weekly_goals(
+            rng, users, start, weeks, today=today,
+            goals_per_week=args.goals_per_week, completion_rate=args.completion_rate,
+        )
+        generated = time.perf_counter()
+        print(f"🧮 Gerados {len(progress['day'])} dias de progresso e {len(goals['id'])} metas "
+              f"de {len(users)} usuários em {generated - started:.2f}s")
+
+        progress_count = bulk_insert(conn, PROGRESS_INSERT, progress_rows(progress), args.chunk_size)
+        goals_count = bulk_insert(conn, GOALS_INSERT, goal_rows(goals), args.chunk_size)
+        conn.execute("COMMIT")
+    except Exception as e:
+        conn.execute("ROLLBACK")
+        print(f"❌ Erro na carga: {e}")
+        return 1
+
+    conn.execute("ANALYZE")
+    conn.close()
+
+    elapsed = time.perf_counter() - generated
+    total = progress_count + goals_count
+    print(f"✅ {progress_count} registros de progresso e {goals_count} metas carregados em {elapsed:.2f}s "
+          f"({total / max(elapsed, 1e-9):,.0f} linhas/s)")
+    print("ℹ️ Agregados, rollups e índices serão reconstruídos no próximo start da API")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Gerador de carga assíncrono para o Analytics Backend
+Reproduz o tráfego do dashboard (WeeklyGoalsManager.tsx) contra uma API local
+e reporta vazão, latência p50/p95/p99 e taxa de erros por endpoint
+
+Uso:
+  uvicorn main:app --port 8000 --workers 1   # em outro terminal
+  python loadtest.py --users 50 --ramp 20 --duration 120
+  python loadtest.py --mix dashboard=4,create=1,complete=1,insights=2 --auth basic --json report.json
+
+Cada usuário virtual repete ações sorteadas pelo `--mix`, com pausas
+exponenciais de média `--think-time`:
+  dashboard  GET /api/analytics + GET /api/weekly-goals em paralelo (carga da página)
+  create     POST /api/weekly-goals e recarga do dashboard
+  complete   PUT /api/weekly-goals/complete de uma meta conhecida e recarga do dashboard
+  insights   GET /api/ml-insights
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import random
+import sys
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - dependência só do teste de carga
+    httpx = None
+
+# Credenciais de desenvolvimento aceitas por verify_user
+DEV_USER = "yasmin@fradema.com.br"
+DEV_PASSWORD = "fda@2016"
+DEV_TOKEN = "yasmin-token"
+
+DEFAULT_MIX = "dashboard=6,create=1,complete=2,insights=1"
+
+def auth_headers(scheme: str) -> Dict[str, str]:
+    if scheme == "bearer":
+        return {"Authorization": f"Bearer {DEV_TOKEN}"}
+    token = base64.b64encode(f"{DEV_USER}:{DEV_PASSWORD}".encode()).decode()
+    return {"Authorization": f"Basic {token}"}
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in ("dashboard", "create", "complete", "insights"):
+            raise argparse.ArgumentTypeError(f"Ação desconhecida no mix: {name}")
+        mix[name.strip()] = float(weight or 1)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("O mix precisa de ao menos uma ação com peso > 0")
+    return mix
+
+class Stats:
+    """Latências e status por endpoint"""
+
+    def __init__(self):
+        self.endpoints: Dict[str, Dict[str, Any]] = {}
+
+    def _entry(self, name: str) -> Dict[str, Any]:
+        return self.endpoints.setdefault(name, {"latencies": [], "status": {}, "errors": 0, "degraded": 0})
+
+    def record(self, name: str, seconds: float, status: Any, error: bool, degraded: bool = False):
+        entry = self._entry(name)
+        entry["latencies"].append(seconds)
+        entry["status"][str(status)] = entry["status"].get(str(status), 0) + 1
+        entry["errors"] += error
+        entry["degraded"] += degraded
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        rows = {}
+        all_latencies: List[float] = []
+        errors = degraded = 0
+        for name, entry in sorted(self.endpoints.items()):
+            rows[name] = summarize(np.array(entry["latencies"]), entry["errors"], entry["degraded"], elapsed)
+            rows[name]["status"] = entry["status"]
+            all_latencies += entry["latencies"]
+            errors += entry["errors"]
+            degraded += entry["degraded"]
+        overall = summarize(np.array(all_latencies), errors, degraded, elapsed)
+        return {"elapsed_seconds": round(elapsed, 3), "endpoints": rows, "total": overall}
+
+def summarize(latencies: np.ndarray, errors: int, degraded: int, elapsed: float) -> Dict[str, Any]:
+    count = len(latencies)
+    if count:
+        p50, p95, p99 = (float(v) * 1000 for v in np.percentile(latencies, [50, 95, 99]))
+        max_ms = float(latencies.max()) * 1000
+    else:
+        p50 = p95 = p99 = max_ms = 0.0
+    return {
+        "requests": count,
+        "rps": round(count / max(elapsed, 1e-9), 2),
+        "p50_ms": round(p50, 1),
+        "p95_ms": round(p95, 1),
+        "p99_ms": round(p99, 1),
+        "max_ms": round(max_ms, 1),
+        "errors": errors,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+        "degraded": degraded,
+    }
+
+class VirtualUser:
+    """Sessão de dashboard de um usuário, com as metas que ele conhece"""
+
+    def __init__(self, client: "httpx.AsyncClient", stats: Stats, scheme: str, rng: random.Random):
+        self.client = client
+        self.stats = stats
+        self.headers = auth_headers(scheme)
+        self.rng = rng
+        self.goal_ids: List[str] = []
+
+    async def request(self, name: str, method: str, path: str, **kwargs) -> Optional["httpx.Response"]:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, headers=self.headers, **kwargs)
+        except httpx.HTTPError as e:
+            self.stats.record(name, time.perf_counter() - started, type(e).__name__, True)
+            return None
+        elapsed = time.perf_counter() - started
+        degraded = response.headers.get("X-Analytics-Degraded") == "1"
+        self.stats.record(name, elapsed, response.status_code, response.status_code >= 400, degraded)
+        return response
+
+    async def dashboard(self):
+        # O frontend carrega analytics e metas em paralelo (Promise.all)
+        _, goals = await asyncio.gather(
+            self.request("GET /api/analytics", "GET", "/api/analytics"),
+            self.request("GET /api/weekly-goals", "GET", "/api/weekly-goals"),
+        )
+        if goals is not None and goals.status_code == 200:
+            ids = [goal["id"] for goal in goals.json().get("goals", []) if not goal.get("completed")]
+            if ids:
+                self.goal_ids = ids
+
+    async def create(self):
+        week_start = date.today() - timedelta(days=date.today().weekday())
+        response = await self.request("POST /api/weekly-goals", "POST", "/api/weekly-goals", json={
+            "week_start": week_start.isoformat(),
+            "week_end": (week_start + timedelta(days=6)).isoformat(),
+            "description": f"Meta de carga {self.rng.randrange(10**6)}",
+            "target_value": round(self.rng.uniform(10, 200), 1),
+            "category": self.rng.choice(["general", "work", "study", "health"]),
+            "created_by": DEV_USER,
+        })
+        if response is not None and response.status_code == 200:
+            self.goal_ids.append(response.json()["goal_id"])
+            await self.dashboard()
+
+    async def complete(self):
+        if not self.goal_ids:
+            await self.dashboard()
+            return
+        goal_id = self.goal_ids.pop(self.rng.randrange(len(self.goal_ids)))
+        response = await self.request("PUT /api/weekly-goals/complete", "PUT", "/api/weekly-goals/complete", json={
+            "goal_id": goal_id,
+            "completed": True,
+            "actual_value": round(self.rng.uniform(5, 200), 1),
+        })
+        if response is not None and response.status_code == 200:
+            await self.dashboard()
+
+    async def insights(self):
+        await self.request("GET /api/ml-insights", "GET", "/api/ml-insights")
+
+    async def run(self, mix: Dict[str, float], deadline: float, think_time: float):
+        actions = list(mix)
+        weights = [mix[action] for action in actions]
+        await self.dashboard()
+        while time.perf_counter() < deadline:
+            await getattr(self, self.rng.choices(actions, weights)[0])()
+            if think_time > 0:
+                await asyncio.sleep(min(self.rng.expovariate(1 / think_time), max(0.0, deadline - time.perf_counter())))
+
+async def run_load(args: argparse.Namespace) -> Dict[str, Any]:
+    stats = Stats()
+    schemes = ["bearer", "basic"] if args.auth == "mixed" else [args.auth]
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        try:
+            await client.get("/")
+        except httpx.HTTPError as e:
+            raise RuntimeError(f"API indisponível em {args.base_url}: {e}")
+
+        started = time.perf_counter()
+        deadline = started + args.ramp + args.duration
+
+        async def start_user(index: int):
+            # Rampa linear: o usuário `index` entra em index/users * ramp segundos
+            await asyncio.sleep(args.ramp * index / args.users)
+            user = VirtualUser(client, stats, schemes[index % len(schemes)], random.Random(args.seed + index))
+            await user.run(args.mix, deadline, args.think_time)
+
+        await asyncio.gather(*(start_user(i) for i in range(args.users)))
+        elapsed = time.perf_counter() - started
+
+    report = stats.report(elapsed)
+    report["config"] = {
+        "base_url": args.base_url, "users": args.users, "ramp": args.ramp, "duration": args.duration,
+        "think_time": args.think_time, "auth": args.auth, "mix": args.mix, "seed": args.seed,
+    }
+    return report
+
+def print_report(report: Dict[str, Any]):
+    header = f"{'endpoint':<34}{'req':>7}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'erros':>8}{'degr.':>7}"
+    print(f"\n📊 Resultado em {report['elapsed_seconds']:.1f}s")
+    print(header)
+    print("-" * len(header))
+    rows = list(report["endpoints"].items()) + [("TOTAL", report["total"])]
+    for name, row in rows:
+        print(f"{name:<34}{row['requests']:>7}{row['rps']:>9.1f}{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}"
+              f"{row['p99_ms']:>9.1f}{row['error_rate'] * 100:>7.2f}%{row['degraded']:>7}")
+    for name, row in report["endpoints"].items():
+        failures = {status: count for status, count in row["status"].items() if not status.startswith(("2", "3"))}
+        if failures:
+            print(f"⚠️ {name}: {failures}")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Teste de carga com o tráfego do dashboard de analytics")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--users", type=int, default=20, help="Usuários virtuais simultâneos")
+    parser.add_argument("--ramp", type=float, default=10.0, help="Segundos até todos os usuários entrarem")
+    parser.add_argument("--duration", type=float, default=60.0, help="Segundos de carga plena após a rampa")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Pausa média entre ações (s)")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"Pesos das ações (padrão: {DEFAULT_MIX})")
+    parser.add_argument("--auth", choices=["bearer", "basic", "mixed"], default="mixed",
+                        help="Esquema de autenticação (mixed alterna entre usuários)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Timeout por requisição (s)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="Grava o relatório completo neste arquivo")
+    parser.add_argument("--max-error-rate", type=float, default=None,
+                        help="Sai com código 1 se a taxa total de erros passar deste valor")
+    args = parser.parse_args(argv)
+
+    if httpx is None:
+        print("❌ O teste de carga requer httpx (pip install httpx)")
+        return 1
+    if args.users < 1:
+        parser.error("--users deve ser >= 1")
+
+    print(f"🚀 {args.users} usuários, rampa de {args.ramp:.0f}s, {args.duration:.0f}s de carga contra {args.base_url}")
+    try:
+        report = asyncio.run(run_load(args))
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return 1
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Relatório gravado em {args.json}")
+
+    if args.max_error_rate is not None and report["total"]["error_rate"] > args.max_error_rate:
+        print(f"❌ Taxa de erros {report['total']['error_rate']:.2%} acima do limite {args.max_error_rate:.2%}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
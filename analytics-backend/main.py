@@ -4,7 +4,8 @@ Analytics Backend com Machine Learning para o Futuristic Dashboard
 Sistema avançado de previsão e análise de progresso até os 7k
 """
 
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Request, status
+from fastapi.responses import StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import (
     HTTPBearer,
@@ -15,26 +16,50 @@ from fastapi.security import (
 import secrets
 from pydantic import BaseModel, Field
 from datetime import datetime, timedelta, date
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple, Callable
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-from sklearn.linear_model import LinearRegression
+from sklearn.linear_model import LinearRegression, Ridge
+from sklearn.dummy import DummyRegressor
+from sklearn.base import clone
 from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, r2_score
 import joblib
 import logging
+import os
+import sys
+import gc
+import copy
+import tracemalloc
 import sqlite3
-from contextlib import asynccontextmanager
+import threading
+import time
+import json
+import math
+import re
+import zlib
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from concurrent.futures import ThreadPoolExecutor
 import asyncio
 import warnings
+from synthetic_data import generate_progress_history, progress_rows
 warnings.filterwarnings('ignore')
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Objetivo: 7k até o fim de 2025
+PROJECT_START_DATE = date(2025, 8, 10)
+TARGET_PROGRESS = 7000.0
+TARGET_DEADLINE = date(2025, 12, 31)
+# Campanha de 508 dias até o prazo: 7000/508 ≈ 13,8 por dia
+TARGET_TOTAL_DAYS = 508
+TARGET_DAILY_PROGRESS = round(TARGET_PROGRESS / TARGET_TOTAL_DAYS, 1)
+
 # Helpers to convert numpy/pandas scalars to native Python types
 def _to_native(value):
     try:
@@ -65,99 +90,3169 @@ class WeeklyGoal(BaseModel):
     created_by: str
     category: str = "general"
 
-class GoalCompletion(BaseModel):
-    goal_id: str
-    completed: bool
-    actual_value: Optional[float] = None
-    notes: Optional[str] = None
+class GoalCompletion(BaseModel):
+    goal_id: str
+    completed: bool
+    actual_value: Optional[float] = None
+    notes: Optional[str] = None
+
+class MLPrediction(BaseModel):
+    predicted_progress: float
+    confidence_interval: Dict[str, float]
+    success_probability: float
+    recommendations: List[str]
+    risk_factors: List[str]
+    optimal_weekly_target: float
+    feature_contributions: Optional[Dict[str, Any]] = None
+
+class JobRequest(BaseModel):
+    kind: str
+    params: Dict[str, Any] = Field(default_factory=dict)
+
+class AnalyticsResponse(BaseModel):
+    current_progress: float
+    ml_prediction: MLPrediction
+    weekly_performance: Dict[str, Any]
+    trends: Dict[str, Any]
+    kpi_analysis: Dict[str, Any]
+    goal_completion_rate: float
+    # Resposta reduzida servida sob sobrecarga (previsão de fallback, KPIs em cache)
+    degraded: bool = False
+    degraded_reason: Optional[str] = None
+    # Quando KPIs e tendências foram calculados (na degradada, os da última análise)
+    computed_at: Optional[datetime] = None
+
+# Database Setup
+GOAL_STATS_TABLES = ["""
+    CREATE TABLE IF NOT EXISTS goal_stats_weekly (
+        created_by TEXT NOT NULL,
+        week_start DATE NOT NULL,
+        goals_set INTEGER NOT NULL DEFAULT 0,
+        goals_completed INTEGER NOT NULL DEFAULT 0,
+        target_sum REAL NOT NULL DEFAULT 0,
+        actual_sum REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (created_by, week_start)
+    )
+""", """
+    CREATE TABLE IF NOT EXISTS goal_stats_user (
+        created_by TEXT PRIMARY KEY,
+        goals_set INTEGER NOT NULL DEFAULT 0,
+        goals_completed INTEGER NOT NULL DEFAULT 0,
+        target_sum REAL NOT NULL DEFAULT 0,
+        actual_sum REAL NOT NULL DEFAULT 0
+    )
+"""]
+
+# Sharding das metas por usuário: o mapa usuário -> shard fica no banco
+# principal; cada shard é um arquivo SQLite com weekly_goals e goal_stats_*
+GOAL_SHARD_MAP_TABLE = """
+    CREATE TABLE IF NOT EXISTS goal_shard_map (
+        user_email TEXT PRIMARY KEY,
+        shard INTEGER NOT NULL,
+        assigned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+GOAL_COLUMNS = [
+    "id", "week_start", "week_end", "description", "target_value", "actual_value", "completed",
+    "completed_date", "created_by", "category", "created_at", "updated_at",
+]
+
+# Log de eventos append-only das tabelas de metas e progresso. Cada banco
+# (principal e shards) tem o seu, alimentado por triggers na mesma transação
+# da escrita; event_log_context.origin marca escritas de manutenção
+# ('move', 'archive', 'baseline') para os consumidores
+PROGRESS_COLUMNS = [
+    "id", "date", "progress_value", "daily_increment", "week_number", "month_number",
+    "goals_completed", "notes", "created_at",
+]
+
+# tabela -> (stream, coluna do usuário, colunas do payload)
+EVENT_STREAMS = {
+    "weekly_goals": ("goals", "created_by", GOAL_COLUMNS),
+    "progress_history": ("progress", None, PROGRESS_COLUMNS),
+}
+
+def _event_log_tables(serial_primary_key: str) -> List[str]:
+    return [f"""
+        CREATE TABLE IF NOT EXISTS event_log (
+            seq {serial_primary_key},
+            stream TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            entity_id TEXT,
+            user_email TEXT,
+            origin TEXT,
+            payload TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """, """
+        CREATE TABLE IF NOT EXISTS event_log_context (
+            name TEXT PRIMARY KEY,
+            value TEXT
+        )
+    """, """
+        CREATE TABLE IF NOT EXISTS event_checkpoints (
+            consumer TEXT NOT NULL,
+            log_partition INTEGER NOT NULL,
+            seq INTEGER NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (consumer, log_partition)
+        )
+    """, """
+        CREATE TABLE IF NOT EXISTS event_snapshot (
+            stream TEXT NOT NULL,
+            entity_id TEXT NOT NULL,
+            user_email TEXT,
+            payload TEXT,
+            PRIMARY KEY (stream, entity_id)
+        )
+    """]
+
+EVENT_ORIGIN_SQL = "(SELECT value FROM event_log_context WHERE name = 'origin')"
+
+@contextmanager
+def event_origin(cursor, origin: str):
+    """Marca com `origin` os eventos gerados por `cursor` dentro do bloco.
+
+    Deve rodar dentro de uma transação já aberta: o valor volta a NULL antes
+    do commit, então outras conexões nunca o enxergam.
+    """
+    reset = "UPDATE event_log_context SET value = NULL WHERE name = 'origin'"
+    cursor.execute("UPDATE event_log_context SET value = ? WHERE name = 'origin'", (origin,))
+    try:
+        yield
+    except BaseException:
+        # Quem captura a exceção pode ainda assim fazer commit (no SQLite a
+        # transação segue válida); no PostgreSQL ela já está abortada e o
+        # rollback descarta o valor
+        try:
+            cursor.execute(reset)
+        except Exception:
+            pass
+        raise
+    cursor.execute(reset)
+
+# Contadores de versão por tabela: 'progress_history' muda a cada escrita,
+# 'progress_history_rewrites' só em UPDATE/DELETE (quando caches append-only
+# precisam ser reconstruídos)
+DATA_VERSIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS data_versions (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    )
+"""
+
+DATA_VERSION_NAMES = ["progress_history", "progress_history_rewrites"]
+
+# Contador de escritas em weekly_goals, um por banco de metas (shard ou o
+# principal): entra nas chaves dos caches de analytics, inclusive entre processos
+GOAL_VERSION_NAME = "weekly_goals"
+
+# Linha de data_versions com um identificador aleatório gravado na criação do
+# banco: distingue um banco recriado cujos contadores recomeçaram do zero
+DB_INSTANCE_NAME = "db_instance"
+
+# Versões que o cache colunar de progresso acompanha
+PROGRESS_VERSION_NAMES = DATA_VERSION_NAMES + [DB_INSTANCE_NAME]
+
+def _goal_stats_upsert(row: str, sign: str) -> str:
+    """SQL que soma (sign='') ou subtrai (sign='-') uma linha de weekly_goals dos agregados"""
+    completed = f"CASE WHEN {row}.completed THEN 1 ELSE 0 END"
+    actual = f"COALESCE({row}.actual_value, 0)"
+    return f"""
+        INSERT INTO goal_stats_weekly
+            (created_by, week_start, goals_set, goals_completed, target_sum, actual_sum)
+        VALUES ({row}.created_by, {row}.week_start, {sign}1, {sign}{completed},
+                {sign}{row}.target_value, {sign}{actual})
+        ON CONFLICT(created_by, week_start) DO UPDATE SET
+            goals_set = goal_stats_weekly.goals_set + excluded.goals_set,
+            goals_completed = goal_stats_weekly.goals_completed + excluded.goals_completed,
+            target_sum = goal_stats_weekly.target_sum + excluded.target_sum,
+            actual_sum = goal_stats_weekly.actual_sum + excluded.actual_sum;
+        INSERT INTO goal_stats_user
+            (created_by, goals_set, goals_completed, target_sum, actual_sum)
+        VALUES ({row}.created_by, {sign}1, {sign}{completed},
+                {sign}{row}.target_value, {sign}{actual})
+        ON CONFLICT(created_by) DO UPDATE SET
+            goals_set = goal_stats_user.goals_set + excluded.goals_set,
+            goals_completed = goal_stats_user.goals_completed + excluded.goals_completed,
+            target_sum = goal_stats_user.target_sum + excluded.target_sum,
+            actual_sum = goal_stats_user.actual_sum + excluded.actual_sum;
+    """
+
+# Retenção: partições mensais comprimidas das linhas antigas e estado das
+# tarefas de manutenção ('archived_before' é a marca d'água do arquivamento)
+def _retention_tables(binary_type: str) -> List[str]:
+    return [f"""
+        CREATE TABLE IF NOT EXISTS history_archive (
+            source TEXT NOT NULL,
+            partition_start DATE NOT NULL,
+            row_count INTEGER NOT NULL,
+            first_date DATE,
+            last_date DATE,
+            payload {binary_type} NOT NULL,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (source, partition_start)
+        )
+    """, """
+        CREATE TABLE IF NOT EXISTS retention_state (
+            name TEXT PRIMARY KEY,
+            archived_before DATE,
+            last_run TIMESTAMP
+        )
+    """, """
+        CREATE TABLE IF NOT EXISTS progress_rollup_archived (
+            granularity TEXT NOT NULL,
+            period_start DATE NOT NULL,
+            increment_sum REAL NOT NULL DEFAULT 0,
+            increment_count INTEGER NOT NULL DEFAULT 0,
+            increment_min REAL,
+            increment_max REAL,
+            last_date DATE,
+            last_progress REAL,
+            goals_completed INTEGER NOT NULL DEFAULT 0,
+            days INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (granularity, period_start)
+        )
+    """]
+
+# Períodos de rollup que terminam até a marca d'água estão inteiramente arquivados e
+# ficam congelados (o DELETE do arquivamento não pode zerá-los). O período que
+# a atravessa é recalculado com as linhas quentes mais a parte arquivada,
+# guardada em progress_rollup_archived
+ARCHIVE_WATERMARK_SQL = (
+    "COALESCE((SELECT archived_before FROM retention_state "
+    "WHERE name = 'progress_history'), '0001-01-01')"
+)
+
+# Rollups semanais/mensais de progress_history
+ROLLUP_GRANULARITIES = ["week", "month"]
+
+def _rollup_table(granularity: str) -> str:
+    return f"""
+        CREATE TABLE IF NOT EXISTS progress_rollup_{granularity} (
+            period_start DATE PRIMARY KEY,
+            increment_sum REAL NOT NULL DEFAULT 0,
+            increment_count INTEGER NOT NULL DEFAULT 0,
+            increment_min REAL,
+            increment_max REAL,
+            last_date DATE,
+            last_progress REAL,
+            goals_completed INTEGER NOT NULL DEFAULT 0,
+            days INTEGER NOT NULL DEFAULT 0
+        )
+    """
+
+def _rollup_insert_sql(granularity: str, start: str) -> str:
+    """Soma uma linha nova (NEW) ao rollup do período `start`"""
+    table = f"progress_rollup_{granularity}"
+    return f"""
+        INSERT INTO {table}
+            (period_start, increment_sum, increment_count, increment_min, increment_max,
+             last_date, last_progress, goals_completed, days)
+        VALUES ({start}, COALESCE(NEW.daily_increment, 0),
+                CASE WHEN NEW.daily_increment IS NULL THEN 0 ELSE 1 END,
+                NEW.daily_increment, NEW.daily_increment, NEW.date, NEW.progress_value,
+                COALESCE(NEW.goals_completed, 0), 1)
+        ON CONFLICT(period_start) DO UPDATE SET
+            increment_sum = {table}.increment_sum + excluded.increment_sum,
+            increment_count = {table}.increment_count + excluded.increment_count,
+            increment_min = CASE WHEN {table}.increment_min IS NULL
+                                   OR excluded.increment_min < {table}.increment_min
+                                 THEN excluded.increment_min ELSE {table}.increment_min END,
+            increment_max = CASE WHEN {table}.increment_max IS NULL
+                                   OR excluded.increment_max > {table}.increment_max
+                                 THEN excluded.increment_max ELSE {table}.increment_max END,
+            last_progress = CASE WHEN excluded.last_date >= {table}.last_date
+                                 THEN excluded.last_progress ELSE {table}.last_progress END,
+            last_date = CASE WHEN excluded.last_date >= {table}.last_date
+                             THEN excluded.last_date ELSE {table}.last_date END,
+            goals_completed = {table}.goals_completed + excluded.goals_completed,
+            days = {table}.days + 1;
+    """
+
+def _rollup_recompute_sql(granularity: str, start: str, end: str) -> str:
+    """Recalcula um período a partir de progress_history e da parte já
+    arquivada do período (usado em UPDATE/DELETE)"""
+    table = f"progress_rollup_{granularity}"
+    archived = f"progress_rollup_archived WHERE granularity = '{granularity}' AND period_start = {start}"
+    return f"""
+        DELETE FROM {table} WHERE period_start = {start} AND {end} > {ARCHIVE_WATERMARK_SQL};
+        INSERT INTO {table}
+            (period_start, increment_sum, increment_count, increment_min, increment_max,
+             last_date, last_progress, goals_completed, days)
+        SELECT {start}, COALESCE(SUM(increment_sum), 0), COALESCE(SUM(increment_count), 0),
+               MIN(increment_min), MAX(increment_max), MAX(last_date),
+               COALESCE((SELECT p.progress_value FROM progress_history p
+                         WHERE p.date >= {start} AND p.date < {end}
+                         ORDER BY p.date DESC, p.id DESC LIMIT 1),
+                        (SELECT last_progress FROM {archived})),
+               COALESCE(SUM(goals_completed), 0), COALESCE(SUM(days), 0)
+        FROM (
+            SELECT COALESCE(SUM(daily_increment), 0) AS increment_sum,
+                   COUNT(daily_increment) AS increment_count,
+                   MIN(daily_increment) AS increment_min, MAX(daily_increment) AS increment_max,
+                   MAX(date) AS last_date, COALESCE(SUM(goals_completed), 0) AS goals_completed,
+                   COUNT(*) AS days
+            FROM progress_history
+            WHERE date >= {start} AND date < {end}
+            UNION ALL
+            SELECT increment_sum, increment_count, increment_min, increment_max,
+                   last_date, goals_completed, days
+            FROM {archived}
+        ) parts
+        HAVING COALESCE(SUM(days), 0) > 0 AND {end} > {ARCHIVE_WATERMARK_SQL};
+    """
+
+class StorageBackend:
+    """Interface dos motores de armazenamento usados pelo DatabaseManager.
+
+    As consultas do serviço usam o estilo de parâmetro `?` do SQLite; cada
+    backend é responsável por entregar conexões DB-API que aceitem esse estilo.
+    """
+
+    name = "base"
+    errors: tuple = ()
+    binary_type = "BLOB"
+    serial_primary_key = "INTEGER PRIMARY KEY AUTOINCREMENT"
+
+    def connect(self):
+        raise NotImplementedError
+
+    def schema_statements(self) -> List[str]:
+        """DDL das tabelas principais"""
+        raise NotImplementedError
+
+    def goal_stats_triggers(self) -> List[str]:
+        """Triggers que mantêm goal_stats_* em sincronia com weekly_goals"""
+        raise NotImplementedError
+
+    def data_version_triggers(self) -> List[str]:
+        """Triggers que incrementam data_versions a cada escrita em progress_history"""
+        raise NotImplementedError
+
+    def goal_version_triggers(self) -> List[str]:
+        """Triggers que incrementam a versão de weekly_goals em data_versions"""
+        raise NotImplementedError
+
+    def event_payload_sql(self, table: str, alias: str) -> str:
+        """Expressão SQL com a linha `alias` de `table` serializada em JSON"""
+        raise NotImplementedError
+
+    def event_log_triggers(self, table: str) -> List[str]:
+        """Triggers que anexam ao event_log cada INSERT/UPDATE/DELETE em `table`"""
+        raise NotImplementedError
+
+    def period_bounds(self, expr: str, granularity: str) -> Tuple[str, str]:
+        """SQL do início do período (semana ISO/mês) de `expr` e do início do seguinte"""
+        raise NotImplementedError
+
+    def rollup_triggers(self) -> List[str]:
+        """Triggers que mantêm progress_rollup_* em sincronia com progress_history"""
+        raise NotImplementedError
+
+    def table_exists(self, cursor, table: str) -> bool:
+        raise NotImplementedError
+
+    def analyze(self, tables: List[str]):
+        """Atualiza as estatísticas do planejador (fora de transação)"""
+        raise NotImplementedError
+
+    def vacuum(self, tables: List[str]):
+        """Devolve ao sistema o espaço das linhas removidas (fora de transação)"""
+        raise NotImplementedError
+
+    def begin(self, cursor):
+        """Abre uma transação explícita"""
+        cursor.execute("BEGIN")
+
+    def read_dataframe(self, conn, query: str, params: tuple = ()) -> pd.DataFrame:
+        return pd.read_sql_query(query, conn, params=params)
+
+    def close(self):
+        pass
+
+class SQLiteBackend(StorageBackend):
+    """Arquivo SQLite local (padrão)"""
+
+    name = "sqlite"
+    errors = (sqlite3.Error,)
+
+    def __init__(self, db_path: str = "analytics.db"):
+        self.db_path = db_path
+
+    def connect(self):
+        return sqlite3.connect(self.db_path)
+
+    def goal_schema_statements(self) -> List[str]:
+        """DDL de weekly_goals (também usada nos arquivos de shard)"""
+        return [
+            # Tabela de metas semanais
+            """
+            CREATE TABLE IF NOT EXISTS weekly_goals (
+                id TEXT PRIMARY KEY,
+                week_start DATE NOT NULL,
+                week_end DATE NOT NULL,
+                description TEXT NOT NULL,
+                target_value REAL NOT NULL,
+                actual_value REAL,
+                completed BOOLEAN,
+                completed_date DATETIME,
+                created_by TEXT NOT NULL,
+                category TEXT DEFAULT 'general',
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+        ]
+
+    def schema_statements(self) -> List[str]:
+        return self.goal_schema_statements() + [
+            # Tabela de histórico de progresso
+            """
+            CREATE TABLE IF NOT EXISTS progress_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                date DATE NOT NULL,
+                progress_value REAL NOT NULL,
+                daily_increment REAL,
+                week_number INTEGER,
+                month_number INTEGER,
+                goals_completed INTEGER DEFAULT 0,
+                notes TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            # Tabela de previsões ML
+            """
+            CREATE TABLE IF NOT EXISTS ml_predictions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                prediction_date DATE NOT NULL,
+                predicted_final_value REAL,
+                confidence_score REAL,
+                model_used TEXT,
+                features_used TEXT,
+                actual_progress REAL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+        ]
+
+    def goal_stats_triggers(self) -> List[str]:
+        return [
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_goal_stats_insert
+            AFTER INSERT ON weekly_goals
+            BEGIN {_goal_stats_upsert('NEW', '')} END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_goal_stats_delete
+            AFTER DELETE ON weekly_goals
+            BEGIN {_goal_stats_upsert('OLD', '-')} END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_goal_stats_update
+            AFTER UPDATE OF week_start, target_value, actual_value, completed, created_by
+            ON weekly_goals
+            BEGIN {_goal_stats_upsert('OLD', '-')} {_goal_stats_upsert('NEW', '')} END
+            """,
+        ]
+
+    def data_version_triggers(self) -> List[str]:
+        bump = "UPDATE data_versions SET version = version + 1 WHERE name = '{}';"
+        return [
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_progress_version_insert
+            AFTER INSERT ON progress_history
+            BEGIN {bump.format('progress_history')} END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_progress_version_update
+            AFTER UPDATE ON progress_history
+            BEGIN {bump.format('progress_history')} {bump.format('progress_history_rewrites')} END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_progress_version_delete
+            AFTER DELETE ON progress_history
+            BEGIN {bump.format('progress_history')} {bump.format('progress_history_rewrites')} END
+            """,
+        ]
+
+    def goal_version_triggers(self) -> List[str]:
+        bump = f"UPDATE data_versions SET version = version + 1 WHERE name = '{GOAL_VERSION_NAME}';"
+        return [
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_goal_version_{kind}
+            AFTER {kind.upper()} ON weekly_goals
+            BEGIN {bump} END
+            """
+            for kind in ("insert", "update", "delete")
+        ]
+
+    def event_payload_sql(self, table: str, alias: str) -> str:
+        _, _, columns = EVENT_STREAMS[table]
+        return "json_object(" + ", ".join(f"'{column}', {alias}.{column}" for column in columns) + ")"
+
+    def event_log_triggers(self, table: str) -> List[str]:
+        stream, user_column, _ = EVENT_STREAMS[table]
+        statements = []
+        for kind, row in (("insert", "NEW"), ("update", "NEW"), ("delete", "OLD")):
+            user = f"{row}.{user_column}" if user_column else "NULL"
+            statements += [
+                f"DROP TRIGGER IF EXISTS trg_event_{table}_{kind}",
+                f"""
+                CREATE TRIGGER trg_event_{table}_{kind}
+                AFTER {kind.upper()} ON {table}
+                BEGIN
+                    INSERT INTO event_log (stream, kind, entity_id, user_email, origin, payload)
+                    VALUES ('{stream}', '{kind}', {row}.id, {user}, {EVENT_ORIGIN_SQL},
+                            {self.event_payload_sql(table, row)});
+                END
+                """,
+            ]
+        return statements
+
+    def period_bounds(self, expr: str, granularity: str) -> Tuple[str, str]:
+        if granularity == "week":
+            start = f"date({expr}, 'weekday 0', '-6 days')"
+            return start, f"date({start}, '+7 days')"
+        start = f"date({expr}, 'start of month')"
+        return start, f"date({start}, '+1 month')"
+
+    def rollup_triggers(self) -> List[str]:
+        statements = []
+        for g in ROLLUP_GRANULARITIES:
+            new_start, _ = self.period_bounds("NEW.date", g)
+            old_start, old_end = self.period_bounds("OLD.date", g)
+            _, new_end = self.period_bounds("NEW.date", g)
+            statements += [
+                f"DROP TRIGGER IF EXISTS trg_rollup_{g}_insert",
+                f"DROP TRIGGER IF EXISTS trg_rollup_{g}_update",
+                f"DROP TRIGGER IF EXISTS trg_rollup_{g}_delete",
+                f"""
+                CREATE TRIGGER trg_rollup_{g}_insert
+                AFTER INSERT ON progress_history
+                BEGIN {_rollup_insert_sql(g, new_start)} END
+                """,
+                f"""
+                CREATE TRIGGER trg_rollup_{g}_update
+                AFTER UPDATE ON progress_history
+                BEGIN
+                    {_rollup_recompute_sql(g, old_start, old_end)}
+                    {_rollup_recompute_sql(g, new_start, new_end)}
+                END
+                """,
+                f"""
+                CREATE TRIGGER trg_rollup_{g}_delete
+                AFTER DELETE ON progress_history
+                BEGIN {_rollup_recompute_sql(g, old_start, old_end)} END
+                """,
+            ]
+        return statements
+
+    def table_exists(self, cursor, table: str) -> bool:
+        cursor.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        )
+        return cursor.fetchone()[0] > 0
+
+    def begin(self, cursor):
+        # Reserva a escrita já no BEGIN: uma transação que lê e depois escreve
+        # falharia na hora (SQLITE_BUSY) se outra conexão estivesse escrevendo
+        cursor.execute("BEGIN IMMEDIATE")
+
+    def _run_outside_transaction(self, statements: List[str]):
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        try:
+            for statement in statements:
+                conn.execute(statement)
+        finally:
+            conn.close()
+
+    def analyze(self, tables: List[str]):
+        self._run_outside_transaction([f"ANALYZE {table}" for table in tables])
+
+    def vacuum(self, tables: List[str]):
+        # No SQLite o VACUUM reescreve o arquivo inteiro
+        self._run_outside_transaction(["VACUUM"])
+
+# Trechos sem placeholders (literais, identificadores entre aspas, comentários e
+# corpos $tag$...$tag$), `?` e `%` soltos
+_PG_QUERY_TOKENS = re.compile(r"""
+    '(?:[^']|'')*' | "(?:[^"]|"")*" | --[^\n]* | /\*.*?\*/ | \$(?P<tag>\w*)\$.*?\$(?P=tag)\$
+    | (?P<mark>\?) | %
+""", re.VERBOSE | re.DOTALL)
+
+class _PostgresCursor:
+    """Cursor que traduz o estilo `?` para o `%s` do psycopg"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    @staticmethod
+    def _translate(query: str, params: Any = ()) -> str:
+        """Sem parâmetros o psycopg não interpreta a consulta, que vai como está.
+        Com parâmetros, todo `%` é escapado (o psycopg não distingue literais) e
+        só os `?` fora de literais e comentários viram `%s`."""
+        if not params:
+            return query
+        return _PG_QUERY_TOKENS.sub(
+            lambda m: "%s" if m.group("mark") else m.group(0).replace("%", "%%"), query
+        )
+
+    def execute(self, query: str, params: tuple = ()):
+        self._cursor.execute(self._translate(query, params), params or None)
+        return self
+
+    def executemany(self, query: str, params_seq):
+        self._cursor.executemany(self._translate(query, True), params_seq)
+        return self
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class _PostgresConnection:
+    """Conexão emprestada do pool; `close()` devolve ao pool"""
+
+    def __init__(self, pool):
+        self._pool = pool
+        self._conn = pool.getconn()
+
+    def cursor(self, *args, **kwargs):
+        if args or kwargs:
+            return self._conn.cursor(*args, **kwargs)
+        return _PostgresCursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        if self._conn is not None:
+            # Como no sqlite3, fechar sem commit descarta a transação pendente
+            if not self._conn.closed and self._conn.info.transaction_status != 0:
+                self._conn.rollback()
+            self._pool.putconn(self._conn)
+            self._conn = None
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+class PostgresBackend(StorageBackend):
+    """PostgreSQL com pool de conexões (psycopg 3).
+
+    Leituras grandes (carga do cache colunar de progresso) usam cursores nomeados no
+    servidor, trazendo as linhas em blocos de `fetch_size`.
+    """
+
+    name = "postgresql"
+    binary_type = "BYTEA"
+    serial_primary_key = "BIGSERIAL PRIMARY KEY"
+
+    def __init__(self, dsn: str, min_size: int = 1, max_size: int = 10, fetch_size: int = 10000):
+        try:
+            from psycopg_pool import ConnectionPool
+        except ImportError as e:
+            raise RuntimeError(
+                "Backend PostgreSQL requer 'psycopg[binary,pool]' (pip install 'psycopg[binary,pool]')"
+            ) from e
+
+        import psycopg
+        self.errors = (psycopg.Error,)
+        self.dsn = dsn
+        self.fetch_size = fetch_size
+        self.pool = ConnectionPool(dsn, min_size=min_size, max_size=max_size, open=True)
+
+    def connect(self):
+        return _PostgresConnection(self.pool)
+
+    def schema_statements(self) -> List[str]:
+        return [
+            """
+            CREATE TABLE IF NOT EXISTS weekly_goals (
+                id TEXT PRIMARY KEY,
+                week_start DATE NOT NULL,
+                week_end DATE NOT NULL,
+                description TEXT NOT NULL,
+                target_value DOUBLE PRECISION NOT NULL,
+                actual_value DOUBLE PRECISION,
+                completed BOOLEAN,
+                completed_date TIMESTAMP,
+                created_by TEXT NOT NULL,
+                category TEXT DEFAULT 'general',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS progress_history (
+                id BIGSERIAL PRIMARY KEY,
+                date DATE NOT NULL,
+                progress_value DOUBLE PRECISION NOT NULL,
+                daily_increment DOUBLE PRECISION,
+                week_number INTEGER,
+                month_number INTEGER,
+                goals_completed INTEGER DEFAULT 0,
+                notes TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS ml_predictions (
+                id BIGSERIAL PRIMARY KEY,
+                prediction_date DATE NOT NULL,
+                predicted_final_value DOUBLE PRECISION,
+                confidence_score DOUBLE PRECISION,
+                model_used TEXT,
+                features_used TEXT,
+                actual_progress DOUBLE PRECISION,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+        ]
+
+    def goal_stats_triggers(self) -> List[str]:
+        return [
+            f"""
+            CREATE OR REPLACE FUNCTION goal_stats_sync() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    {_goal_stats_upsert('OLD', '-')}
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    {_goal_stats_upsert('NEW', '')}
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+            """,
+            "DROP TRIGGER IF EXISTS trg_goal_stats ON weekly_goals",
+            """
+            CREATE TRIGGER trg_goal_stats
+            AFTER INSERT OR DELETE OR UPDATE OF week_start, target_value, actual_value, completed, created_by
+            ON weekly_goals
+            FOR EACH ROW EXECUTE FUNCTION goal_stats_sync()
+            """,
+        ]
+
+    def data_version_triggers(self) -> List[str]:
+        return [
+            """
+            CREATE OR REPLACE FUNCTION progress_version_bump() RETURNS trigger AS $$
+            BEGIN
+                UPDATE data_versions SET version = version + 1 WHERE name = 'progress_history';
+                IF TG_OP IN ('UPDATE', 'DELETE', 'TRUNCATE') THEN
+                    UPDATE data_versions SET version = version + 1
+                    WHERE name = 'progress_history_rewrites';
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+            """,
+            "DROP TRIGGER IF EXISTS trg_progress_version ON progress_history",
+            """
+            CREATE TRIGGER trg_progress_version
+            AFTER INSERT OR UPDATE OR DELETE ON progress_history
+            FOR EACH STATEMENT EXECUTE FUNCTION progress_version_bump()
+            """,
+            "DROP TRIGGER IF EXISTS trg_progress_version_truncate ON progress_history",
+            """
+            CREATE TRIGGER trg_progress_version_truncate
+            AFTER TRUNCATE ON progress_history
+            FOR EACH STATEMENT EXECUTE FUNCTION progress_version_bump()
+            """,
+        ]
+
+    def goal_version_triggers(self) -> List[str]:
+        return [
+            f"""
+            CREATE OR REPLACE FUNCTION goal_version_bump() RETURNS trigger AS $$
+            BEGIN
+                UPDATE data_versions SET version = version + 1 WHERE name = '{GOAL_VERSION_NAME}';
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+            """,
+            "DROP TRIGGER IF EXISTS trg_goal_version ON weekly_goals",
+            """
+            CREATE TRIGGER trg_goal_version
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON weekly_goals
+            FOR EACH STATEMENT EXECUTE FUNCTION goal_version_bump()
+            """,
+        ]
+
+    def event_payload_sql(self, table: str, alias: str) -> str:
+        return f"to_jsonb({alias})::text"
+
+    def event_log_triggers(self, table: str) -> List[str]:
+        stream, user_column, _ = EVENT_STREAMS[table]
+        return [
+            f"""
+            CREATE OR REPLACE FUNCTION event_log_append() RETURNS trigger AS $$
+            DECLARE
+                payload JSONB;
+            BEGIN
+                IF TG_OP = 'TRUNCATE' THEN
+                    INSERT INTO event_log (stream, kind, origin) VALUES (TG_ARGV[0], 'reset', 'truncate');
+                    RETURN NULL;
+                END IF;
+                IF TG_OP = 'DELETE' THEN
+                    payload := to_jsonb(OLD);
+                ELSE
+                    payload := to_jsonb(NEW);
+                END IF;
+                INSERT INTO event_log (stream, kind, entity_id, user_email, origin, payload)
+                VALUES (TG_ARGV[0], lower(TG_OP), payload ->> 'id', payload ->> NULLIF(TG_ARGV[1], ''),
+                        {EVENT_ORIGIN_SQL}, payload::text);
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+            """,
+            f"DROP TRIGGER IF EXISTS trg_event_log ON {table}",
+            f"""
+            CREATE TRIGGER trg_event_log
+            AFTER INSERT OR UPDATE OR DELETE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION event_log_append('{stream}', '{user_column or ''}')
+            """,
+            f"DROP TRIGGER IF EXISTS trg_event_log_truncate ON {table}",
+            f"""
+            CREATE TRIGGER trg_event_log_truncate
+            AFTER TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION event_log_append('{stream}', '')
+            """,
+        ]
+
+    def period_bounds(self, expr: str, granularity: str) -> Tuple[str, str]:
+        start = f"date_trunc('{granularity}', {expr})::date"
+        return start, f"({start} + interval '1 {granularity}')::date"
+
+    def rollup_triggers(self) -> List[str]:
+        statements = []
+        for g in ROLLUP_GRANULARITIES:
+            new_start, new_end = self.period_bounds("NEW.date", g)
+            old_start, old_end = self.period_bounds("OLD.date", g)
+            statements += [
+                f"""
+                CREATE OR REPLACE FUNCTION rollup_{g}_sync() RETURNS trigger AS $$
+                BEGIN
+                    IF TG_OP = 'INSERT' THEN
+                        {_rollup_insert_sql(g, new_start)}
+                    ELSE
+                        {_rollup_recompute_sql(g, old_start, old_end)}
+                        IF TG_OP = 'UPDATE' THEN
+                            {_rollup_recompute_sql(g, new_start, new_end)}
+                        END IF;
+                    END IF;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql
+                """,
+                f"DROP TRIGGER IF EXISTS trg_rollup_{g} ON progress_history",
+                f"""
+                CREATE TRIGGER trg_rollup_{g}
+                AFTER INSERT OR UPDATE OR DELETE ON progress_history
+                FOR EACH ROW EXECUTE FUNCTION rollup_{g}_sync()
+                """,
+            ]
+        return statements
+
+    def table_exists(self, cursor, table: str) -> bool:
+        cursor.execute("SELECT to_regclass(?) IS NOT NULL", (table,))
+        return bool(cursor.fetchone()[0])
+
+    def begin(self, cursor):
+        # psycopg já abre a transação implicitamente no primeiro comando
+        pass
+
+    def read_dataframe(self, conn, query: str, params: tuple = ()) -> pd.DataFrame:
+        import uuid
+        frames = []
+        with conn.cursor(name=f"stream_{uuid.uuid4().hex}") as cursor:
+            cursor.itersize = self.fetch_size
+            cursor.execute(_PostgresCursor._translate(query, params), params or None)
+            columns = None
+            while True:
+                rows = cursor.fetchmany(self.fetch_size)
+                if columns is None:
+                    columns = [desc[0] for desc in cursor.description]
+                if not rows:
+                    break
+                frames.append(pd.DataFrame.from_records(rows, columns=columns))
+        conn.commit()
+        if not frames:
+            return pd.DataFrame(columns=columns or [])
+        return pd.concat(frames, ignore_index=True)
+
+    def _run_outside_transaction(self, statements: List[str]):
+        with self.pool.connection() as conn:
+            conn.autocommit = True
+            try:
+                for statement in statements:
+                    conn.execute(statement)
+            finally:
+                conn.autocommit = False
+
+    def analyze(self, tables: List[str]):
+        self._run_outside_transaction([f"ANALYZE {table}" for table in tables])
+
+    def vacuum(self, tables: List[str]):
+        self._run_outside_transaction([f"VACUUM (ANALYZE) {table}" for table in tables])
+
+    def close(self):
+        self.pool.close()
+
+def create_storage_backend(url: str) -> StorageBackend:
+    """Escolhe o backend a partir de uma URL (postgresql://...) ou caminho SQLite"""
+    if url.startswith(("postgresql://", "postgres://")):
+        return PostgresBackend(url)
+    if url.startswith("sqlite:///"):
+        url = url[len("sqlite:///"):]
+    return SQLiteBackend(url)
+
+class _RouteLock:
+    """Trava compartilhada/exclusiva do roteamento de metas.
+
+    Escritas e leituras roteadas seguram a parte compartilhada durante toda a
+    operação; mover usuários entre shards exige a exclusiva, então nenhuma
+    escrita cai no shard antigo depois da cópia.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._shared = 0
+        self._exclusive = False
+
+    @contextmanager
+    def shared(self):
+        with self._cond:
+            while self._exclusive:
+                self._cond.wait()
+            self._shared += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._shared -= 1
+                self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        with self._cond:
+            while self._exclusive:
+                self._cond.wait()
+            self._exclusive = True
+            while self._shared:
+                self._cond.wait()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._exclusive = False
+                self._cond.notify_all()
+
+class DatabaseManager:
+    def __init__(self, db_path: str = "analytics.db", backend: Optional[StorageBackend] = None,
+                 goal_shards: Optional[int] = None):
+        self.db_path = db_path
+        self.backend = backend or create_storage_backend(
+            os.getenv("ANALYTICS_DATABASE_URL", db_path)
+        )
+        shards = int(os.getenv("ANALYTICS_GOAL_SHARDS", "0")) if goal_shards is None else goal_shards
+        if shards and self.backend.name != "sqlite":
+            logger.warning("Sharding de metas só se aplica ao SQLite; usando o banco principal")
+            shards = 0
+        # Sem sharding o "shard" único é o próprio banco principal
+        self.sharded = shards > 0
+        self.goal_backends: List[StorageBackend] = (
+            [SQLiteBackend(self._shard_path(i)) for i in range(shards)] if self.sharded else [self.backend]
+        )
+        self._shard_map: Dict[str, int] = {}
+        self._shard_map_lock = threading.Lock()
+        self.route_lock = _RouteLock()
+        self._goal_pool = ThreadPoolExecutor(
+            max_workers=len(self.goal_backends), thread_name_prefix="goal-shard"
+        )
+        self.init_database()
+
+    def _shard_path(self, index: int) -> str:
+        return f"{os.path.splitext(self.backend.db_path)[0]}_goals_{index}.db"
+
+    def init_database(self):
+        """Inicializa o banco de dados"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        for statement in self.backend.schema_statements():
+            cursor.execute(statement)
+
+        self._init_goal_tables(self.backend, cursor)
+
+        cursor.execute(DATA_VERSIONS_TABLE)
+        for name in DATA_VERSION_NAMES:
+            cursor.execute(
+                "INSERT INTO data_versions (name, version) VALUES (?, 0) ON CONFLICT(name) DO NOTHING",
+                (name,)
+            )
+        cursor.execute(
+            "INSERT INTO data_versions (name, version) VALUES (?, ?) ON CONFLICT(name) DO NOTHING",
+            (DB_INSTANCE_NAME, secrets.randbits(30))
+        )
+        for statement in self.backend.data_version_triggers():
+            cursor.execute(statement)
+
+        cursor.execute(ANOMALIES_TABLE)
+        cursor.execute(JOBS_TABLE)
+        self._add_missing_columns(cursor, "analytics_jobs", JOB_LEASE_COLUMNS)
+
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_progress_history_date ON progress_history (date)"
+        )
+        for statement in _retention_tables(self.backend.binary_type):
+            cursor.execute(statement)
+
+        needs_rollup_backfill = not self.backend.table_exists(cursor, "progress_rollup_week")
+        for granularity in ROLLUP_GRANULARITIES:
+            cursor.execute(_rollup_table(granularity))
+        for statement in self.backend.rollup_triggers():
+            cursor.execute(statement)
+        if needs_rollup_backfill:
+            self._rebuild_rollups(cursor)
+
+        self._init_event_log(self.backend, cursor, ["progress_history", "weekly_goals"])
+
+        cursor.execute(GOAL_SHARD_MAP_TABLE)
+        if not self.sharded:
+            cursor.execute("SELECT COUNT(*) FROM goal_shard_map")
+            if cursor.fetchone()[0]:
+                logger.warning(
+                    "goal_shard_map não está vazio mas o sharding está desativado: "
+                    "as metas desses usuários continuam nos arquivos de shard"
+                )
+
+        conn.commit()
+        conn.close()
+
+        if self.sharded:
+            for backend in self.goal_backends:
+                shard_conn = backend.connect()
+                shard_cursor = shard_conn.cursor()
+                for statement in backend.goal_schema_statements():
+                    shard_cursor.execute(statement)
+                self._init_goal_tables(backend, shard_cursor)
+                self._init_event_log(backend, shard_cursor, ["weekly_goals"])
+                shard_conn.commit()
+                shard_conn.close()
+            self._load_shard_map()
+            self._migrate_unsharded_goals()
+            self._migrate_orphaned_goals()
+
+        logger.info(f"Database initialized successfully ({self.backend.name})")
+
+    @staticmethod
+    def _add_missing_columns(cursor, table: str, columns: Dict[str, str]):
+        cursor.execute(f"SELECT * FROM {table} LIMIT 0")
+        existing = {desc[0] for desc in cursor.description}
+        for name, ddl in columns.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}")
+
+    def _init_goal_tables(self, backend: StorageBackend, cursor):
+        """Agregados de metas (por usuário/semana e totais por usuário),
+        mantidos por triggers na mesma transação da escrita"""
+        needs_backfill = not backend.table_exists(cursor, "goal_stats_weekly")
+
+        for statement in GOAL_STATS_TABLES:
+            cursor.execute(statement)
+
+        for statement in backend.goal_stats_triggers():
+            cursor.execute(statement)
+
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_weekly_goals_user_week ON weekly_goals (created_by, week_start)"
+        )
+
+        cursor.execute(DATA_VERSIONS_TABLE)
+        cursor.execute(
+            "INSERT INTO data_versions (name, version) VALUES (?, 0) ON CONFLICT(name) DO NOTHING",
+            (GOAL_VERSION_NAME,)
+        )
+        # Um shard recriado não pode repetir versões que estejam em cache
+        cursor.execute(
+            "INSERT INTO data_versions (name, version) VALUES (?, ?) ON CONFLICT(name) DO NOTHING",
+            (DB_INSTANCE_NAME, secrets.randbits(30))
+        )
+        for statement in backend.goal_version_triggers():
+            cursor.execute(statement)
+
+        if needs_backfill:
+            self._rebuild_goal_stats(cursor)
+
+    def _rebuild_goal_stats(self, cursor):
+        """Recalcula os agregados de metas a partir de weekly_goals"""
+        cursor.execute("DELETE FROM goal_stats_weekly")
+        cursor.execute("DELETE FROM goal_stats_user")
+        cursor.execute("""
+            INSERT INTO goal_stats_weekly
+                (created_by, week_start, goals_set, goals_completed, target_sum, actual_sum)
+            SELECT created_by, week_start, COUNT(*),
+                   SUM(CASE WHEN completed THEN 1 ELSE 0 END),
+                   SUM(target_value), SUM(COALESCE(actual_value, 0))
+            FROM weekly_goals
+            GROUP BY created_by, week_start
+        """)
+        cursor.execute("""
+            INSERT INTO goal_stats_user
+                (created_by, goals_set, goals_completed, target_sum, actual_sum)
+            SELECT created_by, SUM(goals_set), SUM(goals_completed),
+                   SUM(target_sum), SUM(actual_sum)
+            FROM goal_stats_weekly
+            GROUP BY created_by
+        """)
+        logger.info("Agregados de metas reconstruídos")
+
+    def _rebuild_rollups(self, cursor):
+        """Recalcula progress_rollup_* a partir de progress_history"""
+        for granularity in ROLLUP_GRANULARITIES:
+            table = f"progress_rollup_{granularity}"
+            start, _ = self.backend.period_bounds("date", granularity)
+            cursor.execute(f"DELETE FROM {table}")
+            cursor.execute(f"""
+                INSERT INTO {table}
+                    (period_start, increment_sum, increment_count, increment_min, increment_max,
+                     last_date, last_progress, goals_completed, days)
+                SELECT {start} AS period, COALESCE(SUM(daily_increment), 0), COUNT(daily_increment),
+                       MIN(daily_increment), MAX(daily_increment), MAX(date), NULL,
+                       COALESCE(SUM(goals_completed), 0), COUNT(*)
+                FROM progress_history
+                GROUP BY {start}
+            """)
+            cursor.execute(f"""
+                UPDATE {table} SET last_progress = (
+                    SELECT p.progress_value FROM progress_history p
+                    WHERE p.date = {table}.last_date
+                    ORDER BY p.id DESC LIMIT 1
+                )
+            """)
+        logger.info("Rollups de progresso reconstruídos")
+
+    def _init_event_log(self, backend: StorageBackend, cursor, tables: List[str]):
+        """Cria o log de eventos do banco e os triggers de `tables`.
+
+        Log novo (ou terminando em 'reset', após carga em massa) recebe um
+        evento 'insert' com origin 'baseline' para cada linha existente, de
+        modo que o replay do log sempre reproduz o conteúdo das tabelas.
+        """
+        needs_baseline = not backend.table_exists(cursor, "event_log")
+        for statement in _event_log_tables(backend.serial_primary_key):
+            cursor.execute(statement)
+        cursor.execute(
+            "INSERT INTO event_log_context (name, value) VALUES ('origin', NULL) ON CONFLICT(name) DO NOTHING"
+        )
+        # Último seq já incorporado a event_snapshot e removido do log
+        cursor.execute(
+            "INSERT INTO event_log_context (name, value) VALUES ('compacted_through', '0') "
+            "ON CONFLICT(name) DO NOTHING"
+        )
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_event_log_stream ON event_log (stream, seq)")
+        for table in tables:
+            for statement in backend.event_log_triggers(table):
+                cursor.execute(statement)
+
+        if not needs_baseline:
+            cursor.execute("SELECT kind FROM event_log ORDER BY seq DESC LIMIT 1")
+            last = cursor.fetchone()
+            needs_baseline = last is not None and last[0] == "reset"
+        if needs_baseline:
+            for table in tables:
+                stream, user_column, _ = EVENT_STREAMS[table]
+                cursor.execute(f"""
+                    INSERT INTO event_log (stream, kind, entity_id, user_email, origin, payload)
+                    SELECT '{stream}', 'insert', t.id, {f"t.{user_column}" if user_column else "NULL"},
+                           'baseline', {backend.event_payload_sql(table, "t")}
+                    FROM {table} t
+                    ORDER BY t.id
+                """)
+            logger.info(f"Linha de base do log de eventos gravada ({', '.join(tables)})")
+
+    def get_connection(self):
+        return self.backend.connect()
+
+    def get_data_versions(self, cursor, names: Optional[List[str]] = None) -> Dict[str, int]:
+        """Lê os contadores de versão (todos ou só `names`, numa única consulta)"""
+        if names is None:
+            cursor.execute("SELECT name, version FROM data_versions")
+        else:
+            cursor.execute(
+                f"SELECT name, version FROM data_versions WHERE name IN ({', '.join('?' * len(names))})",
+                tuple(names)
+            )
+        return {name: int(version) for name, version in cursor.fetchall()}
+
+    def goal_version(self, user_email: str) -> Tuple[int, int, int]:
+        """Shard do usuário e a versão de weekly_goals nesse shard (com o
+        identificador do banco), gravada pelos triggers a cada escrita"""
+        shard = self.goal_shard(user_email)
+        conn = self.goal_backends[shard].connect()
+        try:
+            versions = self.get_data_versions(conn.cursor(), [GOAL_VERSION_NAME, DB_INSTANCE_NAME])
+        finally:
+            conn.close()
+        return shard, versions.get(DB_INSTANCE_NAME, 0), versions.get(GOAL_VERSION_NAME, 0)
+
+    def begin(self, cursor):
+        self.backend.begin(cursor)
+
+    def read_dataframe(self, conn, query: str, params: tuple = ()) -> pd.DataFrame:
+        return self.backend.read_dataframe(conn, query, params)
+
+    # Roteamento das metas por usuário
+
+    def _load_shard_map(self):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT user_email, shard FROM goal_shard_map")
+        with self._shard_map_lock:
+            self._shard_map = {user: int(shard) for user, shard in cursor.fetchall()}
+        conn.close()
+
+    def _hash_shard(self, user_email: str) -> int:
+        return zlib.crc32(user_email.lower().encode("utf-8")) % len(self.goal_backends)
+
+    def goal_shard(self, user_email: str, assign: bool = False) -> int:
+        """Shard do usuário; `assign` grava no mapa a escolha de usuários novos.
+
+        Usuários sem entrada no mapa não têm metas, então leituras usam o
+        shard do hash sem gravar nada; só a primeira criação fixa o shard.
+        """
+        if not self.sharded:
+            return 0
+        with self._shard_map_lock:
+            shard = self._shard_map.get(user_email)
+        if shard is not None:
+            return shard
+        shard = self._hash_shard(user_email)
+        if not assign:
+            return shard
+
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO goal_shard_map (user_email, shard) VALUES (?, ?) ON CONFLICT(user_email) DO NOTHING",
+            (user_email, shard)
+        )
+        cursor.execute("SELECT shard FROM goal_shard_map WHERE user_email = ?", (user_email,))
+        shard = int(cursor.fetchone()[0])
+        conn.commit()
+        conn.close()
+        with self._shard_map_lock:
+            self._shard_map[user_email] = shard
+        return shard
+
+    def goal_backend(self, user_email: str, assign: bool = False) -> StorageBackend:
+        return self.goal_backends[self.goal_shard(user_email, assign)]
+
+    def get_goal_connection(self, user_email: str):
+        """Conexão com o shard que guarda as metas do usuário"""
+        return self.goal_backend(user_email).connect()
+
+    def map_goal_shards(self, fn, shards: Optional[List[int]] = None) -> List[Any]:
+        """Executa `fn(backend, conn)` em cada shard, em paralelo (fan-out)"""
+        def run(index: int):
+            backend = self.goal_backends[index]
+            conn = backend.connect()
+            try:
+                return fn(backend, conn)
+            finally:
+                conn.close()
+
+        indexes = range(len(self.goal_backends)) if shards is None else shards
+        return list(self._goal_pool.map(run, indexes))
+
+    def _move_user_goals(self, source: StorageBackend, target: StorageBackend, user_email: str,
+                         shard: Optional[int] = None) -> int:
+        """Copia as metas do usuário para `target`, aponta o mapa e limpa `source`.
+
+        A cópia é idempotente (ON CONFLICT DO NOTHING): se o processo cair
+        entre as transações, repetir a operação termina o movimento. O mapa
+        muda antes da remoção, então leituras nunca veem o usuário sem metas.
+        Os triggers de cada lado mantêm goal_stats_* corretos.
+        """
+        columns = ", ".join(GOAL_COLUMNS)
+        conn = source.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT {columns} FROM weekly_goals WHERE created_by = ?", (user_email,))
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
+
+        conn = target.connect()
+        try:
+            cursor = conn.cursor()
+            target.begin(cursor)
+            with event_origin(cursor, "move"):
+                cursor.executemany(f"""
+                    INSERT INTO weekly_goals ({columns})
+                    VALUES ({", ".join("?" * len(GOAL_COLUMNS))})
+                    ON CONFLICT(id) DO NOTHING
+                """, rows)
+            conn.commit()
+        finally:
+            conn.close()
+
+        if shard is not None:
+            self._set_shard(user_email, shard)
+
+        conn = source.connect()
+        try:
+            cursor = conn.cursor()
+            source.begin(cursor)
+            with event_origin(cursor, "move"):
+                cursor.execute("DELETE FROM weekly_goals WHERE created_by = ?", (user_email,))
+            conn.commit()
+        finally:
+            conn.close()
+        return len(rows)
+
+    def _set_shard(self, user_email: str, shard: int):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO goal_shard_map (user_email, shard) VALUES (?, ?)
+            ON CONFLICT(user_email) DO UPDATE SET shard = excluded.shard, assigned_at = CURRENT_TIMESTAMP
+        """, (user_email, shard))
+        conn.commit()
+        conn.close()
+        with self._shard_map_lock:
+            self._shard_map[user_email] = shard
+
+    def _migrate_unsharded_goals(self):
+        """Distribui metas gravadas no banco principal (setup.py, generate_data.py)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT DISTINCT created_by FROM weekly_goals")
+        users = [row[0] for row in cursor.fetchall()]
+        conn.close()
+        if not users:
+            return
+        with self.route_lock.exclusive():
+            moved = 0
+            for user_email in users:
+                shard = self.goal_shard(user_email, assign=True)
+                moved += self._move_user_goals(self.backend, self.goal_backends[shard], user_email)
+        logger.info(f"{moved} metas de {len(users)} usuários migradas para {len(self.goal_backends)} shards")
+
+    def _migrate_orphaned_goals(self) -> List[Dict[str, Any]]:
+        """Realoca usuários mapeados para shards que deixaram de existir
+        (redução de ANALYTICS_GOAL_SHARDS); o arquivo antigo continua no disco"""
+        with self._shard_map_lock:
+            orphans = [(user, shard) for user, shard in self._shard_map.items() if shard >= len(self.goal_backends)]
+        moves = []
+        for user_email, old_shard in orphans:
+            target = self._hash_shard(user_email)
+            with self.route_lock.exclusive():
+                if os.path.exists(self._shard_path(old_shard)):
+                    old_backend = SQLiteBackend(self._shard_path(old_shard))
+                    old_conn = old_backend.connect()
+                    # Arquivos de versões anteriores podem não ter o log de eventos
+                    self._init_event_log(old_backend, old_conn.cursor(), ["weekly_goals"])
+                    old_conn.commit()
+                    old_conn.close()
+                    moved = self._move_user_goals(old_backend, self.goal_backends[target], user_email, target)
+                else:
+                    moved = 0
+                    self._set_shard(user_email, target)
+            moves.append({"user": user_email, "from": old_shard, "to": target, "goals_moved": moved})
+        if orphans:
+            logger.info(f"{len(orphans)} usuários realocados de shards removidos")
+        return moves
+
+    def move_user(self, user_email: str, shard: int) -> Dict[str, Any]:
+        """Move as metas de um usuário para outro shard (bloqueia escritas roteadas durante a cópia)"""
+        if not self.sharded:
+            raise ValueError("Sharding de metas desativado")
+        if not 0 <= shard < len(self.goal_backends):
+            raise ValueError(f"Shard inválido: {shard}")
+        with self.route_lock.exclusive():
+            source = self.goal_shard(user_email)
+            moved = 0
+            if source != shard:
+                moved = self._move_user_goals(
+                    self.goal_backends[source], self.goal_backends[shard], user_email, shard
+                )
+            else:
+                self._set_shard(user_email, shard)
+        logger.info(f"Usuário {user_email} movido do shard {source} para {shard} ({moved} metas)")
+        return {"user": user_email, "from": source, "to": shard, "goals_moved": moved}
+
+    def shard_stats(self) -> List[Dict[str, Any]]:
+        """Usuários e metas por shard (fan-out sobre goal_stats_user)"""
+        def count(backend, conn):
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*), COALESCE(SUM(goals_set), 0) FROM goal_stats_user WHERE goals_set > 0")
+            users, goals = cursor.fetchone()
+            return {"users": int(users), "goals": int(goals)}
+
+        stats = self.map_goal_shards(count)
+        for index, item in enumerate(stats):
+            item["shard"] = index
+            item["path"] = getattr(self.goal_backends[index], "db_path", None)
+        return stats
+
+    def rebalance(self, tolerance: float = 0.1, max_moves: int = 1000) -> Dict[str, Any]:
+        """Move usuários do shard mais cheio para o mais vazio até equilibrar as metas.
+
+        Usuários mapeados para shards que deixaram de existir são realocados
+        primeiro (o start também faz isso). Para quando a
+        diferença entre o maior e o menor shard fica abaixo de `tolerance`
+        da média ou quando nenhum movimento reduz essa diferença.
+        """
+        if not self.sharded:
+            raise ValueError("Sharding de metas desativado")
+        moves = self._migrate_orphaned_goals()
+
+        def per_user(backend, conn):
+            cursor = conn.cursor()
+            cursor.execute("SELECT created_by, goals_set FROM goal_stats_user WHERE goals_set > 0")
+            return dict(cursor.fetchall())
+
+        users = self.map_goal_shards(per_user)
+        loads = [sum(shard_users.values()) for shard_users in users]
+        mean = sum(loads) / len(loads)
+        while len(moves) < max_moves and max(loads) - min(loads) > tolerance * max(mean, 1):
+            source = loads.index(max(loads))
+            target = loads.index(min(loads))
+            gap = loads[source] - loads[target]
+            # O usuário que mais aproxima os dois shards sem inverter a diferença
+            candidates = [(user, goals) for user, goals in users[source].items() if goals < gap]
+            if not candidates:
+                break
+            user_email, goals = min(candidates, key=lambda item: abs(gap - 2 * item[1]))
+            moves.append(self.move_user(user_email, target))
+            del users[source][user_email]
+            users[target][user_email] = goals
+            loads[source] -= goals
+            loads[target] += goals
+
+        return {"moves": moves, "shards": self.shard_stats()}
+
+# Retenção, compactação e arquivamento do histórico
+class RetentionManager:
+    """Move linhas antigas das tabelas de histórico para partições arquivadas.
+
+    Linhas com data anterior ao primeiro dia do mês de `hoje - retention_days`
+    são agrupadas por mês, serializadas em JSON comprimido (zlib) em
+    history_archive e removidas da tabela quente, tudo na mesma transação.
+    Os agregados continuam disponíveis em progress_rollup_* (os períodos
+    arquivados ficam congelados; a semana que atravessa a marca d'água soma
+    a parte arquivada às linhas quentes), o cache colunar (e com ele
+    `get_progress_dataframe`) relê as partições ao se reconstruir e as linhas
+    brutas podem ser lidas com `read_archive`. ANALYZE e VACUUM rodam em
+    intervalos próprios. `retention_days` 0 desativa o arquivamento da tabela.
+    """
+
+    # tabela -> coluna de data usada para particionar
+    SOURCES = {
+        "progress_history": "date",
+        "ml_predictions": "prediction_date",
+    }
+
+    def __init__(self, db: DatabaseManager, retention_days: Optional[Dict[str, int]] = None,
+                 compaction_interval: timedelta = timedelta(hours=24),
+                 vacuum_interval: timedelta = timedelta(days=7),
+                 check_interval: float = 3600.0):
+        self.db = db
+        self.retention_days = {"progress_history": 365, "ml_predictions": 90}
+        self.retention_days.update(retention_days or {})
+        self.compaction_interval = compaction_interval
+        self.vacuum_interval = vacuum_interval
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        # Bancos arquivados antes de progress_rollup_archived existir
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        try:
+            self.db.begin(cursor)
+            self._sync_archived_rollups(cursor)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def cutoff(self, source: str, today: Optional[date] = None) -> date:
+        """Primeiro dia do mês mais antigo que permanece na tabela quente"""
+        limit = (today or date.today()) - timedelta(days=self.retention_days[source])
+        return limit.replace(day=1)
+
+    def _state(self, cursor) -> Dict[str, Dict[str, Any]]:
+        cursor.execute("SELECT name, archived_before, last_run FROM retention_state")
+        return {
+            name: {"archived_before": archived_before, "last_run": last_run}
+            for name, archived_before, last_run in cursor.fetchall()
+        }
+
+    def _mark(self, cursor, name: str, archived_before: Optional[date] = None):
+        cursor.execute("""
+            INSERT INTO retention_state (name, archived_before, last_run)
+            VALUES (?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET
+                archived_before = COALESCE(excluded.archived_before, retention_state.archived_before),
+                last_run = excluded.last_run
+        """, (name, archived_before.isoformat() if archived_before else None,
+              datetime.now().isoformat(sep=" ")))
+
+    def _sync_archived_rollups(self, cursor, force: bool = False):
+        """Regrava em progress_rollup_archived a parte arquivada dos períodos de
+        rollup que atravessam a marca d'água de progress_history.
+
+        A marca já refletida fica em retention_state ('progress_rollup_archived');
+        sem marca nova nem linhas recém-arquivadas (`force`) não há o que regravar.
+        """
+        state = self._state(cursor)
+        watermark = state.get("progress_history", {}).get("archived_before")
+        synced = state.get("progress_rollup_archived", {}).get("archived_before")
+        if not force and str(watermark or "")[:10] == str(synced or "")[:10]:
+            return
+        cursor.execute("DELETE FROM progress_rollup_archived")
+        if not watermark:
+            return
+        watermark = date.fromisoformat(str(watermark)[:10])
+        self._mark(cursor, "progress_rollup_archived", watermark)
+        starts = {
+            "week": watermark - timedelta(days=watermark.weekday()),
+            "month": watermark.replace(day=1),
+        }
+        straddling = {g: start for g, start in starts.items() if g in ROLLUP_GRANULARITIES and start < watermark}
+        if not straddling:
+            return
+
+        first = min(straddling.values())
+        cursor.execute("""
+            SELECT payload FROM history_archive
+            WHERE source = 'progress_history' AND last_date >= ? AND first_date < ?
+        """, (first.isoformat(), watermark.isoformat()))
+        rows = []
+        for columns, partition_rows in map(self._decode, [row[0] for row in cursor.fetchall()]):
+            index = {c: columns.index(c) for c in
+                     ("id", "date", "progress_value", "daily_increment", "goals_completed")}
+            rows += [{c: row[i] for c, i in index.items()} for row in partition_rows]
+
+        for granularity, start in straddling.items():
+            period = sorted(
+                (row for row in rows if start.isoformat() <= str(row["date"])[:10] < watermark.isoformat()),
+                key=lambda row: (str(row["date"])[:10], row["id"])
+            )
+            if not period:
+                continue
+            increments = [row["daily_increment"] for row in period if row["daily_increment"] is not None]
+            cursor.execute("""
+                INSERT INTO progress_rollup_archived
+                    (granularity, period_start, increment_sum, increment_count, increment_min,
+                     increment_max, last_date, last_progress, goals_completed, days)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (granularity, start.isoformat(), float(sum(increments)), len(increments),
+                  min(increments) if increments else None, max(increments) if increments else None,
+                  str(period[-1]["date"])[:10], period[-1]["progress_value"],
+                  int(sum(row["goals_completed"] or 0 for row in period)), len(period)))
+
+    @staticmethod
+    def _encode(columns: List[str], rows: List[list]) -> bytes:
+        return zlib.compress(json.dumps({"columns": columns, "rows": rows}, default=str).encode(), 6)
+
+    @staticmethod
+    def _decode(payload: Any) -> Tuple[List[str], List[list]]:
+        data = json.loads(zlib.decompress(bytes(payload)))
+        return data["columns"], data["rows"]
+
+    def compact(self, source: str, today: Optional[date] = None) -> Dict[str, Any]:
+        """Arquiva as linhas de `source` anteriores ao corte em partições mensais"""
+        if self.retention_days[source] <= 0:
+            return {"source": source, "cutoff": None, "archived_rows": 0, "partitions": [], "disabled": True}
+        date_column = self.SOURCES[source]
+        cutoff = self.cutoff(source, today)
+
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        try:
+            self.db.begin(cursor)
+            # A marca d'água nunca recua (mesmo que a janela de retenção aumente)
+            previous = self._state(cursor).get(source, {}).get("archived_before")
+            if previous and date.fromisoformat(str(previous)[:10]) > cutoff:
+                cutoff = date.fromisoformat(str(previous)[:10])
+
+            cursor.execute(
+                f"SELECT * FROM {source} WHERE {date_column} < ? ORDER BY {date_column}, id",
+                (cutoff.isoformat(),)
+            )
+            columns = [desc[0] for desc in cursor.description]
+            rows = cursor.fetchall()
+            date_index = columns.index(date_column)
+
+            partitions: Dict[str, List[list]] = {}
+            for row in json.loads(json.dumps([list(row) for row in rows], default=str)):
+                partitions.setdefault(row[date_index][:7] + "-01", []).append(row)
+
+            for partition_start, partition_rows in partitions.items():
+                cursor.execute(
+                    "SELECT payload FROM history_archive WHERE source = ? AND partition_start = ?",
+                    (source, partition_start)
+                )
+                existing = cursor.fetchone()
+                if existing is not None:
+                    # Linhas retroativas que chegaram depois do arquivamento do mês
+                    archived_columns, archived_rows = self._decode(existing[0])
+                    positions = [
+                        archived_columns.index(c) if c in archived_columns else None for c in columns
+                    ]
+                    archived_rows = [
+                        [row[i] if i is not None else None for i in positions] for row in archived_rows
+                    ]
+                    partition_rows = sorted(archived_rows + partition_rows,
+                                            key=lambda r: (r[date_index][:10], r[0]))
+                payload = self._encode(columns, partition_rows)
+                cursor.execute("""
+                    INSERT INTO history_archive
+                        (source, partition_start, row_count, first_date, last_date, payload, archived_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(source, partition_start) DO UPDATE SET
+                        row_count = excluded.row_count,
+                        first_date = excluded.first_date,
+                        last_date = excluded.last_date,
+                        payload = excluded.payload,
+                        archived_at = excluded.archived_at
+                """, (source, partition_start, len(partition_rows),
+                      partition_rows[0][date_index][:10], partition_rows[-1][date_index][:10],
+                      payload, datetime.now().isoformat(sep=" ")))
+
+            # A marca d'água e a parte arquivada dos períodos que a atravessam
+            # precisam estar gravadas antes do DELETE (triggers de rollup)
+            self._mark(cursor, source, cutoff)
+            if source == "progress_history":
+                self._sync_archived_rollups(cursor, force=bool(rows))
+            if rows:
+                with event_origin(cursor, "archive"):
+                    cursor.execute(f"DELETE FROM {source} WHERE {date_column} < ?", (cutoff.isoformat(),))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        if rows:
+            logger.info(f"{len(rows)} linhas de {source} arquivadas em {len(partitions)} partições (< {cutoff})")
+        return {"source": source, "cutoff": cutoff.isoformat(), "archived_rows": len(rows),
+                "partitions": sorted(partitions)}
+
+    def read_archive(self, source: str, start: Optional[date] = None,
+                     end: Optional[date] = None) -> pd.DataFrame:
+        """Linhas brutas arquivadas de `source` com data em [start, end]"""
+        if source not in self.SOURCES:
+            raise ValueError(f"Tabela sem política de retenção: {source}")
+        date_column = self.SOURCES[source]
+
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT payload FROM history_archive
+            WHERE source = ? AND last_date >= ? AND first_date <= ?
+            ORDER BY partition_start
+        """, (source, (start or date.min).isoformat(), (end or date.max).isoformat()))
+        payloads = [row[0] for row in cursor.fetchall()]
+        conn.close()
+
+        frames = [pd.DataFrame(rows, columns=columns) for columns, rows in map(self._decode, payloads)]
+        if not frames:
+            return pd.DataFrame()
+        df = pd.concat(frames, ignore_index=True)
+        dates = df[date_column].astype(str).str[:10]
+        mask = pd.Series(True, index=df.index)
+        if start is not None:
+            mask &= dates >= start.isoformat()
+        if end is not None:
+            mask &= dates <= end.isoformat()
+        return df[mask].reset_index(drop=True)
+
+    def status(self) -> Dict[str, Any]:
+        """Marca d'água, partições e tamanho das tabelas quentes"""
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        state = self._state(cursor)
+        sources = {}
+        for source in self.SOURCES:
+            cursor.execute(f"SELECT COUNT(*) FROM {source}")
+            hot_rows = cursor.fetchone()[0]
+            cursor.execute("""
+                SELECT COUNT(*), COALESCE(SUM(row_count), 0), MIN(first_date), MAX(last_date)
+                FROM history_archive WHERE source = ?
+            """, (source,))
+            partitions, archived_rows, first_date, last_date = cursor.fetchone()
+            sources[source] = {
+                "retention_days": self.retention_days[source],
+                "hot_rows": int(hot_rows),
+                "archived_rows": int(archived_rows),
+                "partitions": int(partitions),
+                "archived_range": [str(first_date)[:10], str(last_date)[:10]] if partitions else None,
+                "archived_before": str(state.get(source, {}).get("archived_before") or "") or None,
+                "last_compaction": str(state.get(source, {}).get("last_run") or "") or None,
+            }
+        conn.close()
+        return {
+            "sources": sources,
+            "last_analyze": str(state.get("analyze", {}).get("last_run") or "") or None,
+            "last_vacuum": str(state.get("vacuum", {}).get("last_run") or "") or None,
+        }
+
+    def run(self, force: bool = False, today: Optional[date] = None) -> Dict[str, Any]:
+        """Executa as tarefas vencidas (ou todas, com `force`): compactação, ANALYZE, VACUUM"""
+        with self._lock:
+            conn = self.db.get_connection()
+            cursor = conn.cursor()
+            state = self._state(cursor)
+            conn.close()
+
+            def due(name: str, interval: timedelta) -> bool:
+                last_run = state.get(name, {}).get("last_run")
+                if force or not last_run:
+                    return True
+                return datetime.now() - datetime.fromisoformat(str(last_run)) >= interval
+
+            report: Dict[str, Any] = {"compaction": []}
+            for source in self.SOURCES:
+                if due(source, self.compaction_interval):
+                    report["compaction"].append(self.compact(source, today))
+
+            tables = list(self.SOURCES) + ["history_archive"]
+            archived = any(item["archived_rows"] for item in report["compaction"])
+            if due("vacuum", self.vacuum_interval):
+                report["vacuum"] = self._maintain("vacuum", self.db.backend.vacuum, tables)
+            if archived or due("analyze", self.compaction_interval):
+                report["analyze"] = self._maintain("analyze", self.db.backend.analyze, tables)
+            return report
+
+    def _maintain(self, name: str, action, tables: List[str]) -> bool:
+        try:
+            action(tables)
+        except self.db.backend.errors as e:
+            # Ex.: SQLite ocupado por outra escrita; tenta de novo na próxima rodada
+            logger.warning(f"Manutenção '{name}' adiada: {e}")
+            return False
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        self._mark(cursor, name)
+        conn.commit()
+        conn.close()
+        return True
+
+    async def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                report = await asyncio.to_thread(self.run)
+                if any(item["archived_rows"] for item in report["compaction"]) or len(report) > 1:
+                    logger.info(f"Manutenção de retenção executada: {report}")
+            except Exception as e:
+                logger.error(f"Erro na manutenção de retenção: {e}")
+            await asyncio.sleep(self.check_interval)
+
+# Log de eventos: leitura incremental, checkpoints e replay
+class EventLog:
+    """Leitura do event_log de cada partição (0 = banco principal, i + 1 = shard i).
+
+    A sequência é crescente dentro de cada partição, sem ordem global entre
+    partições. Consumidores guardam um checkpoint por partição (no próprio
+    banco da partição) e processam só o que veio depois dele; o replay desde
+    o início reconstrói qualquer estado derivado com uma leitura sequencial.
+
+    `compact` incorpora a event_snapshot o estado até o menor checkpoint da
+    partição e apaga esses eventos; o replay parte do snapshot.
+    """
+
+    COLUMNS = "seq, stream, kind, entity_id, user_email, origin, payload, created_at"
+
+    def __init__(self, db: DatabaseManager, batch_size: int = 1000):
+        self.db = db
+        self.batch_size = batch_size
+
+    @property
+    def partitions(self) -> List[StorageBackend]:
+        return [self.db.backend] + (self.db.goal_backends if self.db.sharded else [])
+
+    def _backend(self, partition: int) -> StorageBackend:
+        partitions = self.partitions
+        if not 0 <= partition < len(partitions):
+            raise ValueError(f"Partição do log inexistente: {partition}")
+        return partitions[partition]
+
+    @staticmethod
+    def _event(partition: int, row) -> Dict[str, Any]:
+        seq, stream, kind, entity_id, user_email, origin, payload, created_at = row
+        return {
+            "partition": partition,
+            "seq": int(seq),
+            "stream": stream,
+            "kind": kind,
+            "entity_id": entity_id,
+            "user_email": user_email,
+            "origin": origin,
+            "data": json.loads(payload) if payload else None,
+            "created_at": str(created_at),
+        }
+
+    def read(self, partition: int, after: int = 0, limit: int = 500,
+             streams: Optional[List[str]] = None, user_email: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Eventos da partição com seq > `after`; com `user_email`, só os do
+        usuário e os sem dono (progresso, resets). Com `streams`, os resets
+        globais ('*') também entram"""
+        conditions, params = ["seq > ?"], [after]
+        if streams:
+            conditions.append(f"(stream IN ({', '.join('?' * len(streams))}) OR stream = '*')")
+            params += streams
+        if user_email is not None:
+            conditions.append("(user_email IS NULL OR user_email = ?)")
+            params.append(user_email)
+        conn = self._backend(partition).connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT {self.COLUMNS} FROM event_log WHERE {' AND '.join(conditions)} ORDER BY seq LIMIT ?",
+                (*params, limit)
+            )
+            return [self._event(partition, row) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+    def heads(self) -> List[int]:
+        """Último seq de cada partição"""
+        results = []
+        for backend in self.partitions:
+            conn = backend.connect()
+            try:
+                results.append(self._head(conn.cursor()))
+            finally:
+                conn.close()
+        return results
+
+    def _head(self, cursor) -> int:
+        # Com o log todo compactado o último seq é o do snapshot
+        cursor.execute("SELECT MAX(seq) FROM event_log")
+        head = cursor.fetchone()[0]
+        return int(head) if head is not None else self._compacted_through(cursor)
+
+    @staticmethod
+    def _compacted_through(cursor) -> int:
+        cursor.execute("SELECT value FROM event_log_context WHERE name = 'compacted_through'")
+        row = cursor.fetchone()
+        return int(row[0]) if row and row[0] is not None else 0
+
+    def compacted_through(self) -> List[int]:
+        """Último seq já incorporado ao snapshot em cada partição"""
+        results = []
+        for backend in self.partitions:
+            conn = backend.connect()
+            try:
+                results.append(self._compacted_through(conn.cursor()))
+            finally:
+                conn.close()
+        return results
+
+    def get_checkpoint(self, consumer: str, partition: int) -> int:
+        conn = self._backend(partition).connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT seq FROM event_checkpoints WHERE consumer = ? AND log_partition = ?",
+                (consumer, partition)
+            )
+            row = cursor.fetchone()
+            return int(row[0]) if row else 0
+        finally:
+            conn.close()
+
+    @staticmethod
+    def commit_checkpoint(cursor, consumer: str, partition: int, seq: int):
+        """Grava o checkpoint com o cursor do chamador, permitindo commit
+        atômico junto com o estado derivado"""
+        cursor.execute("""
+            INSERT INTO event_checkpoints (consumer, log_partition, seq) VALUES (?, ?, ?)
+            ON CONFLICT(consumer, log_partition) DO UPDATE SET
+                seq = excluded.seq, updated_at = CURRENT_TIMESTAMP
+        """, (consumer, partition, seq))
+
+    def checkpoints(self) -> List[Dict[str, Any]]:
+        results = []
+        for partition, backend in enumerate(self.partitions):
+            conn = backend.connect()
+            try:
+                cursor = conn.cursor()
+                cursor.execute("SELECT consumer, seq, updated_at FROM event_checkpoints ORDER BY consumer")
+                results += [
+                    {"consumer": consumer, "partition": partition, "seq": int(seq), "updated_at": str(updated_at)}
+                    for consumer, seq, updated_at in cursor.fetchall()
+                ]
+            finally:
+                conn.close()
+        return results
+
+    def tail(self, consumer: str, handler, streams: Optional[List[str]] = None) -> Dict[int, int]:
+        """Entrega a `handler(events)` os eventos novos de cada partição, em lotes,
+        avançando o checkpoint após cada lote (entrega at-least-once).
+
+        Eventos de outros streams não são entregues, mas o checkpoint passa
+        por eles, para não segurar a compactação da partição.
+        """
+        processed = {}
+        for partition, backend in enumerate(self.partitions):
+            conn = backend.connect()
+            try:
+                cursor = conn.cursor()
+                head = self._head(cursor)
+                compacted = self._compacted_through(cursor)
+            finally:
+                conn.close()
+            after = self.get_checkpoint(consumer, partition)
+            if 0 < after < compacted:
+                logger.warning(
+                    f"Consumidor {consumer} parou antes da compactação da partição {partition} "
+                    f"(checkpoint {after}, compactado até {compacted}): eventos perdidos"
+                )
+            count = 0
+            while True:
+                events = self.read(partition, after, self.batch_size, streams)
+                if not events:
+                    break
+                handler(events)
+                after = events[-1]["seq"]
+                count += len(events)
+                self._save_checkpoint(backend, consumer, partition, after)
+            if head > after:
+                self._save_checkpoint(backend, consumer, partition, head)
+            processed[partition] = count
+        return processed
+
+    def _save_checkpoint(self, backend: StorageBackend, consumer: str, partition: int, seq: int):
+        conn = backend.connect()
+        try:
+            self.commit_checkpoint(conn.cursor(), consumer, partition, seq)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _scan(self, cursor, partition: int, streams: Optional[List[str]] = None,
+              after: int = 0, through: Optional[int] = None):
+        """Varredura sequencial do log (seq em (`after`, `through`]) em blocos de `batch_size`"""
+        query = f"SELECT {self.COLUMNS} FROM event_log WHERE seq > ?"
+        params: List[Any] = [after]
+        if through is not None:
+            query += " AND seq <= ?"
+            params.append(through)
+        if streams:
+            query += f" AND (stream IN ({', '.join('?' * len(streams))}) OR stream = '*')"
+            params += streams
+        cursor.execute(query + " ORDER BY seq", tuple(params))
+        while True:
+            rows = cursor.fetchmany(self.batch_size)
+            if not rows:
+                break
+            yield [self._event(partition, row) for row in rows]
+
+    @staticmethod
+    def apply(state: Dict[str, Dict[str, Any]], stream: str, events: List[Dict[str, Any]]):
+        """Aplica eventos de `stream` ao estado materializado (id -> linha)"""
+        for event in events:
+            if event["kind"] == "reset" and event["stream"] in (stream, "*"):
+                state.clear()
+            elif event["stream"] != stream:
+                continue
+            elif event["kind"] == "delete":
+                state.pop(event["entity_id"], None)
+            else:
+                state[event["entity_id"]] = event["data"]
+
+    def materialize(self, partition: int, stream: str, cursor=None) -> Tuple[Dict[str, Dict[str, Any]], int]:
+        """Reconstrói por replay (a partir do snapshot) o conteúdo atual da tabela de `stream`"""
+        conn = None
+        if cursor is None:
+            conn = self._backend(partition).connect()
+            cursor = conn.cursor()
+        try:
+            last = self._compacted_through(cursor)
+            cursor.execute("SELECT entity_id, payload FROM event_snapshot WHERE stream = ?", (stream,))
+            state = {entity_id: json.loads(payload) for entity_id, payload in cursor.fetchall()}
+            for events in self._scan(cursor, partition, [stream], after=last):
+                self.apply(state, stream, events)
+                last = events[-1]["seq"]
+        finally:
+            if conn is not None:
+                conn.close()
+        return state, last
+
+    def compact(self, partition: int) -> Dict[str, Any]:
+        """Incorpora a event_snapshot os eventos até o menor checkpoint da
+        partição e os apaga do log. Sem consumidores nada é compactado."""
+        backend = self._backend(partition)
+        start = time.perf_counter()
+        # Exclui o replay de rebuild_goal_stats, que lê snapshot e log juntos
+        with self.db.route_lock.shared():
+            conn = backend.connect()
+            try:
+                cursor = conn.cursor()
+                backend.begin(cursor)
+                compacted = self._compacted_through(cursor)
+                cursor.execute("SELECT MIN(seq) FROM event_checkpoints")
+                target = cursor.fetchone()[0]
+                if target is None or int(target) <= compacted:
+                    conn.rollback()
+                    return {"partition": partition, "compacted_through": compacted, "events": 0}
+                target = int(target)
+
+                # Última versão de cada entidade tocada (None = apagada)
+                changes: Dict[Tuple[str, str], Optional[Tuple[Optional[str], Optional[str]]]] = {}
+                events = 0
+                reader = conn.cursor()
+                reader.execute(
+                    "SELECT stream, kind, entity_id, user_email, payload FROM event_log "
+                    "WHERE seq > ? AND seq <= ? ORDER BY seq",
+                    (compacted, target)
+                )
+                while True:
+                    rows = reader.fetchmany(self.batch_size)
+                    if not rows:
+                        break
+                    events += len(rows)
+                    for stream, kind, entity_id, user_email, payload in rows:
+                        if kind == "reset" and stream == "*":
+                            cursor.execute("DELETE FROM event_snapshot")
+                            changes.clear()
+                        elif kind == "reset":
+                            cursor.execute("DELETE FROM event_snapshot WHERE stream = ?", (stream,))
+                            changes = {key: value for key, value in changes.items() if key[0] != stream}
+                        elif kind == "delete":
+                            changes[(stream, entity_id)] = None
+                        else:
+                            changes[(stream, entity_id)] = (user_email, payload)
+
+                deleted = [key for key, value in changes.items() if value is None]
+                if deleted:
+                    cursor.executemany(
+                        "DELETE FROM event_snapshot WHERE stream = ? AND entity_id = ?", deleted
+                    )
+                upserts = [(*key, *value) for key, value in changes.items() if value is not None]
+                if upserts:
+                    cursor.executemany("""
+                        INSERT INTO event_snapshot (stream, entity_id, user_email, payload)
+                        VALUES (?, ?, ?, ?)
+                        ON CONFLICT(stream, entity_id) DO UPDATE SET
+                            user_email = excluded.user_email, payload = excluded.payload
+                    """, upserts)
+                cursor.execute("DELETE FROM event_log WHERE seq <= ?", (target,))
+                cursor.execute(
+                    "UPDATE event_log_context SET value = ? WHERE name = 'compacted_through'", (str(target),)
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
+        logger.info(f"Log de eventos da partição {partition} compactado até {target} ({events} eventos)")
+        return {
+            "partition": partition,
+            "compacted_through": target,
+            "events": events,
+            "seconds": round(time.perf_counter() - start, 4),
+        }
+
+    def compact_all(self) -> List[Dict[str, Any]]:
+        return [self.compact(partition) for partition in range(len(self.partitions))]
+
+    def rebuild_goal_stats(self) -> List[Dict[str, Any]]:
+        """Recalcula goal_stats_* de cada partição por replay do log, com as
+        escritas de metas bloqueadas. Partições cujo replay diverge de
+        weekly_goals mantêm os agregados atuais (a transação é desfeita)"""
+        results = []
+        with self.db.route_lock.exclusive():
+            for partition, backend in enumerate(self.partitions):
+                start = time.perf_counter()
+                conn = backend.connect()
+                try:
+                    cursor = conn.cursor()
+                    backend.begin(cursor)
+                    goals, last = self.materialize(partition, "goals", cursor)
+
+                    weekly: Dict[Tuple[str, str], List[float]] = {}
+                    for goal in goals.values():
+                        stats = weekly.setdefault((goal["created_by"], str(goal["week_start"])[:10]), [0, 0, 0.0, 0.0])
+                        stats[0] += 1
+                        stats[1] += 1 if goal["completed"] else 0
+                        stats[2] += goal["target_value"] or 0
+                        stats[3] += goal["actual_value"] or 0
+                    per_user: Dict[str, List[float]] = {}
+                    for (user, _), stats in weekly.items():
+                        totals = per_user.setdefault(user, [0, 0, 0.0, 0.0])
+                        for i, value in enumerate(stats):
+                            totals[i] += value
+
+                    cursor.execute("SELECT COUNT(*) FROM weekly_goals")
+                    table_rows = int(cursor.fetchone()[0])
+                    consistent = table_rows == len(goals)
+                    if consistent:
+                        cursor.execute("DELETE FROM goal_stats_weekly")
+                        cursor.execute("DELETE FROM goal_stats_user")
+                        cursor.executemany("""
+                            INSERT INTO goal_stats_weekly
+                                (created_by, week_start, goals_set, goals_completed, target_sum, actual_sum)
+                            VALUES (?, ?, ?, ?, ?, ?)
+                        """, [(user, week, *stats) for (user, week), stats in weekly.items()])
+                        cursor.executemany("""
+                            INSERT INTO goal_stats_user
+                                (created_by, goals_set, goals_completed, target_sum, actual_sum)
+                            VALUES (?, ?, ?, ?, ?)
+                        """, [(user, *totals) for user, totals in per_user.items()])
+                        conn.commit()
+                    else:
+                        conn.rollback()
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    conn.close()
+                if not consistent:
+                    logger.warning(
+                        f"Replay da partição {partition} divergiu de weekly_goals "
+                        f"({len(goals)} x {table_rows} linhas); agregados mantidos"
+                    )
+                results.append({
+                    "partition": partition,
+                    "replayed_through": last,
+                    "goals": len(goals),
+                    "weeks": len(weekly),
+                    "users": len(per_user),
+                    "consistent": consistent,
+                    "seconds": round(time.perf_counter() - start, 4),
+                })
+        return results
+
+# Cache colunar do histórico de progresso
+class ProgressColumnStore:
+    """Cópia append-only de progress_history (mais as linhas já arquivadas) em
+    arquivos .npy mapeados em memória.
+
+    Cada coluna numérica vive em `<directory>/<coluna>.npy` (capacidade
+    pré-alocada, crescendo em dobro) e as datas são guardadas como dias desde
+    1970-01-01 (int32). `meta.json` registra quantas linhas são válidas e as
+    versões de data_versions já refletidas, incluindo o identificador da
+    instância do banco. Inserções novas são anexadas incrementalmente;
+    UPDATE/DELETE no banco ou um banco recriado forçam reconstrução completa.
+    """
+
+    COLUMNS = {
+        "day": np.int32,
+        "progress_value": np.float64,
+        "daily_increment": np.float64,
+        "week_number": np.int32,
+        "month_number": np.int32,
+        "goals_completed": np.int32,
+    }
+    MIN_CAPACITY = 1024
+
+    def __init__(self, db: DatabaseManager, directory: str):
+        self.db = db
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._maps: Dict[str, np.ndarray] = {}
+        self._maps_generation = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _load_meta(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path("meta.json")) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not all(os.path.exists(self._path(f"{c}.npy")) for c in self.COLUMNS):
+            return None
+        return meta
+
+    def _save_meta(self, meta: Dict[str, Any]):
+        tmp = self._path("meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._path("meta.json"))
+
+    def _archived_rows(self, conn) -> pd.DataFrame:
+        """Linhas de progress_history já movidas para history_archive"""
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT payload FROM history_archive
+            WHERE source = 'progress_history'
+            ORDER BY partition_start
+        """)
+        frames = [
+            pd.DataFrame(rows, columns=columns)
+            for columns, rows in map(RetentionManager._decode, [row[0] for row in cursor.fetchall()])
+        ]
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+
+    def _fetch_rows(self, conn, after_id: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Lê linhas do banco e converte para colunas (datas viram dias int32).
+
+        A leitura completa inclui as linhas arquivadas pela retenção: o
+        arquivamento tira linhas da tabela quente, não do histórico analisado.
+        """
+        query = """
+            SELECT id, date, progress_value, daily_increment, week_number,
+                   month_number, goals_completed
+            FROM progress_history
+        """
+        if after_id is None:
+            df = self.db.read_dataframe(conn, query + " ORDER BY date, id")
+            archived = self._archived_rows(conn)
+            if not archived.empty:
+                archived = archived.reindex(columns=df.columns)
+                df = pd.concat([archived, df], ignore_index=True)
+                df["date"] = df["date"].astype(str).str[:10]
+                df = df.sort_values(["date", "id"], kind="stable", ignore_index=True)
+        else:
+            df = self.db.read_dataframe(conn, query + " WHERE id > ? ORDER BY id", (after_id,))
+
+        if df.empty:
+            return {"id": np.empty(0, dtype=np.int64), **{c: np.empty(0, dtype=t) for c, t in self.COLUMNS.items()}}
+
+        days = df["date"].astype(str).str[:10].to_numpy(dtype="datetime64[D]").astype(np.int64)
+        as_float = lambda column: df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+        as_int = lambda column: df[column].fillna(0).to_numpy(dtype=np.int32)
+
+        return {
+            "id": df["id"].to_numpy(dtype=np.int64),
+            "day": days.astype(np.int32),
+            "progress_value": as_float("progress_value"),
+            "daily_increment": as_float("daily_increment"),
+            "week_number": as_int("week_number"),
+            "month_number": as_int("month_number"),
+            "goals_completed": as_int("goals_completed"),
+        }
+
+    def _write_columns(self, columns: Dict[str, np.ndarray], start: int, capacity: int, grow: bool):
+        """Grava `columns` a partir da linha `start`, realocando os arquivos se preciso"""
+        from numpy.lib.format import open_memmap
+        for name, dtype in self.COLUMNS.items():
+            path = self._path(f"{name}.npy")
+            if grow:
+                tmp = self._path(f"{name}.npy.tmp")
+                target = open_memmap(tmp, mode="w+", dtype=dtype, shape=(capacity,))
+                if start:
+                    target[:start] = np.load(path, mmap_mode="r")[:start]
+            else:
+                target = open_memmap(path, mode="r+")
+            target[start:start + len(columns[name])] = columns[name]
+            target.flush()
+            del target
+            if grow:
+                os.replace(tmp, path)
+
+    def _rebuild(self, conn, versions: Dict[str, int], previous: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        columns = self._fetch_rows(conn)
+        rows = len(columns["day"])
+        capacity = max(self.MIN_CAPACITY, 2 * rows)
+        self._write_columns(columns, 0, capacity, grow=True)
+        meta = {
+            "rows": rows,
+            "capacity": capacity,
+            "last_id": int(columns["id"].max()) if rows else 0,
+            "versions": versions,
+            # generation muda quando os arquivos são trocados; epoch, quando
+            # o conteúdo deixa de ser um prefixo do anterior
+            "generation": (previous["generation"] if previous else 0) + 1,
+            "epoch": (previous.get("epoch", 0) if previous else 0) + 1,
+        }
+        self._save_meta(meta)
+        logger.info(f"Cache colunar reconstruído: {rows} linhas")
+        return meta
+
+    def sync(self) -> Dict[str, Any]:
+        """Garante que os arquivos refletem o banco; custo O(1) quando nada mudou"""
+        with self._lock:
+            conn = self.db.get_connection()
+            try:
+                cursor = conn.cursor()
+                versions = self.db.get_data_versions(cursor, PROGRESS_VERSION_NAMES)
+                meta = self._load_meta()
+
+                if meta is not None and meta["versions"] == versions:
+                    return meta
+
+                if (meta is None or
+                        meta["versions"].get(DB_INSTANCE_NAME) != versions.get(DB_INSTANCE_NAME) or
+                        meta["versions"].get("progress_history_rewrites") != versions.get("progress_history_rewrites")):
+                    return self._rebuild(conn, versions, meta)
+
+                new = self._fetch_rows(conn, after_id=meta["last_id"])
+                rows = meta["rows"]
+                added = len(new["day"])
+
+                if added:
+                    last_day = np.load(self._path("day.npy"), mmap_mode="r")[rows - 1] if rows else None
+                    # Só anexa se a ordem por data for preservada
+                    if (np.any(np.diff(new["day"]) < 0) or
+                            (last_day is not None and new["day"][0] < last_day)):
+                        return self._rebuild(conn, versions, meta)
+
+                    grow = rows + added > meta["capacity"]
+                    if grow:
+                        meta["capacity"] = max(2 * meta["capacity"], rows + added)
+                        meta["generation"] += 1
+                    self._write_columns(new, rows, meta["capacity"], grow=grow)
+                    meta["rows"] = rows + added
+                    meta["last_id"] = int(new["id"].max())
+
+                meta["versions"] = versions
+                self._save_meta(meta)
+                return meta
+            finally:
+                conn.close()
+
+    def snapshot(self) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+        """Metadados e visões somente-leitura (sem cópia) das colunas válidas"""
+        meta = self.sync()
+        with self._lock:
+            if self._maps_generation != meta["generation"]:
+                self._maps = {
+                    name: np.load(self._path(f"{name}.npy"), mmap_mode="r")
+                    for name in self.COLUMNS
+                }
+                self._maps_generation = meta["generation"]
+            return meta, {name: array[:meta["rows"]] for name, array in self._maps.items()}
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """Visões somente-leitura (sem cópia) das colunas válidas"""
+        return self.snapshot()[1]
+
+# Série temporal compacta para features de janela móvel
+
+class _RingWindow:
+    """Janela deslizante de tamanho fixo com soma e soma dos quadrados correntes"""
+
+    __slots__ = ("values", "size", "pos", "count", "sum", "sumsq")
+
+    def __init__(self, size: int):
+        self.values = np.zeros(size, dtype=np.float64)
+        self.size = size
+        self.pos = 0
+        self.count = 0
+        self.sum = 0.0
+        self.sumsq = 0.0
+
+    def push(self, value: float):
+        if self.count == self.size:
+            old = self.values[self.pos]
+            self.sum -= old
+            self.sumsq -= old * old
+        else:
+            self.count += 1
+
+        self.values[self.pos] = value
+        self.sum += value
+        self.sumsq += value * value
+        self.pos = (self.pos + 1) % self.size
+
+        # A cada volta completa, recalcula as somas para não acumular erro
+        if self.pos == 0 and self.count == self.size:
+            self.sum = float(self.values.sum())
+            self.sumsq = float(np.dot(self.values, self.values))
+
+    @property
+    def full(self) -> bool:
+        return self.count == self.size
+
+    def mean(self) -> float:
+        return self.sum / self.count if self.full else np.nan
+
+    def std(self) -> float:
+        """Desvio padrão amostral (ddof=1, como o rolling().std() do pandas)"""
+        if not self.full or self.count < 2:
+            return np.nan
+        variance = (self.sumsq - self.sum * self.sum / self.count) / (self.count - 1)
+        return float(np.sqrt(max(variance, 0.0)))
+
+class RollingProgressSeries:
+    """Mantém as features de MLAnalyticsEngine em O(1) por dia anexado.
+
+    Equivalente às janelas do `prepare_features`: média de 7 dias do
+    incremento, soma de 7 dias de metas, momentum (média de 14 dias da
+    aceleração) e consistência (1 / (1 + CV) do incremento em 14 dias).
+    """
+
+    def __init__(self, start_date: date = PROJECT_START_DATE):
+        self.start_day = (start_date - date(1970, 1, 1)).days
+        self.count = 0
+        self.increment_14 = _RingWindow(14)
+        self.increment_7 = _RingWindow(7)
+        self.acceleration_14 = _RingWindow(14)
+        self.goals_7 = _RingWindow(7)
+        self.last_day = None
+        self.last_progress = None
+        self.last_increment = None
+        self.last_week_number = 0
+        self.last_month_number = 0
+
+    def append(self, day: int, progress_value: float, week_number: int,
+               month_number: int, goals_completed: int):
+        """Anexa um dia (`day` em dias desde 1970-01-01)"""
+        if self.last_progress is not None:
+            increment = progress_value - self.last_progress
+            self.increment_14.push(increment)
+            self.increment_7.push(increment)
+            if self.last_increment is not None:
+                self.acceleration_14.push(increment - self.last_increment)
+            self.last_increment = increment
+
+        self.goals_7.push(goals_completed)
+        self.last_progress = progress_value
+        self.last_day = day
+        self.last_week_number = week_number
+        self.last_month_number = month_number
+        self.count += 1
+
+    def extend(self, arrays: Dict[str, np.ndarray], start: int = 0, stop: Optional[int] = None):
+        """Anexa as linhas `start:stop` das colunas do ProgressColumnStore"""
+        rows = zip(
+            arrays["day"][start:stop].tolist(),
+            arrays["progress_value"][start:stop].tolist(),
+            arrays["week_number"][start:stop].tolist(),
+            arrays["month_number"][start:stop].tolist(),
+            arrays["goals_completed"][start:stop].tolist(),
+        )
+        for row in rows:
+            self.append(*row)
+
+    def features(self) -> Dict[str, float]:
+        """Features do último dia, com os mesmos preenchimentos de prepare_features"""
+        momentum = self.acceleration_14.mean()
+        mean_14 = self.increment_14.mean()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            consistency = 1 / (1 + self.increment_14.std() / mean_14)
+        avg_daily = self.increment_7.mean()
+
+        return {
+            "days_elapsed": float(self.last_day - self.start_day) if self.count else 0.0,
+            "week_number": float(self.last_week_number),
+            "month_number": float(self.last_month_number),
+            "goals_completed_week": float(self.goals_7.sum) if self.goals_7.full else 0.0,
+            "avg_daily_progress": 0.0 if np.isnan(avg_daily) else float(avg_daily),
+            "momentum_score": 0.0 if np.isnan(momentum) else float(momentum),
+            "consistency_score": 0.5 if np.isnan(consistency) else float(consistency),
+        }
+
+    def feature_vector(self, feature_columns: List[str]) -> np.ndarray:
+        features = self.features()
+        return np.array([features[name] for name in feature_columns], dtype=np.float64)
+
+# Detecção de anomalias em streaming
+ANOMALIES_TABLE = """
+    CREATE TABLE IF NOT EXISTS progress_anomalies (
+        day DATE PRIMARY KEY,
+        value REAL NOT NULL,
+        ewma_mean REAL,
+        ewma_std REAL,
+        z_score REAL,
+        robust_z REAL,
+        method TEXT NOT NULL,
+        detected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+class StreamingAnomalyDetector:
+    """Detector online sobre o incremento diário do progresso.
+
+    Combina média/variância EWMA (acompanha mudanças de regime) com
+    mediana/MAD de uma janela recente (robusto a outliers). Cada dia é
+    avaliado contra o estado anterior e depois incorporado, em O(janela)
+    constante; os contadores ficam prontos para servir em O(1).
+    """
 
-class MLPrediction(BaseModel):
-    predicted_progress: float
-    confidence_interval: Dict[str, float]
-    success_probability: float
-    recommendations: List[str]
-    risk_factors: List[str]
-    optimal_weekly_target: float
+    def __init__(self, alpha: float = 0.1, z_threshold: float = 4.0,
+                 robust_threshold: float = 5.0, window: int = 28, warmup: int = 14):
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.robust_threshold = robust_threshold
+        self.warmup = warmup
+        self.window = deque(maxlen=window)
+        self.count = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.last_progress = None
+        self.total_flagged = 0
+        self.last_anomaly: Optional[Dict[str, Any]] = None
+
+    def update(self, day: int, progress_value: float) -> Optional[Dict[str, Any]]:
+        """Consome um dia; devolve o registro da anomalia quando o dia é sinalizado"""
+        previous = self.last_progress
+        self.last_progress = progress_value
+        if previous is None:
+            return None
+        value = progress_value - previous
+        if not np.isfinite(value):
+            return None
+
+        anomaly = None
+        if self.count >= self.warmup:
+            std = float(np.sqrt(self.var))
+            z_score = (value - self.mean) / std if std > 0 else 0.0
+            median = float(np.median(self.window))
+            mad = float(np.median(np.abs(np.asarray(self.window) - median))) * 1.4826
+            robust_z = (value - median) / mad if mad > 0 else 0.0
+
+            by_ewma = abs(z_score) > self.z_threshold
+            by_mad = abs(robust_z) > self.robust_threshold
+            if by_ewma or by_mad:
+                anomaly = {
+                    "day": str(np.datetime64(int(day), "D")),
+                    "value": float(value),
+                    "ewma_mean": self.mean,
+                    "ewma_std": std,
+                    "z_score": float(z_score),
+                    "robust_z": float(robust_z),
+                    "method": "both" if by_ewma and by_mad else ("ewma" if by_ewma else "mad"),
+                }
+                self.total_flagged += 1
+                self.last_anomaly = anomaly
 
-class AnalyticsResponse(BaseModel):
-    current_progress: float
-    ml_prediction: MLPrediction
-    weekly_performance: Dict[str, Any]
-    trends: Dict[str, Any]
-    kpi_analysis: Dict[str, Any]
-    goal_completion_rate: float
+        # Incorpora o valor (inclusive anomalias, para acompanhar mudanças de regime)
+        if self.count == 0:
+            self.mean = value
+        else:
+            delta = value - self.mean
+            self.mean += self.alpha * delta
+            self.var = (1 - self.alpha) * (self.var + self.alpha * delta * delta)
+        self.window.append(value)
+        self.count += 1
+        return anomaly
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "observations": self.count,
+            "anomalies_detected": self.total_flagged,
+            "ewma_mean": self.mean,
+            "ewma_std": float(np.sqrt(self.var)),
+            "last_anomaly": self.last_anomaly,
+        }
 
-# Database Setup
-class DatabaseManager:
-    def __init__(self, db_path: str = "analytics.db"):
-        self.db_path = db_path
-        self.init_database()
+# Monitoramento de drift das features e dos resíduos
+class DriftReference:
+    """Retrato compacto dos dados de treino: histograma por quantis de cada coluna.
 
-    def init_database(self):
-        """Inicializa o banco de dados"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    Guarda só as bordas internas dos bins, as proporções por bin e o
+    intervalo [min, max] observado; o treino não precisa ser reprocessado
+    para comparar janelas novas.
+    """
 
-        # Tabela de metas semanais
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS weekly_goals (
-                id TEXT PRIMARY KEY,
-                week_start DATE NOT NULL,
-                week_end DATE NOT NULL,
-                description TEXT NOT NULL,
-                target_value REAL NOT NULL,
-                actual_value REAL,
-                completed BOOLEAN,
-                completed_date DATETIME,
-                created_by TEXT NOT NULL,
-                category TEXT DEFAULT 'general',
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+    def __init__(self, X: np.ndarray, residuals: np.ndarray, feature_columns: List[str], bins: int = 10):
+        self.feature_columns = list(feature_columns)
+        self.bins = bins
+        X = np.asarray(X, dtype=np.float64)
+        self.rows = len(X)
+        self.minimum = X.min(axis=0)
+        self.maximum = X.max(axis=0)
+        self.edges = [self._edges(X[:, j]) for j in range(X.shape[1])]
+        self.proportions = [self._proportions(X[:, j], self.edges[j]) for j in range(X.shape[1])]
+
+        residuals = np.asarray(residuals, dtype=np.float64)
+        self.residual_rows = len(residuals)
+        self.residual_mae = float(np.abs(residuals).mean()) if len(residuals) else 0.0
+        self.residual_std = float(residuals.std()) if len(residuals) else 0.0
+        self.residual_edges = self._edges(residuals)
+        self.residual_proportions = self._proportions(residuals, self.residual_edges)
+
+    def _edges(self, values: np.ndarray) -> np.ndarray:
+        if len(values) == 0:
+            return np.empty(0)
+        quantiles = np.quantile(values, np.linspace(0, 1, self.bins + 1)[1:-1])
+        return np.unique(quantiles)
+
+    @staticmethod
+    def _proportions(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+        counts = np.bincount(np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1)
+        return counts / max(counts.sum(), 1)
+
+class DriftMonitor:
+    """Compara uma janela recente de features/resíduos com o retrato do treino.
+
+    A janela é um buffer circular das últimas `window` linhas de features
+    (as mesmas do RollingProgressSeries) e do valor real; a avaliação custa
+    um predict de `window` linhas mais alguns histogramas.
+
+    - features comportamentais: PSI e KS sobre os bins de quantis do treino;
+    - features de calendário (crescem ou ciclam com o tempo, então a janela
+      recente nunca tem a distribuição do treino): fração da janela fora do
+      intervalo visto no treino;
+    - resíduos do melhor modelo: razão do MAE contra o do teste, viés em
+      desvios padrão e PSI.
+
+    As features são médias móveis e os resíduos de uma série acumulada são
+    autocorrelacionados; KS e viés usam o tamanho efetivo da amostra
+    (n * (1 - r1) / (1 + r1), com r1 a autocorrelação de lag 1) para não
+    disparar retreinos com dados estáveis.
+    """
 
-        # Tabela de histórico de progresso
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS progress_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date DATE NOT NULL,
-                progress_value REAL NOT NULL,
-                daily_increment REAL,
-                week_number INTEGER,
-                month_number INTEGER,
-                goals_completed INTEGER DEFAULT 0,
-                notes TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+    CALENDAR_FEATURES = ("days_elapsed", "week_number", "month_number")
+
+    def __init__(self, window: int = 90, min_observations: int = 28, psi_threshold: float = 0.25,
+                 range_threshold: float = 0.5, mae_ratio_threshold: float = 2.0, bias_threshold: float = 3.0):
+        self.window = window
+        self.min_observations = min_observations
+        self.psi_threshold = psi_threshold
+        self.range_threshold = range_threshold
+        self.mae_ratio_threshold = mae_ratio_threshold
+        self.bias_threshold = bias_threshold
+        self.reset()
+
+    def reset(self):
+        self.X: Optional[np.ndarray] = None
+        self.y = np.zeros(self.window, dtype=np.float64)
+        self.pos = 0
+        self.count = 0
+
+    def observe(self, X: np.ndarray, y: np.ndarray):
+        """Anexa linhas (features não normalizadas, valor real) à janela"""
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))[-self.window:]
+        y = np.asarray(y, dtype=np.float64)[-self.window:]
+        if self.X is None:
+            self.X = np.zeros((self.window, X.shape[1]), dtype=np.float64)
+        slots = (self.pos + np.arange(len(X))) % self.window
+        self.X[slots] = X
+        self.y[slots] = y
+        self.pos = (self.pos + len(X)) % self.window
+        self.count = min(self.count + len(X), self.window)
+
+    def recent(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Janela em ordem cronológica"""
+        if self.count < self.window:
+            return self.X[:self.count], self.y[:self.count]
+        order = np.roll(np.arange(self.window), -self.pos)
+        return self.X[order], self.y[order]
+
+    @staticmethod
+    def psi(expected: np.ndarray, actual: np.ndarray, eps: float = 1e-4) -> float:
+        expected = np.clip(expected, eps, None)
+        actual = np.clip(actual, eps, None)
+        return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+    @staticmethod
+    def effective_size(values: np.ndarray) -> float:
+        n = len(values)
+        if n < 3 or np.std(values) == 0:
+            return float(n)
+        r1 = float(np.corrcoef(values[:-1], values[1:])[0, 1])
+        r1 = min(max(r1 if np.isfinite(r1) else 0.0, 0.0), 0.99)
+        return max(n * (1 - r1) / (1 + r1), 1.0)
+
+    @staticmethod
+    def ks(expected: np.ndarray, actual: np.ndarray) -> float:
+        """KS sobre as CDFs binadas (limite inferior do KS exato)"""
+        return float(np.abs(np.cumsum(expected) - np.cumsum(actual)).max())
+
+    def evaluate(self, engine: "MLAnalyticsEngine") -> Dict[str, Any]:
+        reference: Optional[DriftReference] = getattr(engine, "drift_reference", None)
+        report: Dict[str, Any] = {
+            "model_version": engine.model_version,
+            "observations": self.count,
+            "window": self.window,
+            "should_retrain": False,
+            "reasons": [],
+        }
+        if reference is None or not engine.is_trained:
+            report["status"] = "no_reference"
+            return report
+        if self.count < self.min_observations:
+            report["status"] = "warming_up"
+            return report
+
+        X, y = self.recent()
+        n = len(X)
+        features = {}
+        for j, name in enumerate(reference.feature_columns):
+            column = X[:, j]
+            if name in self.CALENDAR_FEATURES:
+                outside = (column < reference.minimum[j]) | (column > reference.maximum[j])
+                score = float(outside.mean())
+                drifted = score > self.range_threshold
+                features[name] = {"kind": "calendar", "out_of_range": score, "drifted": drifted}
+            else:
+                actual = DriftReference._proportions(column, reference.edges[j])
+                psi = self.psi(reference.proportions[j], actual)
+                ks = self.ks(reference.proportions[j], actual)
+                n_eff = self.effective_size(column)
+                ks_critical = float(1.36 * np.sqrt((reference.rows + n_eff) / (reference.rows * n_eff)))
+                drifted = psi > self.psi_threshold and ks > ks_critical
+                features[name] = {
+                    "kind": "distribution", "psi": psi, "ks": ks, "ks_critical": ks_critical,
+                    "effective_size": n_eff, "drifted": drifted,
+                }
+            if drifted:
+                report["reasons"].append(f"feature:{name}")
+
+        predictions = engine.predict_batch(X)[engine.best_model]
+        residuals = y - predictions
+        mae = float(np.abs(residuals).mean())
+        mae_ratio = mae / max(reference.residual_mae, 1e-12)
+        residual_n_eff = self.effective_size(residuals)
+        bias_z = (
+            float(residuals.mean() / (reference.residual_std / np.sqrt(residual_n_eff)))
+            if reference.residual_std > 0 else 0.0
+        )
+        residual_psi = self.psi(
+            reference.residual_proportions, DriftReference._proportions(residuals, reference.residual_edges)
+        )
+        if mae_ratio > self.mae_ratio_threshold:
+            report["reasons"].append("residuals:mae")
+        if abs(bias_z) > self.bias_threshold:
+            report["reasons"].append("residuals:bias")
+
+        report.update({
+            "status": "drift" if report["reasons"] else "stable",
+            "should_retrain": bool(report["reasons"]),
+            "features": features,
+            "residuals": {
+                "mae": mae,
+                "reference_mae": reference.residual_mae,
+                "mae_ratio": float(mae_ratio),
+                "bias_z": bias_z,
+                "effective_size": residual_n_eff,
+                "psi": residual_psi,
+            },
+        })
+        return report
 
-        # Tabela de previsões ML
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS ml_predictions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                prediction_date DATE NOT NULL,
-                predicted_final_value REAL,
-                confidence_score REAL,
-                model_used TEXT,
-                features_used TEXT,
-                actual_progress REAL,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+# Downsampling de séries para gráficos
+def downsample_lttb(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """Índices escolhidos pelo Largest-Triangle-Three-Buckets.
 
-        conn.commit()
-        conn.close()
-        logger.info("Database initialized successfully")
+    Mantém o primeiro e o último ponto; em cada balde intermediário escolhe
+    o ponto que forma o maior triângulo com o ponto anterior escolhido e a
+    média do balde seguinte. O laço é por balde, vetorizado dentro dele.
+    """
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    selected = np.empty(points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    previous = 0
+    for i in range(points - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+            avg_x = x[next_start:next_end].mean()
+            avg_y = y[next_start:next_end].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+        bucket_x = x[start:end]
+        bucket_y = y[start:end]
+        area = np.abs(
+            (x[previous] - avg_x) * (bucket_y - y[previous])
+            - (x[previous] - bucket_x) * (avg_y - y[previous])
+        )
+        previous = start + int(np.argmax(np.nan_to_num(area, nan=-1.0))) if len(area) else start
+        selected[i + 1] = previous
+
+    return selected
+
+def downsample_minmax(y: np.ndarray, points: int) -> np.ndarray:
+    """Índices do mínimo e do máximo de cada balde (até `points` pontos no total)"""
+    n = len(y)
+    if points >= n or points < 2:
+        return np.arange(n)
+
+    buckets = max(1, points // 2)
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)[:-1]
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64))
+    offsets = np.arange(n) - np.repeat(edges, np.diff(np.append(edges, n)))
+    # Para cada balde: posição do mínimo e do máximo via reduceat
+    bucket_min = np.minimum.reduceat(y, edges)
+    bucket_max = np.maximum.reduceat(y, edges)
+    bucket_of = np.repeat(np.arange(buckets), np.diff(np.append(edges, n)))
+    is_min = y == bucket_min[bucket_of]
+    is_max = y == bucket_max[bucket_of]
+    first_min = edges + np.minimum.reduceat(np.where(is_min, offsets, n), edges)
+    first_max = edges + np.minimum.reduceat(np.where(is_max, offsets, n), edges)
+    return np.unique(np.concatenate([first_min, first_max]))
+
+# Simulação Monte Carlo do objetivo
+class MonteCarloSimulator:
+    """Simula trajetórias futuras do progresso diário por bootstrap.
+
+    O incremento diário é modelado como drift (média recente) + resíduo
+    sorteado com reposição dos resíduos históricos. Todas as trajetórias de
+    um bloco são geradas e acumuladas em uma única operação NumPy; só os
+    valores finais e alguns pontos amostrados da trajetória são mantidos, o
+    que limita a memória a `chunk_size x dias`. As faixas percentis da
+    trajetória usam as primeiras `trajectory_paths` trajetórias; a
+    probabilidade e os percentis finais usam todas.
+    """
 
-    def get_connection(self):
-        return sqlite3.connect(self.db_path)
+    PERCENTILES = [5, 25, 50, 75, 95]
+
+    def __init__(self, n_paths: int = 20000, history_window: int = 180, drift_window: int = 28,
+                 max_points: int = 60, chunk_size: int = 5000, trajectory_paths: int = 5000):
+        self.n_paths = n_paths
+        self.trajectory_paths = trajectory_paths
+        self.history_window = history_window
+        self.drift_window = drift_window
+        self.max_points = max_points
+        self.chunk_size = chunk_size
+
+    def simulate(self, progress_values: np.ndarray, days_remaining: int,
+                 target: float = TARGET_PROGRESS, n_paths: Optional[int] = None,
+                 seed: Optional[int] = None,
+                 on_chunk: Optional[Callable[[float], None]] = None) -> Dict[str, Any]:
+        n_paths = n_paths or self.n_paths
+        progress_values = np.asarray(progress_values, dtype=np.float64)
+        current = float(progress_values[-1]) if len(progress_values) else 0.0
+
+        increments = np.diff(progress_values)[-self.history_window:]
+        increments = increments[np.isfinite(increments)]
+
+        if days_remaining <= 0 or len(increments) < 2:
+            reached = current >= target
+            return {
+                "success_probability": 100.0 if reached else 0.0,
+                "expected_final": current,
+                "final_percentiles": {str(p): current for p in self.PERCENTILES},
+                "trajectory": {"days_ahead": [], "percentiles": {str(p): [] for p in self.PERCENTILES}},
+                "n_paths": 0,
+                "days_remaining": max(0, days_remaining),
+            }
+
+        drift = float(increments[-self.drift_window:].mean())
+        residuals = (increments - increments.mean()).astype(np.float32)
+
+        # Pontos da trajetória que são devolvidos (sempre inclui o último dia)
+        points = np.unique(np.linspace(0, days_remaining - 1, min(days_remaining, self.max_points)).astype(int))
+
+        rng = np.random.default_rng(seed)
+        finals = np.empty(n_paths, dtype=np.float64)
+        n_sampled = min(n_paths, self.trajectory_paths)
+        sampled = np.empty((n_sampled, len(points)), dtype=np.float64)
+
+        for start in range(0, n_paths, self.chunk_size):
+            size = min(self.chunk_size, n_paths - start)
+            steps = residuals[rng.integers(0, len(residuals), size=(size, days_remaining))]
+            steps += np.float32(drift)
+            paths = np.cumsum(steps, axis=1, dtype=np.float64)
+            finals[start:start + size] = current + paths[:, -1]
+            if start < n_sampled:
+                keep = min(size, n_sampled - start)
+                sampled[start:start + keep] = current + paths[:keep, points]
+            if on_chunk is not None:
+                on_chunk((start + size) / n_paths)
+
+        trajectory = np.percentile(sampled, self.PERCENTILES, axis=0)
+        final_percentiles = np.percentile(finals, self.PERCENTILES)
+
+        return {
+            "success_probability": float(np.mean(finals >= target) * 100),
+            "expected_final": float(finals.mean()),
+            "final_percentiles": {str(p): float(v) for p, v in zip(self.PERCENTILES, final_percentiles)},
+            "trajectory": {
+                "days_ahead": (points + 1).tolist(),
+                "percentiles": {
+                    str(p): [float(v) for v in row] for p, row in zip(self.PERCENTILES, trajectory)
+                },
+            },
+            "n_paths": n_paths,
+            "days_remaining": days_remaining,
+            "daily_drift": drift,
+        }
+
+# Inferência compilada dos modelos
+class CompiledTreeEnsemble:
+    """Ensemble de árvores achatado em arrays contíguos de nós.
+
+    Todas as árvores ficam concatenadas em `feature`, `threshold`, `left`,
+    `right` e `value`; folhas apontam para si mesmas, então a travessia é um
+    laço de `max_depth` passos vetorizados sobre (amostras x árvores). A soma
+    das árvores segue a mesma ordem sequencial do sklearn (via cumsum), o que
+    mantém o resultado idêntico bit a bit.
+    """
+
+    def __init__(self, trees: List[Any], scale: float, init: float, average: bool):
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for tree in trees:
+            n = tree.node_count
+            left = tree.children_left.astype(np.int64)
+            right = tree.children_right.astype(np.int64)
+            leaf = left == -1
+            own = np.arange(n, dtype=np.int64)
+
+            features.append(np.where(leaf, 0, tree.feature).astype(np.int64))
+            thresholds.append(np.where(leaf, 0.0, tree.threshold))
+            lefts.append(np.where(leaf, own, left) + offset)
+            rights.append(np.where(leaf, own, right) + offset)
+            values.append(tree.value[:, 0, 0].astype(np.float64))
+            roots.append(offset)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += n
+
+        self.feature = np.ascontiguousarray(np.concatenate(features))
+        self.threshold = np.ascontiguousarray(np.concatenate(thresholds))
+        self.left = np.ascontiguousarray(np.concatenate(lefts))
+        self.right = np.ascontiguousarray(np.concatenate(rights))
+        self.value = np.ascontiguousarray(np.concatenate(values))
+        self.roots = np.array(roots, dtype=np.int64)
+        self.max_depth = max_depth
+        self.scale = scale
+        self.init = init
+        self.average = average
+
+    @classmethod
+    def from_sklearn(cls, model) -> "CompiledTreeEnsemble":
+        if isinstance(model, RandomForestRegressor):
+            return cls([est.tree_ for est in model.estimators_], scale=1.0, init=0.0, average=True)
+        if isinstance(model, GradientBoostingRegressor):
+            if model.init_ == "zero":
+                init = 0.0
+            else:
+                init = float(np.asarray(model.init_.constant_).ravel()[0])
+            return cls([est[0].tree_ for est in model.estimators_],
+                       scale=model.learning_rate, init=init, average=False)
+        raise TypeError(f"Modelo não suportado: {type(model).__name__}")
+
+    def leaf_values(self, X: np.ndarray) -> np.ndarray:
+        """Valor da folha de cada árvore para cada amostra, shape (n, árvores)"""
+        # O sklearn avalia as árvores em float32
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(X.shape[0])[:, None]
+        node = np.broadcast_to(self.roots, (X.shape[0], len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.value[node]
+
+    def contributions(self, X: np.ndarray) -> Tuple[float, np.ndarray]:
+        """Contribuição de cada feature para cada previsão (decomposição por caminho).
+
+        Ao descer de um nó para o filho, a variação do valor do nó é atribuída
+        à feature do split; valor base + soma das contribuições = previsão.
+        """
+        X32 = np.asarray(X, dtype=np.float32)
+        n_trees = len(self.roots)
+        weight = 1.0 / n_trees if self.average else self.scale
+        rows = np.broadcast_to(np.arange(X32.shape[0])[:, None], (X32.shape[0], n_trees))
+        node = np.broadcast_to(self.roots, (X32.shape[0], n_trees)).copy()
+        contrib = np.zeros(X32.shape, dtype=np.float64)
+        for _ in range(self.max_depth):
+            feature = self.feature[node]
+            go_left = X32[rows, feature] <= self.threshold[node]
+            child = np.where(go_left, self.left[node], self.right[node])
+            # Folhas apontam para si mesmas: variação zero depois de chegar nelas
+            np.add.at(contrib, (rows, feature), (self.value[child] - self.value[node]) * weight)
+            node = child
+        root_values = self.value[self.roots]
+        base = root_values.mean() if self.average else self.init + self.scale * root_values.sum()
+        return float(base), contrib
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        leaves = self.leaf_values(X)
+        if self.average:
+            return np.cumsum(leaves, axis=1)[:, -1] / leaves.shape[1]
+        steps = np.empty((leaves.shape[0], leaves.shape[1] + 1))
+        steps[:, 0] = self.init
+        np.multiply(self.scale, leaves, out=steps[:, 1:])
+        return np.cumsum(steps, axis=1)[:, -1]
+
+class CompiledLinearModel:
+    def __init__(self, model):
+        self.coef = np.ascontiguousarray(model.coef_, dtype=np.float64)
+        self.intercept = float(model.intercept_)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return X @ self.coef + self.intercept
+
+    def contributions(self, X: np.ndarray) -> Tuple[float, np.ndarray]:
+        # Features já normalizadas (média zero no treino): contribuição = coef * x
+        return self.intercept, np.asarray(X, dtype=np.float64) * self.coef
+
+class CompiledScaler:
+    def __init__(self, scaler: StandardScaler):
+        self.mean = scaler.mean_.copy()
+        self.scale = scaler.scale_.copy()
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        X = np.array(X, dtype=np.float64)
+        X -= self.mean
+        X /= self.scale
+        return X
+
+def compile_model(model):
+    """Converte um modelo sklearn treinado para a forma compilada equivalente"""
+    if isinstance(model, (LinearRegression, Ridge)):
+        return CompiledLinearModel(model)
+    return CompiledTreeEnsemble.from_sklearn(model)
+
+# Seleção de modelos com orçamento (successive halving)
+class ModelSelector:
+    """Busca hiperparâmetros por successive halving sob um orçamento de CPU.
+
+    Todos os candidatos começam treinando em uma fração pequena dos dados;
+    a cada rodada só o melhor 1/`eta` continua, com `eta` vezes mais
+    amostras. O gradient boosting usa parada antecipada (n_iter_no_change).
+    Quando o orçamento (tempo de CPU desta thread) acaba, a busca para e usa
+    os resultados já medidos; o primeiro candidato de cada família é sempre
+    avaliado, para que nenhuma fique sem modelo.
+    """
+
+    def __init__(self, budget_seconds: float = 10.0, eta: int = 3, min_resource: int = 40,
+                 random_state: int = 42):
+        self.budget_seconds = budget_seconds
+        self.eta = eta
+        self.min_resource = min_resource
+        self.random_state = random_state
+
+    def candidates(self) -> List[Tuple[str, str, Any]]:
+        """(família, rótulo, estimador) — os baratos primeiro"""
+        rs = self.random_state
+        cands = [
+            ("baseline", "mean", DummyRegressor(strategy="mean")),
+            ("linear", "ols", LinearRegression()),
+        ]
+        for alpha in [0.1, 1.0, 10.0]:
+            cands.append(("linear", f"ridge_a{alpha}", Ridge(alpha=alpha)))
+        for n_estimators in [50, 100, 300]:
+            for max_depth in [None, 8]:
+                for min_samples_leaf in [1, 3]:
+                    cands.append((
+                        "random_forest",
+                        f"rf_n{n_estimators}_d{max_depth}_l{min_samples_leaf}",
+                        RandomForestRegressor(n_estimators=n_estimators, max_depth=max_depth,
+                                              min_samples_leaf=min_samples_leaf, random_state=rs),
+                    ))
+        for learning_rate in [0.03, 0.1, 0.3]:
+            for max_depth in [2, 3, 5]:
+                cands.append((
+                    "gradient_boost",
+                    f"gb_lr{learning_rate}_d{max_depth}",
+                    GradientBoostingRegressor(n_estimators=500, learning_rate=learning_rate,
+                                              max_depth=max_depth, n_iter_no_change=10,
+                                              validation_fraction=0.15, random_state=rs),
+                ))
+        return cands
+
+    def select(self, X: np.ndarray, y: np.ndarray) -> Dict[str, Any]:
+        """Retorna o melhor candidato (não treinado) de cada família e o relatório"""
+        # Só a CPU desta thread: treinos concorrentes no processo não consomem o orçamento
+        started = time.thread_time()
+        X_fit, X_val, y_fit, y_val = train_test_split(
+            X, y, test_size=0.25, random_state=self.random_state
+        )
+        order = np.random.default_rng(self.random_state).permutation(len(X_fit))
+        X_fit, y_fit = X_fit[order], y_fit[order]
+
+        candidates = self.candidates()
+        n = len(X_fit)
+        rungs = max(1, math.ceil(math.log(len(candidates), self.eta)))
+        resource = max(self.min_resource, n // self.eta ** (rungs - 1))
+
+        families = {family for family, _, _ in candidates}
+        # O primeiro (mais barato) de cada família abre a rodada 0
+        firsts = [next(i for i, c in enumerate(candidates) if c[0] == family)
+                  for family in dict.fromkeys(c[0] for c in candidates)]
+        survivors = firsts + [i for i in range(len(candidates)) if i not in firsts]
+        scores: Dict[int, Tuple[int, float]] = {}  # idx -> (rodada, r2)
+        report_rungs = []
+        exhausted = False
+
+        for rung in range(rungs + 1):
+            size = min(n, resource * self.eta ** rung)
+            evaluated = []
+            for idx in survivors:
+                if (time.thread_time() - started > self.budget_seconds and
+                        {candidates[i][0] for i in scores} >= families):
+                    exhausted = True
+                    break
+                _, _, estimator = candidates[idx]
+                model = clone(estimator)
+                model.fit(X_fit[:size], y_fit[:size])
+                score = r2_score(y_val, model.predict(X_val))
+                scores[idx] = (rung, score)
+                evaluated.append(idx)
+
+            report_rungs.append({"samples": int(size), "evaluated": len(evaluated)})
+            if exhausted or size >= n or len(evaluated) <= 1:
+                break
+            evaluated.sort(key=lambda i: scores[i][1], reverse=True)
+            survivors = evaluated[:max(1, math.ceil(len(evaluated) / self.eta))]
+
+        # Melhor por família: quem chegou mais longe e, entre esses, maior R²
+        best: Dict[str, int] = {}
+        for idx, (rung, score) in scores.items():
+            family = candidates[idx][0]
+            current = best.get(family)
+            if current is None or (rung, score) > scores[current]:
+                best[family] = idx
+
+        return {
+            "best_per_family": {
+                family: (candidates[idx][1], clone(candidates[idx][2])) for family, idx in best.items()
+            },
+            "report": {
+                "budget_seconds": self.budget_seconds,
+                "cpu_seconds": round(time.thread_time() - started, 3),
+                "candidates": len(candidates),
+                "evaluations": sum(r["evaluated"] for r in report_rungs),
+                "budget_exhausted": exhausted,
+                "rungs": report_rungs,
+                "validation_r2": {
+                    candidates[idx][1]: round(float(scores[idx][1]), 4) for idx in best.values()
+                },
+            },
+        }
 
 # Machine Learning Engine
 class MLAnalyticsEngine:
     def __init__(self):
         self.models = {}
         self.scalers = {}
+        self.compiled = {}
+        self.compiled_scaler = None
+        self.selector = ModelSelector(
+            budget_seconds=float(os.getenv("ANALYTICS_MODEL_SEARCH_BUDGET", "10"))
+        )
+        self.selection_report: Dict[str, Any] = {}
         self.is_trained = False
+        # Incrementado a cada troca de modelos (chave de caches e coalescência)
+        self.model_version = 0
+        # Calculado no treino e servido pronto em /api/ml-insights
+        self.feature_importance: Dict[str, Any] = {}
+        self.drift_reference: Optional[DriftReference] = None
         self.feature_columns = [
             'days_elapsed', 'week_number', 'month_number',
             'goals_completed_week', 'avg_daily_progress',
@@ -167,6 +3262,7 @@ class MLAnalyticsEngine:
     def prepare_features(self, df: pd.DataFrame) -> pd.DataFrame:
         """Prepara features para o modelo ML"""
         # Calcular features derivadas
+        df['days_elapsed'] = (df['date'] - pd.Timestamp(PROJECT_START_DATE)).dt.days
         df['momentum_score'] = self._calculate_momentum(df)
         df['consistency_score'] = self._calculate_consistency(df)
         df['avg_daily_progress'] = df['progress_value'].diff().rolling(7).mean()
@@ -210,19 +3306,26 @@ class MLAnalyticsEngine:
             X_train_scaled = self.scalers['main'].fit_transform(X_train)
             X_test_scaled = self.scalers['main'].transform(X_test)
 
-            # Treinar modelos
+            # Selecionar hiperparâmetros por família (successive halving com orçamento)
+            selection = self.selector.select(X_train_scaled, y_train)
+            self.selection_report = selection['report']
             models_config = {
-                'random_forest': RandomForestRegressor(n_estimators=100, random_state=42),
-                'gradient_boost': GradientBoostingRegressor(n_estimators=100, random_state=42),
-                'linear': LinearRegression()
+                family: estimator
+                for family, (label, estimator) in selection['best_per_family'].items()
+                if family != 'baseline'
+            }
+            self.selection_report['selected'] = {
+                family: label for family, (label, _) in selection['best_per_family'].items()
             }
 
             best_score = -np.inf
             best_model = None
+            test_predictions = {}
 
             for name, model in models_config.items():
                 model.fit(X_train_scaled, y_train)
                 predictions = model.predict(X_test_scaled)
+                test_predictions[name] = predictions
                 score = r2_score(y_test, predictions)
 
                 self.models[name] = {
@@ -236,7 +3339,13 @@ class MLAnalyticsEngine:
                     best_model = name
 
             self.best_model = best_model
+            self._compile_models(X_test_scaled, X_test)
+            self.feature_importance = self._compute_feature_importance(X_test_scaled, y_test)
+            self.drift_reference = DriftReference(
+                X.values, y_test - test_predictions[best_model], self.feature_columns
+            )
             self.is_trained = True
+            self.model_version += 1
 
             logger.info(f"Modelos treinados. Melhor modelo: {best_model} (R²: {best_score:.3f})")
             return True
@@ -245,6 +3354,125 @@ class MLAnalyticsEngine:
             logger.error(f"Erro ao treinar modelos: {e}")
             return False
 
+    def _compile_models(self, X_scaled: np.ndarray, X_raw: pd.DataFrame):
+        """Compila os modelos e valida bit a bit contra o sklearn.
+
+        Modelos cuja versão compilada diverge continuam sendo servidos pelo
+        sklearn.
+        """
+        self.compiled = {}
+        scaler = CompiledScaler(self.scalers['main'])
+        if np.array_equal(scaler.transform(X_raw.values), X_scaled):
+            self.compiled_scaler = scaler
+        else:
+            self.compiled_scaler = None
+            logger.warning("Scaler compilado diverge do sklearn; usando sklearn")
+
+        for name, info in self.models.items():
+            try:
+                compiled = compile_model(info['model'])
+            except TypeError as e:
+                logger.warning(f"Modelo {name} não compilado: {e}")
+                continue
+            if np.array_equal(compiled.predict(X_scaled), info['model'].predict(X_scaled)):
+                self.compiled[name] = compiled
+            else:
+                logger.warning(f"Modelo compilado {name} diverge do sklearn; usando sklearn")
+
+        logger.info(f"Modelos compilados: {sorted(self.compiled)}")
+
+    def _predictor(self, name: str):
+        compiled = self.compiled.get(name)
+        return compiled.predict if compiled is not None else self.models[name]['model'].predict
+
+    def _compute_feature_importance(self, X_scaled: np.ndarray, y: np.ndarray,
+                                    n_repeats: int = 10, max_rows: int = 2000) -> Dict[str, Any]:
+        """Importância por impureza (árvores) e por permutação (todos os modelos).
+
+        Para cada modelo, todas as permutações (features x repetições) são
+        empilhadas e avaliadas numa única chamada de predict; os modelos rodam
+        em paralelo em threads (o trabalho pesado é NumPy/sklearn, que liberam o GIL).
+        """
+        started = time.perf_counter()
+        rng = np.random.default_rng(42)
+        y = np.asarray(y, dtype=np.float64)
+        if len(X_scaled) > max_rows:
+            keep = rng.choice(len(X_scaled), max_rows, replace=False)
+            X_scaled, y = X_scaled[keep], y[keep]
+        n, k = X_scaled.shape
+
+        X_perm = np.broadcast_to(X_scaled, (k, n_repeats, n, k)).copy()
+        for j in range(k):
+            order = np.argsort(rng.random((n_repeats, n)), axis=1)
+            X_perm[j, :, :, j] = X_scaled[order, j]
+        X_perm = X_perm.reshape(-1, k)
+        ss_tot = float(((y - y.mean()) ** 2).sum()) or 1.0
+
+        def permutation(name: str):
+            predict = self._predictor(name)
+            baseline = 1.0 - float(((predict(X_scaled) - y) ** 2).sum()) / ss_tot
+            permuted = predict(X_perm).reshape(k, n_repeats, n)
+            drops = baseline - (1.0 - ((permuted - y) ** 2).sum(axis=2) / ss_tot)
+            return name, {
+                feature: {"mean": float(drops[j].mean()), "std": float(drops[j].std())}
+                for j, feature in enumerate(self.feature_columns)
+            }
+
+        permutation_scores = dict(joblib.Parallel(n_jobs=max(1, len(self.models)), prefer="threads")(
+            joblib.delayed(permutation)(name) for name in self.models
+        ))
+        impurity = {
+            name: dict(zip(self.feature_columns, map(float, info['model'].feature_importances_)))
+            for name, info in self.models.items()
+            if hasattr(info['model'], 'feature_importances_')
+        }
+        best = permutation_scores.get(self.best_model, {})
+        elapsed = time.perf_counter() - started
+        logger.info(f"Importância das features calculada em {elapsed:.2f}s")
+        return {
+            "best_model": self.best_model,
+            "ranking": sorted(best, key=lambda f: best[f]["mean"], reverse=True),
+            "permutation": permutation_scores,
+            "impurity": impurity,
+            "n_repeats": n_repeats,
+            "evaluation_rows": n,
+            "computed_seconds": elapsed,
+        }
+
+    def explain(self, features: np.ndarray) -> Optional[Dict[str, Any]]:
+        """Contribuições das features para a previsão do melhor modelo (uma linha)"""
+        compiled = self.compiled.get(self.best_model)
+        if compiled is None:
+            return None
+        features = np.atleast_2d(np.asarray(features, dtype=np.float64))
+        if self.compiled_scaler is not None:
+            features_scaled = self.compiled_scaler.transform(features)
+        else:
+            features_scaled = self.scalers['main'].transform(features)
+        base, contrib = compiled.contributions(features_scaled)
+        return {
+            "model": self.best_model,
+            "base_value": base,
+            "values": dict(zip(self.feature_columns, map(float, contrib[0]))),
+        }
+
+    def predict_batch(self, features: np.ndarray) -> Dict[str, np.ndarray]:
+        """Previsões de todos os modelos para várias linhas de features (não normalizadas)"""
+        features = np.atleast_2d(np.asarray(features, dtype=np.float64))
+        if self.compiled_scaler is not None:
+            features_scaled = self.compiled_scaler.transform(features)
+        else:
+            features_scaled = self.scalers['main'].transform(features)
+
+        predictions = {}
+        for name, model_info in self.models.items():
+            compiled = self.compiled.get(name)
+            if compiled is not None:
+                predictions[name] = compiled.predict(features_scaled)
+            else:
+                predictions[name] = model_info['model'].predict(features_scaled)
+        return predictions
+
     def predict_progress(self, current_data: Dict) -> MLPrediction:
         """Faz previsão do progresso final"""
         try:
@@ -262,17 +3490,14 @@ class MLAnalyticsEngine:
                 current_data.get('consistency_score', 0.5)
             ]])
 
-            # Normalizar
-            features_scaled = self.scalers['main'].transform(features)
-
-            # Fazer previsões com todos os modelos
-            predictions = {}
-            for name, model_info in self.models.items():
-                pred = model_info['model'].predict(features_scaled)[0]
-                predictions[name] = pred
+            # Normalizar e prever com todos os modelos (caminho compilado quando disponível)
+            predictions = {
+                name: values[0] for name, values in self.predict_batch(features).items()
+            }
 
             # Usar ensemble ou melhor modelo
             final_prediction = predictions[self.best_model]
+            contributions = self.explain(features)
 
             # Calcular intervalo de confiança
             prediction_std = np.std(list(predictions.values()))
@@ -281,17 +3506,21 @@ class MLAnalyticsEngine:
                 'upper': final_prediction + 1.96 * prediction_std
             }
 
-            # Calcular probabilidade de sucesso
-            success_prob = min(100, max(0, (final_prediction / 7000) * 100))
+            # Calcular probabilidade de sucesso (simulação quando disponível)
+            simulation = current_data.get('simulation')
+            if simulation and simulation.get('n_paths'):
+                success_prob = simulation['success_probability']
+            else:
+                success_prob = min(100, max(0, (final_prediction / TARGET_PROGRESS) * 100))
 
             # Gerar recomendações
             recommendations = self._generate_recommendations(current_data, final_prediction)
             risk_factors = self._identify_risk_factors(current_data)
 
             # Calcular meta semanal ótima
-            days_remaining = (date(2025, 12, 31) - date.today()).days
+            days_remaining = (TARGET_DEADLINE - (current_data.get('today') or date.today())).days
             weeks_remaining = max(1, days_remaining / 7)
-            remaining_progress = 7000 - current_data['current_progress']
+            remaining_progress = TARGET_PROGRESS - current_data['current_progress']
             optimal_weekly = remaining_progress / weeks_remaining
 
             return MLPrediction(
@@ -300,7 +3529,8 @@ class MLAnalyticsEngine:
                 success_probability=success_prob,
                 recommendations=recommendations,
                 risk_factors=risk_factors,
-                optimal_weekly_target=optimal_weekly
+                optimal_weekly_target=optimal_weekly,
+                feature_contributions=contributions
             )
 
         except Exception as e:
@@ -311,17 +3541,27 @@ class MLAnalyticsEngine:
         """Previsão simples quando ML não está disponível"""
         current_progress = current_data['current_progress']
         days_elapsed = current_data['days_elapsed']
-        total_days = 508  # Dias totais até 31/12/2025
-
-        # Projeção linear simples
         daily_rate = current_progress / max(1, days_elapsed)
-        predicted_final = daily_rate * total_days
 
-        success_prob = min(100, (predicted_final / 7000) * 100)
+        simulation = current_data.get('simulation')
+        if simulation and simulation.get('n_paths'):
+            # Mediana e percentis 5/95 das trajetórias simuladas
+            predicted_final = simulation['final_percentiles']['50']
+            confidence_interval = {
+                'lower': simulation['final_percentiles']['5'],
+                'upper': simulation['final_percentiles']['95'],
+            }
+            success_prob = simulation['success_probability']
+        else:
+            # Projeção linear simples até o prazo final
+            days_remaining = max(0, (TARGET_DEADLINE - (current_data.get('today') or date.today())).days)
+            predicted_final = daily_rate * (days_elapsed + days_remaining)
+            confidence_interval = {'lower': predicted_final * 0.8, 'upper': predicted_final * 1.2}
+            success_prob = min(100, (predicted_final / TARGET_PROGRESS) * 100)
 
         return MLPrediction(
             predicted_progress=predicted_final,
-            confidence_interval={'lower': predicted_final * 0.8, 'upper': predicted_final * 1.2},
+            confidence_interval=confidence_interval,
             success_probability=success_prob,
             recommendations=["Mantenha o ritmo atual", "Monitore o progresso semanalmente"],
             risk_factors=["Dados insuficientes para análise avançada"],
@@ -338,7 +3578,7 @@ class MLAnalyticsEngine:
         elif prediction < 6500:
             recommendations.append("⚠️ Atenção necessária: Acelerar progresso")
             recommendations.append("🎯 Foque em metas de alto impacto")
-        elif prediction < 7000:
+        elif prediction < TARGET_PROGRESS:
             recommendations.append("📊 Bom progresso: Mantenha consistência")
             recommendations.append("🔧 Pequenos ajustes podem garantir sucesso")
         else:
@@ -365,16 +3605,163 @@ class MLAnalyticsEngine:
             risks.append("⚡ Baixa consistência no progresso")
 
         avg_daily = data.get('avg_daily_progress', 0)
-        if avg_daily < 13.8:  # Meta diária para 7k
+        if avg_daily < TARGET_DAILY_PROGRESS:
             risks.append("🐌 Progresso diário abaixo da meta")
 
         return risks
 
+# Coalescência de requisições concorrentes (single-flight)
+class _Flight:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+class SingleFlight:
+    """Executa `fn` uma vez por chave entre chamadas concorrentes.
+
+    A primeira thread a pedir uma chave calcula; as que chegam enquanto o
+    cálculo está em andamento esperam e recebem o mesmo resultado (ou a mesma
+    exceção). Nada é guardado depois que o cálculo termina: a chave deve
+    incluir tudo de que o resultado depende (versões dos dados, do modelo, dia).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[Any, _Flight] = {}
+        self.executions = 0
+        self.shared = 0
+
+    def do(self, key: Any, fn):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.executions += 1
+            else:
+                flight.waiters += 1
+                self.shared += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def in_flight(self, key: Any) -> bool:
+        """Se há um cálculo em andamento para `key` (a que `do` se juntaria)"""
+        with self._lock:
+            return key in self._flights
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"executions": self.executions, "shared": self.shared, "in_flight": len(self._flights)}
+
+class ResultCache:
+    """Resultados já calculados por chave, em LRU limitado.
+
+    Segue a convenção de SingleFlight: a chave carrega as versões dos dados,
+    do modelo e o dia de referência, então nada precisa ser invalidado; na
+    virada do dia as chaves mudam e as entradas do dia anterior saem por
+    `prune` ou pelo limite de tamanho.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Any, Tuple[date, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Any, count: bool = True) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += count
+                return self._MISSING
+            self._entries.move_to_end(key)
+            self.hits += count
+            return entry[1]
+
+    def contains(self, key: Any) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def put(self, key: Any, value: Any, day: date):
+        with self._lock:
+            self._entries[key] = (day, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def prune(self, before: date) -> int:
+        """Remove as entradas com dia de referência anterior a `before`"""
+        with self._lock:
+            stale = [key for key, (day, _) in self._entries.items() if day < before]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            days: Dict[str, int] = {}
+            for day, _ in self._entries.values():
+                days[day.isoformat()] = days.get(day.isoformat(), 0) + 1
+            return {"entries": len(self._entries), "max_entries": self.max_entries,
+                    "hits": self.hits, "misses": self.misses, "by_day": days}
+
 # Analytics Service
 class AnalyticsService:
     def __init__(self, db_manager: DatabaseManager):
         self.db = db_manager
         self.ml_engine = MLAnalyticsEngine()
+        self._retrain_lock = threading.Lock()
+        self.progress_store = ProgressColumnStore(
+            db_manager,
+            os.getenv(
+                "ANALYTICS_COLUMN_STORE_DIR",
+                os.path.splitext(db_manager.db_path)[0] + "_columns"
+            )
+        )
+        self._progress_series: Optional[RollingProgressSeries] = None
+        self._series_epoch = None
+        self._series_lock = threading.Lock()
+        self.anomaly_detector = StreamingAnomalyDetector()
+        # Anomalias detectadas e ainda não gravadas (flush_anomalies, em segundo plano)
+        self._pending_anomalies: List[Dict[str, Any]] = []
+        self._pending_replace_from: Optional[str] = None
+        self.drift_monitor = DriftMonitor(
+            window=int(os.getenv("ANALYTICS_DRIFT_WINDOW_DAYS", "90"))
+        )
+        self.simulator = MonteCarloSimulator()
+        self._simulation_cache: Dict[Any, Dict[str, Any]] = {}
+        self._simulation_lock = threading.Lock()
+        self.flights = SingleFlight()
+        self.results = ResultCache(int(os.getenv("ANALYTICS_RESULT_CACHE_SIZE", "2048")))
+        # Último acesso ao analytics por usuário (usuários ativos para o aquecimento)
+        self._active_users: Dict[str, float] = {}
+        # Última análise completa por usuário (KPIs da resposta degradada), em LRU
+        self._last_analytics: "OrderedDict[str, AnalyticsResponse]" = OrderedDict()
+        self.max_last_analytics = int(os.getenv("ANALYTICS_LAST_ANALYTICS_SIZE", "1024"))
+        # Protege _active_users e _last_analytics
+        self._analytics_state_lock = threading.Lock()
         self._initialize_sample_data()
 
     def _initialize_sample_data(self):
@@ -382,38 +3769,20 @@ class AnalyticsService:
         conn = self.db.get_connection()
         cursor = conn.cursor()
 
-        # Verificar se já existem dados
+        # Verificar se já existem dados (na tabela quente ou já arquivados)
         cursor.execute("SELECT COUNT(*) FROM progress_history")
         count = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*) FROM history_archive WHERE source = 'progress_history'")
+        count += cursor.fetchone()[0]
 
         if count == 0:
-            # Gerar dados históricos simulados
-            start_date = date(2025, 8, 10)
-            current_date = date.today()
-
-            progress_data = []
-            current_progress = 50  # Valor inicial
-
-            delta = current_date - start_date
-            for i in range(delta.days + 1):
-                day = start_date + timedelta(days=i)
-
-                # Simular progresso variável
-                daily_increment = np.random.normal(13.8, 3.0)  # Meta diária ± variação
-                current_progress += max(0, daily_increment)
-
-                week_num = day.isocalendar()[1]
-                month_num = day.month
-                goals_completed = np.random.poisson(1) if day.weekday() == 6 else 0
-
-                progress_data.append((
-                    day.isoformat(),
-                    current_progress,
-                    daily_increment,
-                    week_num,
-                    month_num,
-                    goals_completed
-                ))
+            # Gerar dados históricos simulados (vetorizado)
+            progress = generate_progress_history(
+                np.random.default_rng(), PROJECT_START_DATE,
+                (date.today() - PROJECT_START_DATE).days + 1,
+                initial=50, daily_mean=TARGET_DAILY_PROGRESS, daily_std=3.0,  # Meta diária ± variação
+            )
+            progress_data = list(progress_rows(progress))
 
             cursor.executemany("""
                 INSERT INTO progress_history
@@ -425,41 +3794,442 @@ class AnalyticsService:
             logger.info(f"Dados históricos inicializados: {len(progress_data)} registros")
 
         conn.close()
+        # O treino dos modelos (busca com orçamento de CPU) fica fora da
+        # construção: o RetrainScheduler enfileira o treino inicial no start
+
+    def get_progress_arrays(self) -> Dict[str, np.ndarray]:
+        """Obtém as colunas de progresso como arrays NumPy (mmap, sem cópia)"""
+        return self.progress_store.arrays()
 
-        # Treinar modelos ML
-        self._train_ml_models()
+    def sync_progress_consumers(self):
+        """Alimenta a série de features e o detector de anomalias com as linhas novas.
 
-    def _train_ml_models(self):
-        """Treina os modelos ML com dados históricos"""
+        Ambos consomem incrementalmente o cache colunar e só são refeitos
+        quando o cache é reconstruído (epoch novo). Não escreve no banco: as
+        anomalias ficam pendentes até `flush_anomalies`, para que leituras da
+        API nunca gravem.
+        """
+        meta, arrays = self.progress_store.snapshot()
+        rows = len(arrays["day"])
+        with self._series_lock:
+            series = self._progress_series
+            rebuilt = series is None or self._series_epoch != meta.get("epoch") or series.count > rows
+            if rebuilt:
+                series = RollingProgressSeries()
+                self._progress_series = series
+                self.anomaly_detector = StreamingAnomalyDetector()
+                self.drift_monitor.reset()
+                self._series_epoch = meta.get("epoch")
+
+            start = series.count
+            if start < rows:
+                # Só as últimas linhas entram na janela de drift: essas são
+                # anexadas uma a uma para capturar as features de cada dia
+                tail = max(start, rows - self.drift_monitor.window)
+                series.extend(arrays, start, tail)
+                recent = []
+                for i in range(tail, rows):
+                    series.extend(arrays, i, i + 1)
+                    recent.append(series.feature_vector(self.ml_engine.feature_columns))
+                self.drift_monitor.observe(np.array(recent), arrays["progress_value"][tail:rows])
+                anomalies = [
+                    anomaly for anomaly in map(
+                        self.anomaly_detector.update,
+                        arrays["day"][start:].tolist(),
+                        arrays["progress_value"][start:].tolist(),
+                    ) if anomaly is not None
+                ]
+                if rebuilt:
+                    # As pendentes da série anterior serão detectadas de novo
+                    self._pending_anomalies = []
+                    self._pending_replace_from = str(np.datetime64(int(arrays["day"][0]), "D"))
+                self._pending_anomalies += anomalies
+            return series
+
+    def flush_anomalies(self) -> int:
+        """Grava as anomalias pendentes (chamado pelo EventLogWorker, fora das requisições)"""
+        with self._series_lock:
+            anomalies, replace_from = self._pending_anomalies, self._pending_replace_from
+            self._pending_anomalies, self._pending_replace_from = [], None
+        if not anomalies and replace_from is None:
+            return 0
         try:
-            df = self.get_progress_dataframe()
-            if len(df) > 10:
-                self.ml_engine.train_models(df)
-        except Exception as e:
-            logger.error(f"Erro ao treinar modelos ML: {e}")
+            self._store_anomalies(anomalies, replace_from)
+        except Exception:
+            with self._series_lock:
+                if self._pending_replace_from is None:
+                    # Nenhuma reconstrução no meio tempo: devolve o lote à fila
+                    self._pending_anomalies = anomalies + self._pending_anomalies
+                    self._pending_replace_from = replace_from
+            raise
+        return len(anomalies)
+
+    def _store_anomalies(self, anomalies: List[Dict[str, Any]], replace_from: Optional[str] = None):
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        if replace_from is not None:
+            # Anomalias de dias já arquivados são preservadas
+            cursor.execute("DELETE FROM progress_anomalies WHERE day >= ?", (replace_from,))
+        if anomalies:
+            cursor.executemany("""
+                INSERT INTO progress_anomalies
+                (day, value, ewma_mean, ewma_std, z_score, robust_z, method)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(day) DO NOTHING
+            """, [
+                (a["day"], a["value"], a["ewma_mean"], a["ewma_std"], a["z_score"], a["robust_z"], a["method"])
+                for a in anomalies
+            ])
+            logger.info(f"{len(anomalies)} anomalias detectadas no progresso")
+        conn.commit()
+        conn.close()
 
-    def get_progress_dataframe(self) -> pd.DataFrame:
-        """Obtém dados de progresso como DataFrame"""
+    def get_progress_features(self) -> Dict[str, float]:
+        """Features de janela móvel do último dia, sem pandas"""
+        series = self.sync_progress_consumers()
+        with self._series_lock:
+            return series.features()
+
+    def get_anomaly_stats(self) -> Dict[str, Any]:
+        """Estatísticas do detector online (O(1) depois de sincronizado)"""
+        self.sync_progress_consumers()
+        with self._series_lock:
+            return self.anomaly_detector.stats()
+
+    def list_anomalies(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Anomalias registradas, das mais recentes para as mais antigas
+        (incluindo as detectadas e ainda não gravadas)"""
+        self.sync_progress_consumers()
+        with self._series_lock:
+            pending = [{**a, "detected_at": None} for a in self._pending_anomalies]
+            replace_from = self._pending_replace_from
         conn = self.db.get_connection()
-        query = """
-            SELECT date, progress_value, daily_increment, week_number,
-                   month_number, goals_completed, created_at
-            FROM progress_history
-            ORDER BY date
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT day, value, ewma_mean, ewma_std, z_score, robust_z, method, detected_at
+            FROM progress_anomalies
+            WHERE day < ?
+            ORDER BY day DESC
+            LIMIT ?
+        """, (replace_from or "9999-12-31", limit))
+        columns = [desc[0] for desc in cursor.description]
+        anomalies = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        conn.close()
+        stored = {str(a["day"])[:10] for a in anomalies}
+        anomalies += [a for a in pending if str(a["day"])[:10] not in stored]
+        anomalies.sort(key=lambda a: str(a["day"])[:10], reverse=True)
+        return anomalies[:limit]
+
+    def simulate_success(self, n_paths: Optional[int] = None, today: Optional[date] = None,
+                         cached_only: bool = False,
+                         on_chunk: Optional[Callable[[float], None]] = None) -> Optional[Dict[str, Any]]:
+        """Probabilidade de atingir a meta por simulação, em cache por versão dos dados
+        (`cached_only` devolve None em vez de simular; `on_chunk` recebe o avanço e
+        pode interromper a simulação levantando exceção).
+
+        Só a contagem padrão de caminhos, usada pela previsão e pelo aquecimento,
+        entra no cache; execuções com `n_paths` próprio (parâmetro `paths` do
+        endpoint, jobs) não tiram essas entradas do lugar.
         """
-        df = pd.read_sql_query(query, conn)
-        df['date'] = pd.to_datetime(df['date'])
+        meta, arrays = self.progress_store.snapshot()
+        version = meta["versions"].get("progress_history", 0)
+        days_remaining = (TARGET_DEADLINE - (today or date.today())).days
+        cacheable = n_paths in (None, self.simulator.n_paths)
+        n_paths = n_paths or self.simulator.n_paths
+        key = (version, meta.get("epoch"), days_remaining)
+
+        if cacheable:
+            with self._simulation_lock:
+                cached = self._simulation_cache.get(key)
+            if cached is not None:
+                return cached
+        if cached_only:
+            return None
+
+        # Semente derivada da versão: o mesmo dado gera sempre o mesmo resultado
+        result = self.simulator.simulate(
+            arrays["progress_value"], days_remaining, n_paths=n_paths, seed=version, on_chunk=on_chunk
+        )
+        if not cacheable:
+            return result
+        with self._simulation_lock:
+            # Guarda também a entrada do dia vizinho (aquecimento antes da virada)
+            if len(self._simulation_cache) >= 2:
+                self._simulation_cache.pop(next(iter(self._simulation_cache)))
+            self._simulation_cache[key] = result
+        return result
+
+    def get_downsampled_series(self, points: int = 500, metric: str = "progress_value",
+                               method: str = "lttb", start: Optional[date] = None,
+                               end: Optional[date] = None) -> Dict[str, Any]:
+        """Série de progresso reduzida no servidor para no máximo `points` pontos"""
+        arrays = self.get_progress_arrays()
+        days = arrays["day"]
+        values = arrays[metric]
+
+        lo = 0 if start is None else int(np.searchsorted(days, (start - date(1970, 1, 1)).days, "left"))
+        hi = len(days) if end is None else int(np.searchsorted(days, (end - date(1970, 1, 1)).days, "right"))
+        days, values = days[lo:hi], values[lo:hi]
+
+        if method == "minmax":
+            index = downsample_minmax(values, points)
+        else:
+            index = downsample_lttb(days, values, points)
+
+        return {
+            "metric": metric,
+            "method": method,
+            "source_points": int(len(days)),
+            "points": int(len(index)),
+            "dates": [str(d) for d in days[index].astype("datetime64[D]")],
+            "values": [None if np.isnan(v) else float(v) for v in np.asarray(values[index], dtype=np.float64)],
+        }
+
+    def get_rollups(self, granularity: str = "week", limit: int = 104) -> List[Dict[str, Any]]:
+        """Rollups semanais/mensais mais recentes (em ordem cronológica)"""
+        if granularity not in ROLLUP_GRANULARITIES:
+            raise ValueError(f"Granularidade inválida: {granularity}")
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT period_start, increment_sum, increment_count, increment_min, increment_max,
+                   last_progress, goals_completed, days
+            FROM progress_rollup_{granularity}
+            ORDER BY period_start DESC
+            LIMIT ?
+        """, (limit,))
+        rows = cursor.fetchall()
         conn.close()
-        return df
+
+        return [
+            {
+                "period_start": str(period_start),
+                "increment_sum": float(total),
+                "increment_mean": float(total) / count if count else None,
+                "increment_min": minimum,
+                "increment_max": maximum,
+                "increment_count": int(count),
+                "last_progress": last_progress,
+                "goals_completed": int(goals),
+                "days": int(days),
+            }
+            for period_start, total, count, minimum, maximum, last_progress, goals, days in reversed(rows)
+        ]
+
+    def check_drift(self) -> Dict[str, Any]:
+        """Scores de drift da janela recente contra o treino do modelo atual"""
+        self.sync_progress_consumers()
+        engine = self.ml_engine
+        with self._series_lock:
+            return self.drift_monitor.evaluate(engine)
+
+    def retrain_if_drifted(self, force: bool = False,
+                           before_swap: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+        """Retreina só quando o monitor detecta drift (ou se `force`)"""
+        drift = self.check_drift()
+        if not (force or drift["should_retrain"] or not self.ml_engine.is_trained):
+            logger.info(f"Retreino dispensado: sem drift ({drift['status']})")
+            return {"retrained": False, "drift": drift}
+        result = self.retrain_models(before_swap)
+        result.update({"retrained": True, "drift": drift})
+        return result
+
+    def retrain_models(self, before_swap: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+        """Treina um engine novo e troca atomicamente (requisições em curso usam o anterior).
+
+        Retreinos são serializados: a versão é incrementada sob o mesmo lock,
+        então duas trocas nunca publicam o mesmo model_version. `before_swap`
+        roda logo antes da troca e pode abortá-la levantando exceção.
+        """
+        with self._retrain_lock:
+            df = self.get_progress_dataframe()
+            engine = MLAnalyticsEngine()
+            if not engine.train_models(df):
+                raise RuntimeError("Treino não concluído (dados insuficientes ou erro nos modelos)")
+            if before_swap is not None:
+                before_swap()
+            engine.model_version = self.ml_engine.model_version + 1
+            self.ml_engine = engine
+        return {
+            "model_version": engine.model_version,
+            "best_model": engine.best_model,
+            "model_scores": {name: info["score"] for name, info in engine.models.items()},
+            "training_rows": len(df),
+        }
+
+    def export_progress(self, start: Optional[date] = None, end: Optional[date] = None) -> pd.DataFrame:
+        """Linhas de progress_history (tabela quente) com data em [start, end]"""
+        conn = self.db.get_connection()
+        try:
+            return self.db.read_dataframe(conn, """
+                SELECT id, date, progress_value, daily_increment, week_number, month_number,
+                       goals_completed, notes, created_at
+                FROM progress_history
+                WHERE date >= ? AND date <= ?
+                ORDER BY date, id
+            """, ((start or date.min).isoformat(), (end or date.max).isoformat()))
+        finally:
+            conn.close()
+
+    def goals_report(self, weeks: int = 12, top: int = 10, min_goals: int = 3) -> Dict[str, Any]:
+        """Relatório de metas de todos os usuários, a partir dos agregados goal_stats_*"""
+        since = date.today() - timedelta(weeks=weeks)
+
+        def read(backend: StorageBackend, conn) -> Tuple[pd.DataFrame, pd.DataFrame]:
+            users = backend.read_dataframe(conn, """
+                SELECT created_by, goals_set, goals_completed, target_sum, actual_sum
+                FROM goal_stats_user
+                WHERE goals_set > 0
+            """)
+            weekly = backend.read_dataframe(conn, """
+                SELECT week_start, SUM(goals_set) AS goals_set, SUM(goals_completed) AS goals_completed,
+                       COUNT(*) AS active_users
+                FROM goal_stats_weekly
+                WHERE week_start >= ? AND goals_set > 0
+                GROUP BY week_start
+                ORDER BY week_start
+            """, (since.isoformat(),))
+            return users, weekly
+
+        # Fan-out: cada usuário vive em um único shard, então basta somar por semana
+        parts = self.db.map_goal_shards(read)
+        users = pd.concat([part[0] for part in parts], ignore_index=True)
+        weekly = pd.concat([part[1] for part in parts], ignore_index=True)
+        if len(parts) > 1:
+            weekly["week_start"] = weekly["week_start"].astype(str)
+            weekly = weekly.groupby("week_start", as_index=False)[
+                ["goals_set", "goals_completed", "active_users"]
+            ].sum()
+
+        if users.empty:
+            return {"users": 0, "goals_set": 0, "goals_completed": 0, "weekly": [], "top_users": []}
+
+        users["completion_rate"] = users["goals_completed"] / users["goals_set"]
+        eligible = users[users["goals_set"] >= min_goals]
+        top_users = eligible.sort_values(["completion_rate", "goals_set"], ascending=False).head(top)
+        weekly["completion_rate"] = (weekly["goals_completed"] / weekly["goals_set"]).fillna(0.0)
+        weekly["week_start"] = weekly["week_start"].astype(str)
+
+        return {
+            "users": int(len(users)),
+            "goals_set": int(users["goals_set"].sum()),
+            "goals_completed": int(users["goals_completed"].sum()),
+            "completion_rate": float(users["goals_completed"].sum() / users["goals_set"].sum()),
+            "completion_rate_percentiles": {
+                f"p{q}": float(v) for q, v in zip(
+                    (10, 25, 50, 75, 90), np.percentile(users["completion_rate"], [10, 25, 50, 75, 90])
+                )
+            },
+            "weekly": weekly.to_dict(orient="records"),
+            "top_users": top_users[["created_by", "goals_set", "goals_completed", "completion_rate"]]
+                .to_dict(orient="records"),
+        }
+
+    def get_progress_dataframe(self) -> pd.DataFrame:
+        """Obtém dados de progresso como DataFrame (a partir do cache colunar).
+
+        Desde o cache colunar o frame não traz mais `created_at` (a coluna não
+        faz parte do cache); quem precisar dela lê progress_history.
+        """
+        arrays = self.get_progress_arrays()
+        # Dias desde a época -> datetime64 sem reparse de texto
+        dates = arrays["day"].astype("datetime64[D]").astype("datetime64[ns]")
+        return pd.DataFrame({
+            "date": dates,
+            "progress_value": arrays["progress_value"],
+            "daily_increment": arrays["daily_increment"],
+            "week_number": arrays["week_number"],
+            "month_number": arrays["month_number"],
+            "goals_completed": arrays["goals_completed"],
+        }, copy=False)
 
     def create_weekly_goal(self, goal: WeeklyGoal, user_email: str) -> str:
         """Cria uma nova meta semanal"""
+        result = self.apply_goal_writes([("create", goal, user_email)])[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def complete_weekly_goal(self, completion: GoalCompletion, user_email: str) -> bool:
+        """Marca uma meta semanal como completa"""
+        result = self.apply_goal_writes([("complete", completion, user_email)])[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def create_weekly_goals(self, goals: List[WeeklyGoal], user_email: str) -> List[Any]:
+        """Cria várias metas semanais em uma única transação"""
+        return self.apply_goal_writes([("create", goal, user_email) for goal in goals])
+
+    def complete_weekly_goals(self, completions: List[GoalCompletion], user_email: str) -> List[Any]:
+        """Atualiza várias metas semanais em uma única transação"""
+        return self.apply_goal_writes([("complete", c, user_email) for c in completions])
+
+    def apply_goal_writes(self, writes: List[Tuple[str, Any, str]]) -> List[Any]:
+        """Aplica escritas de metas com um commit por shard envolvido no lote.
+
+        Cada item roda em seu próprio SAVEPOINT: uma falha desfaz apenas o item
+        e é devolvida na posição correspondente da lista de resultados. Com
+        sharding, os grupos de shards diferentes são gravados em paralelo, cada
+        um na sua transação.
+        """
+        results: List[Any] = [None] * len(writes)
+
+        with self.db.route_lock.shared():
+            groups: Dict[int, List[int]] = {}
+            for index, (kind, _, user_email) in enumerate(writes):
+                shard = self.db.goal_shard(user_email, assign=kind == "create")
+                groups.setdefault(shard, []).append(index)
+
+            def apply(shard: int, indexes: List[int]):
+                backend = self.db.goal_backends[shard]
+                conn = backend.connect()
+                cursor = conn.cursor()
+                try:
+                    backend.begin(cursor)
+                    for index in indexes:
+                        kind, payload, user_email = writes[index]
+                        cursor.execute("SAVEPOINT goal_write")
+                        try:
+                            if kind == "create":
+                                result = self._insert_goal(cursor, payload, user_email)
+                            elif kind == "complete":
+                                result = self._update_goal_completion(cursor, payload, user_email)
+                            else:
+                                raise ValueError(f"Tipo de escrita desconhecido: {kind}")
+                            cursor.execute("RELEASE SAVEPOINT goal_write")
+                        except backend.errors + (ValueError,) as e:
+                            cursor.execute("ROLLBACK TO SAVEPOINT goal_write")
+                            cursor.execute("RELEASE SAVEPOINT goal_write")
+                            result = e
+                        results[index] = result
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    conn.close()
+
+            if len(groups) == 1:
+                apply(*next(iter(groups.items())))
+            else:
+                for future in [self.db._goal_pool.submit(apply, *item) for item in groups.items()]:
+                    future.result()
+
+        for (kind, payload, user_email), result in zip(writes, results):
+            if isinstance(result, Exception):
+                logger.error(f"Erro na escrita de meta ({kind}): {result}")
+            elif kind == "create":
+                logger.info(f"Meta semanal criada: {result}")
+            elif result:
+                logger.info(f"Meta {payload.goal_id} atualizada por {user_email}")
+
+        return results
+
+    def _insert_goal(self, cursor, goal: WeeklyGoal, user_email: str) -> str:
         import uuid
         goal_id = str(uuid.uuid4())
 
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-
         cursor.execute("""
             INSERT INTO weekly_goals
             (id, week_start, week_end, description, target_value, created_by, category)
@@ -474,17 +4244,9 @@ class AnalyticsService:
             goal.category
         ))
 
-        conn.commit()
-        conn.close()
-
-        logger.info(f"Meta semanal criada: {goal_id}")
         return goal_id
 
-    def complete_weekly_goal(self, completion: GoalCompletion, user_email: str) -> bool:
-        """Marca uma meta semanal como completa"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-
+    def _update_goal_completion(self, cursor, completion: GoalCompletion, user_email: str) -> bool:
         cursor.execute("""
             UPDATE weekly_goals
             SET completed = ?, actual_value = ?, completed_date = ?, updated_at = CURRENT_TIMESTAMP
@@ -497,18 +4259,37 @@ class AnalyticsService:
             user_email
         ))
 
-        if cursor.rowcount > 0:
-            conn.commit()
-            conn.close()
-            logger.info(f"Meta {completion.goal_id} atualizada por {user_email}")
-            return True
-
-        conn.close()
-        return False
+        return cursor.rowcount > 0
+
+    @staticmethod
+    def validate_weekly_goals(goals: List[WeeklyGoal]) -> List[Dict[str, Any]]:
+        """Valida um lote de metas; retorna a lista de erros por índice"""
+        errors = []
+        for index, goal in enumerate(goals):
+            if goal.week_end < goal.week_start:
+                errors.append({"index": index, "error": "week_end anterior a week_start"})
+            elif goal.target_value < 0:
+                errors.append({"index": index, "error": "target_value não pode ser negativo"})
+            elif not goal.description.strip():
+                errors.append({"index": index, "error": "description vazia"})
+        return errors
+
+    @staticmethod
+    def validate_goal_completions(completions: List[GoalCompletion]) -> List[Dict[str, Any]]:
+        """Valida um lote de conclusões; retorna a lista de erros por índice"""
+        errors = []
+        seen = set()
+        for index, completion in enumerate(completions):
+            if completion.goal_id in seen:
+                errors.append({"index": index, "error": f"goal_id duplicado no lote: {completion.goal_id}"})
+            elif completion.actual_value is not None and completion.actual_value < 0:
+                errors.append({"index": index, "error": "actual_value não pode ser negativo"})
+            seen.add(completion.goal_id)
+        return errors
 
     def get_weekly_goals(self, user_email: str, week_start: Optional[date] = None) -> List[Dict]:
         """Obtém metas semanais"""
-        conn = self.db.get_connection()
+        conn = self.db.get_goal_connection(user_email)
         cursor = conn.cursor()
 
         if week_start:
@@ -531,158 +4312,356 @@ class AnalyticsService:
         conn.close()
         return goals
 
-    def get_analytics(self, user_email: str) -> AnalyticsResponse:
-        """Gera análise completa com ML"""
-        # Obter dados atuais
-        df = self.get_progress_dataframe()
+    def _flight_key(self, name: str, *parts: Any, today: Optional[date] = None) -> Tuple[Any, ...]:
+        """Chave de coalescência: versões do progresso e do modelo, dia de referência e `parts`"""
+        versions = self.progress_store.sync()["versions"]
+        return (name, versions.get("progress_history"), versions.get("progress_history_rewrites"),
+                self.ml_engine.model_version, today or date.today()) + parts
+
+    def _cached(self, key: Tuple[Any, ...], fn) -> Any:
+        """Resultado de `fn` pela chave: do cache, do cálculo em andamento ou calculado agora"""
+        result = self.results.get(key)
+        if result is ResultCache._MISSING:
+            result = self.flights.do(key, lambda: self._compute_and_store(key, fn))
+        return result
+
+    def _compute_and_store(self, key: Tuple[Any, ...], fn) -> Any:
+        # Guarda antes de a chave sair de `flights`: quem chega depois acha o cache
+        result = fn()
+        self.results.put(key, result, key[4])  # dia de referência da chave
+        return result
+
+    def get_analytics(self, user_email: str, today: Optional[date] = None) -> AnalyticsResponse:
+        """Gera análise completa com ML (requisições concorrentes iguais compartilham o cálculo).
+
+        `today` fixa o dia de referência (aquecimento do dia seguinte); só
+        chamadas sem ele contam como atividade do usuário.
+        """
+        if today is None:
+            with self._analytics_state_lock:
+                self._active_users[user_email] = time.time()
+        today = today or date.today()
+        result = self._cached(self._analytics_key(user_email, today),
+                              lambda: self._compute_analytics(user_email, today))
+        if today == date.today():
+            with self._analytics_state_lock:
+                self._last_analytics[user_email] = result
+                self._last_analytics.move_to_end(user_email)
+                while len(self._last_analytics) > self.max_last_analytics:
+                    self._last_analytics.popitem(last=False)
+        return result
+
+    def _analytics_key(self, user_email: str, today: Optional[date] = None) -> Tuple[Any, ...]:
+        # Versão das metas lida do shard do usuário: escritas de outros processos também invalidam
+        return self._flight_key("analytics", user_email, self.db.goal_version(user_email), today=today)
+
+    def lookup_analytics(self, user_email: str) -> Tuple[Optional[AnalyticsResponse], bool]:
+        """Sem calcular nada: (análise de hoje já em cache ou None, se ela já
+        está sendo calculada por outra requisição). Lê a versão das metas uma
+        só vez; bloqueia em I/O, então o endpoint chama fora do event loop"""
+        key = self._analytics_key(user_email)
+        result = self.results.get(key, count=False)
+        if result is ResultCache._MISSING:
+            return None, self.flights.in_flight(key)
+        with self._analytics_state_lock:
+            self._active_users[user_email] = time.time()
+        return result, False
+
+    def get_degraded_analytics(self, user_email: str, reason: str) -> AnalyticsResponse:
+        """Resposta barata para sobrecarga: previsão de fallback (simulação só se
+        já estiver em cache) e KPIs/tendências da última análise completa"""
+        today = date.today()
+        arrays = self.get_progress_arrays()
+        values = arrays["progress_value"]
+        current_progress = float(values[-1]) if len(values) else 100.0
+        current_data = {
+            'current_progress': current_progress,
+            'days_elapsed': (today - PROJECT_START_DATE).days if len(values) else 1,
+            'simulation': self.simulate_success(today=today, cached_only=True),
+            'today': today,
+        }
+        prediction = self.ml_engine._fallback_prediction(current_data)
+
+        with self._analytics_state_lock:
+            last = self._last_analytics.get(user_email)
+        if last is not None:
+            kpis = {**last.kpi_analysis, "computed_for": "cache"}
+            weekly_performance, trends = last.weekly_performance, last.trends
+            goal_completion_rate = last.goal_completion_rate
+            computed_at = last.computed_at
+        else:
+            kpis = {**self._calculate_kpis(current_data), "computed_for": "fallback"}
+            weekly_performance = trends = {"status": "degraded"}
+            goal_completion_rate = 0.0
+            computed_at = datetime.now()
+        return AnalyticsResponse(
+            current_progress=current_progress,
+            ml_prediction=prediction,
+            weekly_performance=weekly_performance,
+            trends=trends,
+            kpi_analysis=kpis,
+            goal_completion_rate=goal_completion_rate,
+            degraded=True,
+            degraded_reason=reason,
+            computed_at=computed_at,
+        )
 
-        if df.empty:
+    def _compute_analytics(self, user_email: str, today: Optional[date] = None) -> AnalyticsResponse:
+        today = today or date.today()
+        # Obter dados atuais (colunas do cache, sem montar DataFrame)
+        arrays = self.get_progress_arrays()
+        rows = len(arrays["day"])
+
+        if not rows:
             current_progress = 100
             days_elapsed = 1
         else:
-            current_progress = df['progress_value'].iloc[-1]
-            start_date = date(2025, 8, 10)
-            days_elapsed = (date.today() - start_date).days
+            current_progress = float(arrays["progress_value"][-1])
+            days_elapsed = (today - PROJECT_START_DATE).days
 
         # Preparar dados para ML
-        week_number = date.today().isocalendar()[1]
-        month_number = date.today().month
+        week_number = today.isocalendar()[1]
+        month_number = today.month
+        features = self.get_progress_features()
 
         current_data = {
             'current_progress': current_progress,
             'days_elapsed': days_elapsed,
             'week_number': week_number,
             'month_number': month_number,
-            'goals_completed_week': self._get_weekly_goals_completed(user_email),
-            'avg_daily_progress': df['daily_increment'].tail(7).mean() if len(df) > 7 else 13.8,
-            'momentum_score': 0.5,
-            'consistency_score': 0.7
+            'goals_completed_week': self._get_weekly_goals_completed(user_email, today),
+            'avg_daily_progress': features['avg_daily_progress'] if rows > 7 else TARGET_DAILY_PROGRESS,
+            'momentum_score': features['momentum_score'],
+            'consistency_score': features['consistency_score'],
+            'simulation': self.simulate_success(today=today),
+            'today': today
         }
 
         # Gerar previsão ML
         ml_prediction = self.ml_engine.predict_progress(current_data)
 
         # Análise de performance semanal
-        weekly_performance = self._analyze_weekly_performance(df, user_email)
+        weekly_performance = self._analyze_weekly_performance(arrays, user_email)
 
         # Análise de tendências
-        trends = self._analyze_trends(df)
+        trends = self._analyze_trends(arrays)
 
         # KPIs
-        kpi_analysis = self._calculate_kpis(df, current_data)
+        kpi_analysis = self._calculate_kpis(current_data)
 
         # Taxa de conclusão de metas
         goal_completion_rate = self._calculate_goal_completion_rate(user_email)
 
-        return AnalyticsResponse(
-            current_progress=current_progress,
-            ml_prediction=ml_prediction,
-            weekly_performance=weekly_performance,
-            trends=trends,
-            kpi_analysis=kpi_analysis,
-            goal_completion_rate=goal_completion_rate
-        )
+        return AnalyticsResponse(
+            current_progress=current_progress,
+            ml_prediction=ml_prediction,
+            weekly_performance=weekly_performance,
+            trends=trends,
+            kpi_analysis=kpi_analysis,
+            goal_completion_rate=goal_completion_rate,
+            computed_at=datetime.now(),
+        )
+
+    def get_ml_insights(self, today: Optional[date] = None) -> Dict[str, Any]:
+        """Insights dos modelos e qualidade dos dados (coalescido entre requisições)"""
+        return self._cached(self._flight_key("ml_insights", today=today), self._compute_ml_insights)
+
+    def active_users(self, days: int = 7, today: Optional[date] = None) -> List[str]:
+        """Usuários que pediram analytics nos últimos `days` dias ou que têm
+        metas na semana atual ou na anterior"""
+        today = today or date.today()
+        since = time.time() - days * 86400
+        with self._analytics_state_lock:
+            users = {user for user, seen in self._active_users.items() if seen >= since}
+            for user in [user for user, seen in self._active_users.items() if seen < since]:
+                del self._active_users[user]
+
+        week_start = today - timedelta(days=today.weekday() + 7)
+
+        def read(backend: StorageBackend, conn) -> List[str]:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT DISTINCT created_by FROM goal_stats_weekly
+                WHERE week_start >= ? AND goals_set > 0
+            """, (week_start.isoformat(),))
+            return [row[0] for row in cursor.fetchall()]
+
+        for part in self.db.map_goal_shards(read):
+            users.update(part)
+        return sorted(users)
+
+    def warm_caches(self, today: Optional[date] = None, max_users: int = 500,
+                    active_days: int = 7) -> Dict[str, Any]:
+        """Pré-calcula simulação, insights e analytics dos usuários ativos para
+        o dia `today` (pode ser amanhã) e remove do cache os dias anteriores"""
+        today = today or date.today()
+        start = time.perf_counter()
+        self.simulate_success(today=today)
+        self.get_ml_insights(today=today)
+
+        users = self.active_users(active_days, today)[:max_users]
+        computed = cached = failed = 0
+        for user_email in users:
+            if self.results.contains(self._analytics_key(user_email, today)):
+                cached += 1
+                continue
+            try:
+                self.get_analytics(user_email, today)
+                computed += 1
+            except Exception as e:
+                failed += 1
+                logger.error(f"Erro ao pré-calcular analytics de {user_email}: {e}")
+
+        # As entradas de ontem só somem depois da virada
+        pruned = self.results.prune(min(today, date.today()))
+        return {
+            "day": today.isoformat(),
+            "users": len(users),
+            "computed": computed,
+            "already_cached": cached,
+            "failed": failed,
+            "pruned": pruned,
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+
+    def _compute_ml_insights(self) -> Dict[str, Any]:
+        df = self.get_progress_dataframe()
+        current_progress = df['progress_value'].iloc[-1] if not df.empty else 100
+        anomaly_stats = self.get_anomaly_stats()
+
+        # Gerar insights
+        insights = {
+            "model_performance": {
+                "is_trained": self.ml_engine.is_trained,
+                "best_model": getattr(self.ml_engine, 'best_model', 'none'),
+                "model_scores": {
+                    name: info['score'] for name, info in self.ml_engine.models.items()
+                } if self.ml_engine.is_trained else {},
+                "selection": self.ml_engine.selection_report
+            },
+            "feature_importance": {
+                "model_version": self.ml_engine.model_version,
+                "features": self.ml_engine.feature_columns,
+                **self.ml_engine.feature_importance,
+            },
+            "prediction_accuracy": "Alta" if self.ml_engine.is_trained else "Limitada",
+            "data_quality": {
+                "total_days": len(df),
+                "consistency_score": df['daily_increment'].std() if len(df) > 1 else 0,
+                "outliers_detected": anomaly_stats["anomalies_detected"],
+                "anomaly_detector": anomaly_stats
+            }
+        }
+
+        return insights
 
-    def _get_weekly_goals_completed(self, user_email: str) -> int:
+    def _get_weekly_goals_completed(self, user_email: str, today: Optional[date] = None) -> int:
         """Conta metas completadas na semana atual"""
-        conn = self.db.get_connection()
+        conn = self.db.get_goal_connection(user_email)
         cursor = conn.cursor()
 
-        today = date.today()
+        today = today or date.today()
         week_start = today - timedelta(days=today.weekday())
 
         cursor.execute("""
-            SELECT COUNT(*) FROM weekly_goals
-            WHERE created_by = ? AND completed = 1
-            AND week_start >= ?
+            SELECT COALESCE(SUM(goals_completed), 0) FROM goal_stats_weekly
+            WHERE created_by = ? AND week_start >= ?
         """, (user_email, week_start.isoformat()))
 
         count = cursor.fetchone()[0]
         conn.close()
-        return count
+        return int(count)
 
-    def _analyze_weekly_performance(self, df: pd.DataFrame, user_email: str) -> Dict[str, Any]:
-        """Analisa performance semanal"""
-        if df.empty:
-            return {"status": "insufficient_data"}
+    def get_goal_stats(self, user_email: str) -> Dict[str, Any]:
+        """Obtém os agregados de metas do usuário (lookup direto em goal_stats_user)"""
+        conn = self.db.get_goal_connection(user_email)
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT goals_set, goals_completed, target_sum, actual_sum
+            FROM goal_stats_user
+            WHERE created_by = ?
+        """, (user_email,))
+
+        row = cursor.fetchone()
+        conn.close()
 
-        # Últimas 4 semanas
-        last_month = df.tail(28)
+        goals_set, goals_completed, target_sum, actual_sum = row or (0, 0, 0.0, 0.0)
+        return {
+            "goals_set": int(goals_set),
+            "goals_completed": int(goals_completed),
+            "target_sum": float(target_sum),
+            "actual_sum": float(actual_sum),
+        }
 
-        weekly_avg = last_month.groupby('week_number')['daily_increment'].mean()
-        # Buscar metas semanais antes de usá-las em qualquer retorno
-        weekly_goals = self.get_weekly_goals(user_email)
+    def _analyze_weekly_performance(self, arrays: Dict[str, np.ndarray], user_email: str) -> Dict[str, Any]:
+        """Analisa performance semanal"""
+        if not len(arrays["day"]):
+            return {"status": "insufficient_data"}
 
-        if weekly_avg.empty:
+        # Últimas 4 semanas: média do incremento diário por semana (NaN ignorado)
+        weeks = arrays["week_number"][-28:]
+        increments = arrays["daily_increment"][-28:]
+        weekly_avg = []
+        for week in np.unique(weeks):
+            values = increments[(weeks == week) & np.isfinite(increments)]
+            if len(values):
+                weekly_avg.append(float(values.mean()))
+        weekly_avg = np.array(weekly_avg)
+        # Buscar agregados de metas antes de usá-los em qualquer retorno
+        goal_stats = self.get_goal_stats(user_email)
+
+        if not len(weekly_avg):
             return {
                 "status": "insufficient_data",
                 "avg_weekly_progress": 0.0,
                 "best_week": 0.0,
                 "worst_week": 0.0,
                 "consistency": 0.0,
-                "goals_set": len(weekly_goals),
-                "goals_completed": len([g for g in weekly_goals if g.get('completed')])
+                "goals_set": goal_stats["goals_set"],
+                "goals_completed": goal_stats["goals_completed"]
             }
 
-        def safe_float(x: float) -> float:
-            try:
-                import numpy as _np, pandas as _pd
-                if _pd.isna(x) or _np.isinf(x):
-                    return 0.0
-            except Exception:
-                pass
-            return float(x)
-
         return _sanitize_dict({
-            "avg_weekly_progress": safe_float(weekly_avg.mean()),
-            "best_week": safe_float(weekly_avg.max()),
-            "worst_week": safe_float(weekly_avg.min()),
-            "consistency": safe_float(weekly_avg.std()),
-            "goals_set": int(len(weekly_goals)),
-            "goals_completed": int(len([g for g in weekly_goals if g.get('completed')]))
+            "avg_weekly_progress": float(weekly_avg.mean()),
+            "best_week": float(weekly_avg.max()),
+            "worst_week": float(weekly_avg.min()),
+            "consistency": float(weekly_avg.std(ddof=1)) if len(weekly_avg) > 1 else 0.0,
+            "goals_set": goal_stats["goals_set"],
+            "goals_completed": goal_stats["goals_completed"]
         })
 
-    def _analyze_trends(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _analyze_trends(self, arrays: Dict[str, np.ndarray]) -> Dict[str, Any]:
         """Analisa tendências no progresso"""
-        if len(df) < 14:
+        increments = arrays["daily_increment"]
+        if len(increments) < 14:
             return {"status": "insufficient_data"}
 
+        def finite_mean(values: np.ndarray) -> float:
+            values = values[np.isfinite(values)]
+            return float(values.mean()) if len(values) else 0.0
+
         # Tendência de 7 e 14 dias
-        recent_7 = df.tail(7)['daily_increment'].mean()
-        recent_14 = df.tail(14)['daily_increment'].mean()
-        overall_avg = df['daily_increment'].mean()
-
-        # Guard against NaN/inf
-        for name, val in {"recent_7": recent_7, "recent_14": recent_14, "overall": overall_avg}.items():
-            if pd.isna(val) or np.isinf(val):
-                if name == "recent_7":
-                    recent_7 = 0.0
-                elif name == "recent_14":
-                    recent_14 = 0.0
-                else:
-                    overall_avg = 0.0
+        recent_7 = finite_mean(increments[-7:])
+        recent_14 = finite_mean(increments[-14:])
+        overall_avg = finite_mean(increments)
 
         # Detectar aceleração/desaceleração
         momentum = recent_7 - recent_14
-        def safe_float2(x: float) -> float:
-            if pd.isna(x) or np.isinf(x):
-                return 0.0
-            return float(x)
-
-        momentum_status = "accelerating" if safe_float2(momentum) > 0 else "decelerating"
+        momentum_status = "accelerating" if momentum > 0 else "decelerating"
 
         return _sanitize_dict({
-            "recent_7_days_avg": safe_float2(recent_7),
-            "recent_14_days_avg": safe_float2(recent_14),
-            "overall_average": safe_float2(overall_avg),
-            "momentum": safe_float2(momentum),
+            "recent_7_days_avg": recent_7,
+            "recent_14_days_avg": recent_14,
+            "overall_average": overall_avg,
+            "momentum": momentum,
             "momentum_status": momentum_status,
-            "vs_target": safe_float2(recent_7 - 13.8)  # 7000/508 dias
+            "vs_target": recent_7 - TARGET_DAILY_PROGRESS
         })
 
-    def _calculate_kpis(self, df: pd.DataFrame, current_data: Dict) -> Dict[str, Any]:
+    def _calculate_kpis(self, current_data: Dict) -> Dict[str, Any]:
         """Calcula KPIs principais"""
-        target_daily = 13.8  # 7000/508
+        target_daily = TARGET_DAILY_PROGRESS
         current_progress = current_data['current_progress']
         days_elapsed = current_data['days_elapsed']
 
@@ -691,8 +4670,8 @@ class AnalyticsService:
         performance_vs_target = (actual_daily_avg / target_daily) * 100
 
         # Dias restantes
-        days_remaining = (date(2025, 12, 31) - date.today()).days
-        required_daily = (7000 - current_progress) / max(1, days_remaining)
+        days_remaining = (TARGET_DEADLINE - (current_data.get('today') or date.today())).days
+        required_daily = (TARGET_PROGRESS - current_progress) / max(1, days_remaining)
 
         # Sanitize any NaN/inf before returning
         for name, val in {
@@ -714,38 +4693,1039 @@ class AnalyticsService:
             "performance_vs_target_pct": float(performance_vs_target),
             "days_remaining": int(days_remaining),
             "required_daily_remaining": float(required_daily),
-            "progress_percentage": float((current_progress / 7000) * 100),
+            "progress_percentage": float((current_progress / TARGET_PROGRESS) * 100),
             "on_track": bool(performance_vs_target >= 95)
         })
 
     def _calculate_goal_completion_rate(self, user_email: str) -> float:
         """Calcula taxa de conclusão de metas"""
+        stats = self.get_goal_stats(user_email)
+
+        if stats["goals_set"] == 0:
+            return 0.0
+
+        return (stats["goals_completed"] / stats["goals_set"]) * 100
+
+# Group commit das escritas unitárias de metas
+class GoalWriteBatcher:
+    """Agrupa escritas unitárias concorrentes em um único commit.
+
+    As requisições de POST /api/weekly-goals e PUT /api/weekly-goals/complete
+    entram numa fila; o worker junta o que chegar em até `max_delay` segundos
+    (ou `max_batch_size` itens) e aplica tudo com `apply_goal_writes`.
+    No desligamento o worker recebe um sentinela, aplica o que já tinha na
+    fila e só então termina: nenhuma requisição fica sem resposta.
+    """
+
+    _STOP = object()
+
+    def __init__(self, service: AnalyticsService, max_batch_size: int = 64, max_delay: float = 0.005):
+        self.service = service
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        # Escritas novas passam a ir direto ao banco; as da fila são drenadas pelo worker
+        self._stopping = True
+        await self._queue.put(self._STOP)
+        try:
+            await self._task
+        finally:
+            self._task = None
+
+        pending = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not self._STOP:
+                pending.append(item)
+        if pending:
+            await self._flush(pending)
+
+    async def submit(self, kind: str, payload: Any, user_email: str) -> Any:
+        """Enfileira uma escrita e aguarda o commit do lote em que ela entrou"""
+        if self._task is None or self._stopping:
+            results = await asyncio.to_thread(
+                self.service.apply_goal_writes, [(kind, payload, user_email)]
+            )
+            result = results[0]
+        else:
+            future = asyncio.get_running_loop().create_future()
+            await self._queue.put((kind, payload, user_email, future))
+            result = await future
+
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        batch: List[Tuple[str, Any, str, asyncio.Future]] = []
+        try:
+            while True:
+                item = await self._queue.get()
+                stopping = item is self._STOP
+                batch = [] if stopping else [item]
+                deadline = loop.time() + self.max_delay
+                while not stopping and len(batch) < self.max_batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                    if item is self._STOP:
+                        stopping = True
+                    else:
+                        batch.append(item)
+                if batch:
+                    await self._flush(batch)
+                batch = []
+                if stopping:
+                    return
+        finally:
+            # Cancelado no meio da coleta: o lote em mãos ainda é aplicado e respondido
+            pending = [item for item in batch if not item[3].done()]
+            if pending:
+                await self._flush(pending)
+
+    async def _flush(self, batch: List[Tuple[str, Any, str, asyncio.Future]]):
+        work = asyncio.ensure_future(asyncio.to_thread(
+            self.service.apply_goal_writes, [item[:3] for item in batch]
+        ))
+        try:
+            results = await asyncio.shield(work)
+        except asyncio.CancelledError:
+            # A thread segue até o commit: espera o desfecho e responde antes de propagar
+            try:
+                results = await work
+            except Exception as e:
+                results = [e] * len(batch)
+            self._resolve(batch, results)
+            raise
+        except Exception as e:
+            results = [e] * len(batch)
+        self._resolve(batch, results)
+
+    @staticmethod
+    def _resolve(batch: List[Tuple[str, Any, str, asyncio.Future]], results: List[Any]):
+        for item, result in zip(batch, results):
+            future = item[3]
+            if not future.done():
+                future.set_result(result)
+
+# Fila de jobs assíncronos (relatórios, retreino, simulações, exportações)
+JOBS_TABLE = """
+    CREATE TABLE IF NOT EXISTS analytics_jobs (
+        id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        params TEXT NOT NULL,
+        status TEXT NOT NULL,
+        submitted_by TEXT NOT NULL,
+        progress REAL NOT NULL DEFAULT 0,
+        cancel_requested INTEGER NOT NULL DEFAULT 0,
+        result TEXT,
+        error TEXT,
+        created_at TIMESTAMP NOT NULL,
+        started_at TIMESTAMP,
+        finished_at TIMESTAMP,
+        expires_at TIMESTAMP,
+        worker_id TEXT,
+        heartbeat_at TIMESTAMP
+    )
+"""
+
+# Colunas acrescentadas depois da criação da tabela (bancos antigos)
+JOB_LEASE_COLUMNS = {"worker_id": "TEXT", "heartbeat_at": "TIMESTAMP"}
+
+JOB_FINAL_STATUSES = ("succeeded", "failed", "cancelled")
+
+def _json_default(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    return str(value)
+
+class JobCancelled(Exception):
+    pass
+
+class JobContext:
+    """Passado aos handlers: progresso e verificação cooperativa de cancelamento"""
+
+    def __init__(self, queue: "JobQueue", job_id: str, params: Dict[str, Any], user_email: str):
+        self.queue = queue
+        self.job_id = job_id
+        self.params = params
+        self.user_email = user_email
+        self.committed = False
+        self._last_check = 0.0
+
+    def progress(self, fraction: float):
+        self.queue._execute(
+            "UPDATE analytics_jobs SET progress = ? WHERE id = ?", (float(min(max(fraction, 0.0), 1.0)), self.job_id)
+        )
+
+    def check_cancelled(self, force: bool = False):
+        """Levanta JobCancelled se o cancelamento foi pedido (consulta no máximo 2x/s)"""
+        if self.committed:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_check < 0.5:
+            return
+        self._last_check = now
+        row = self.queue._fetchone("SELECT cancel_requested FROM analytics_jobs WHERE id = ?", (self.job_id,))
+        if row and row[0]:
+            raise JobCancelled()
+
+    def commit(self):
+        """Última verificação antes de um efeito colateral (ex.: troca do modelo);
+        depois dela o job não pode mais terminar como 'cancelled'"""
+        self.check_cancelled(force=True)
+        self.committed = True
+
+class JobQueue:
+    """Jobs persistidos no banco e executados por um pool de threads.
+
+    `submit` grava o job como 'queued'; cada worker reivindica o mais antigo
+    com um UPDATE condicional (seguro entre processos que compartilham o
+    banco), executa o handler registrado para o tipo e grava o resultado em
+    JSON com validade de `result_ttl`.
+
+    O job reivindicado fica com o `worker_id` desta instância e um
+    heartbeat renovado a cada `lease / 3` segundos; só jobs 'running' com
+    heartbeat vencido (instância que caiu) voltam para a fila.
+    """
+
+    def __init__(self, db: DatabaseManager, workers: int = 2,
+                 result_ttl: timedelta = timedelta(hours=24), poll_interval: float = 1.0,
+                 lease: float = 60.0):
+        import socket
+        import uuid
+        self.db = db
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.handlers: Dict[str, Any] = {}
+        self._wakeup = threading.Condition()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._last_purge = 0.0
+
+    def register(self, kind: str, handler):
+        """`handler(ctx: JobContext)` devolve um resultado serializável em JSON"""
+        self.handlers[kind] = handler
+
+    def _execute(self, query: str, params: tuple = ()) -> int:
         conn = self.db.get_connection()
-        cursor = conn.cursor()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
 
-        cursor.execute("""
-            SELECT
-                COUNT(*) as total,
-                SUM(CASE WHEN completed = 1 THEN 1 ELSE 0 END) as completed
-            FROM weekly_goals
-            WHERE created_by = ?
-        """, (user_email,))
+    def _fetchone(self, query: str, params: tuple = ()):
+        conn = self.db.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return cursor.fetchone()
+        finally:
+            conn.close()
 
-        result = cursor.fetchone()
+    @staticmethod
+    def _now() -> str:
+        return datetime.now().isoformat(sep=" ")
+
+    def submit(self, kind: str, params: Dict[str, Any], user_email: str) -> str:
+        if kind not in self.handlers:
+            raise ValueError(f"Tipo de job desconhecido: {kind}")
+        import uuid
+        job_id = str(uuid.uuid4())
+        self._execute("""
+            INSERT INTO analytics_jobs (id, kind, params, status, submitted_by, created_at)
+            VALUES (?, ?, ?, 'queued', ?, ?)
+        """, (job_id, kind, json.dumps(params, default=_json_default), user_email, self._now()))
+        with self._wakeup:
+            self._wakeup.notify()
+        logger.info(f"Job {kind} enfileirado: {job_id}")
+        return job_id
+
+    def get(self, job_id: str, user_email: str, include_result: bool = False) -> Optional[Dict[str, Any]]:
+        row = self._fetchone(f"""
+            SELECT id, kind, params, status, progress, error, created_at, started_at,
+                   finished_at, expires_at{', result' if include_result else ''}
+            FROM analytics_jobs
+            WHERE id = ? AND submitted_by = ?
+        """, (job_id, user_email))
+        if row is None:
+            return None
+        job = {
+            "job_id": row[0], "kind": row[1], "params": json.loads(row[2]), "status": row[3],
+            "progress": float(row[4]), "error": row[5],
+            "created_at": str(row[6]) if row[6] else None,
+            "started_at": str(row[7]) if row[7] else None,
+            "finished_at": str(row[8]) if row[8] else None,
+            "expires_at": str(row[9]) if row[9] else None,
+        }
+        if include_result:
+            job["result"] = json.loads(row[10]) if row[10] is not None else None
+        return job
+
+    def list(self, user_email: str, limit: int = 50) -> List[Dict[str, Any]]:
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, kind, status, progress, created_at, finished_at
+            FROM analytics_jobs
+            WHERE submitted_by = ?
+            ORDER BY created_at DESC
+            LIMIT ?
+        """, (user_email, limit))
+        rows = cursor.fetchall()
         conn.close()
+        return [
+            {"job_id": job_id, "kind": kind, "status": status, "progress": float(progress),
+             "created_at": str(created_at), "finished_at": str(finished_at) if finished_at else None}
+            for job_id, kind, status, progress, created_at, finished_at in rows
+        ]
 
-        if result[0] == 0:
-            return 0.0
+    def cancel(self, job_id: str, user_email: str) -> Optional[str]:
+        """Cancela um job na fila ou pede o cancelamento de um em execução; devolve o status"""
+        now = self._now()
+        self._execute("""
+            UPDATE analytics_jobs
+            SET status = 'cancelled', finished_at = ?, expires_at = ?
+            WHERE id = ? AND submitted_by = ? AND status = 'queued'
+        """, (now, (datetime.now() + self.result_ttl).isoformat(sep=" "), job_id, user_email))
+        self._execute("""
+            UPDATE analytics_jobs SET cancel_requested = 1
+            WHERE id = ? AND submitted_by = ? AND status = 'running'
+        """, (job_id, user_email))
+        row = self._fetchone(
+            "SELECT status FROM analytics_jobs WHERE id = ? AND submitted_by = ?", (job_id, user_email)
+        )
+        return row[0] if row else None
+
+    def _claim(self) -> Optional[Tuple[str, str, str, str]]:
+        while True:
+            row = self._fetchone("""
+                SELECT id, kind, params, submitted_by FROM analytics_jobs
+                WHERE status = 'queued'
+                ORDER BY created_at
+                LIMIT 1
+            """)
+            if row is None:
+                return None
+            now = self._now()
+            claimed = self._execute("""
+                UPDATE analytics_jobs SET status = 'running', started_at = ?, worker_id = ?, heartbeat_at = ?
+                WHERE id = ? AND status = 'queued'
+            """, (now, self.worker_id, now, row[0]))
+            if claimed:
+                return row
+            # Outro worker levou este job; tenta o próximo
+
+    def _finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None) -> bool:
+        """Grava o desfecho; não faz nada se o lease foi perdido para outra instância"""
+        finished = datetime.now()
+        return bool(self._execute("""
+            UPDATE analytics_jobs
+            SET status = ?, result = ?, error = ?, progress = CASE WHEN ? = 'succeeded' THEN 1 ELSE progress END,
+                finished_at = ?, expires_at = ?, heartbeat_at = NULL
+            WHERE id = ? AND worker_id = ? AND status = 'running'
+        """, (status, json.dumps(result, default=_json_default) if result is not None else None, error,
+              status, finished.isoformat(sep=" "), (finished + self.result_ttl).isoformat(sep=" "),
+              job_id, self.worker_id)))
+
+    def run_one(self) -> bool:
+        """Executa o próximo job da fila (se houver); devolve se executou algo"""
+        claimed = self._claim()
+        if claimed is None:
+            return False
+        job_id, kind, params, user_email = claimed
+        ctx = JobContext(self, job_id, json.loads(params), user_email)
+        started = time.perf_counter()
+        try:
+            handler = self.handlers.get(kind)
+            if handler is None:
+                raise ValueError(f"Tipo de job desconhecido: {kind}")
+            result = handler(ctx)
+            # Sem efeito colateral aplicado, um cancelamento tardio ainda vale
+            ctx.check_cancelled(force=True)
+            if self._finish(job_id, "succeeded", result):
+                logger.info(f"Job {kind} {job_id} concluído em {time.perf_counter() - started:.2f}s")
+            else:
+                logger.warning(f"Job {kind} {job_id} concluído, mas o lease foi perdido; resultado descartado")
+        except JobCancelled:
+            self._finish(job_id, "cancelled")
+            logger.info(f"Job {kind} {job_id} cancelado")
+        except Exception as e:
+            self._finish(job_id, "failed", error=str(e))
+            logger.error(f"Job {kind} {job_id} falhou: {e}")
+        return True
+
+    def pending(self, kind: str) -> bool:
+        """Há job do tipo na fila ou em execução?"""
+        row = self._fetchone(
+            "SELECT 1 FROM analytics_jobs WHERE kind = ? AND status IN ('queued', 'running') LIMIT 1", (kind,)
+        )
+        return row is not None
+
+    def purge_expired(self) -> int:
+        removed = self._execute("""
+            DELETE FROM analytics_jobs
+            WHERE status IN ('succeeded', 'failed', 'cancelled') AND expires_at < ?
+        """, (self._now(),))
+        if removed:
+            logger.info(f"{removed} jobs expirados removidos")
+        return removed
+
+    def heartbeat(self) -> int:
+        """Renova o lease dos jobs em execução nesta instância"""
+        return self._execute(
+            "UPDATE analytics_jobs SET heartbeat_at = ? WHERE worker_id = ? AND status = 'running'",
+            (self._now(), self.worker_id)
+        )
+
+    def recover(self) -> int:
+        """Devolve à fila jobs 'running' cujo lease venceu (instância que caiu)"""
+        expired = (datetime.now() - timedelta(seconds=self.lease)).isoformat(sep=" ")
+        recovered = self._execute("""
+            UPDATE analytics_jobs
+            SET status = 'queued', started_at = NULL, progress = 0, worker_id = NULL, heartbeat_at = NULL
+            WHERE status = 'running' AND (worker_id IS NULL OR worker_id <> ?)
+              AND (heartbeat_at IS NULL OR heartbeat_at < ?)
+        """, (self.worker_id, expired))
+        if recovered:
+            logger.info(f"{recovered} jobs com lease vencido devolvidos à fila")
+        return recovered
+
+    def _heartbeat_loop(self):
+        while not self._stopping.wait(self.lease / 3):
+            try:
+                self.heartbeat()
+            except Exception as e:
+                logger.error(f"Erro ao renovar lease dos jobs: {e}")
+
+    def _worker(self):
+        while not self._stopping.is_set():
+            try:
+                if time.monotonic() - self._last_purge > 60:
+                    self._last_purge = time.monotonic()
+                    self.purge_expired()
+                    self.recover()
+                if self.run_one():
+                    continue
+            except Exception as e:
+                logger.error(f"Erro no worker de jobs: {e}")
+            with self._wakeup:
+                self._wakeup.wait(self.poll_interval)
+
+    async def start(self):
+        await asyncio.to_thread(self.recover)
+        self._stopping.clear()
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"analytics-job-{i}", daemon=True)
+            for i in range(self.workers)
+        ] + [threading.Thread(target=self._heartbeat_loop, name="analytics-job-heartbeat", daemon=True)]
+        for thread in self._threads:
+            thread.start()
+
+    async def stop(self):
+        self._stopping.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            # Jobs em execução terminam; os da fila ficam para o próximo start
+            await asyncio.to_thread(thread.join)
+        self._threads = []
+
+MAX_JOB_SIMULATION_PATHS = 2_000_000
+
+def register_analytics_jobs(queue: JobQueue, service: AnalyticsService, retention: RetentionManager):
+    """Tipos de job disponíveis em POST /api/jobs"""
+
+    def retrain(ctx: JobContext):
+        # Pedido explícito retreina sempre; o RetrainScheduler envia force=False
+        ctx.check_cancelled(force=True)
+        return service.retrain_if_drifted(force=bool(ctx.params.get("force", True)), before_swap=ctx.commit)
+
+    def simulation(ctx: JobContext):
+        paths = int(ctx.params.get("paths", 200_000))
+        if not 1 <= paths <= MAX_JOB_SIMULATION_PATHS:
+            raise ValueError(f"paths deve estar entre 1 e {MAX_JOB_SIMULATION_PATHS}")
+
+        def on_chunk(fraction: float):
+            ctx.progress(fraction)
+            ctx.check_cancelled()
+
+        return service.simulate_success(paths, on_chunk=on_chunk)
+
+    def export(ctx: JobContext):
+        start = date.fromisoformat(ctx.params["start"]) if ctx.params.get("start") else None
+        end = date.fromisoformat(ctx.params["end"]) if ctx.params.get("end") else None
+        frames = []
+        if ctx.params.get("include_archive"):
+            frames.append(retention.read_archive("progress_history", start, end))
+            ctx.progress(0.5)
+            ctx.check_cancelled()
+        frames.append(service.export_progress(start, end))
+        df = pd.concat([f for f in frames if not f.empty] or frames[-1:], ignore_index=True)
+        df = df.astype(object).where(df.notna(), None)
+        return {"columns": list(df.columns), "rows": df.values.tolist()}
+
+    def goals_report(ctx: JobContext):
+        return service.goals_report(
+            weeks=int(ctx.params.get("weeks", 12)),
+            top=int(ctx.params.get("top", 10)),
+            min_goals=int(ctx.params.get("min_goals", 3)),
+        )
+
+    queue.register("retrain", retrain)
+    queue.register("simulation", simulation)
+    queue.register("export", export)
+    queue.register("goals_report", goals_report)
+
+class RetrainScheduler:
+    """Verifica o drift periodicamente e só enfileira retreino quando os dados mudaram
+    (ou o treino inicial, enquanto o serviço ainda não tem modelos)"""
+
+    def __init__(self, service: AnalyticsService, queue: JobQueue, check_interval: float = 6 * 3600.0):
+        self.service = service
+        self.queue = queue
+        self.check_interval = check_interval
+        self.last_report: Optional[Dict[str, Any]] = None
+        self.last_check: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def tick(self) -> Dict[str, Any]:
+        report = self.service.check_drift()
+        untrained = not self.service.ml_engine.is_trained
+        if (report["should_retrain"] or untrained) and not self.queue.pending("retrain"):
+            # Sem modelos (primeiro tick após o start) o job faz o treino inicial
+            report["job_id"] = self.queue.submit("retrain", {"force": False}, "system")
+            if untrained:
+                logger.info("Modelos ainda não treinados; treino inicial enfileirado")
+            else:
+                logger.info(f"Drift detectado ({', '.join(report['reasons'])}); retreino enfileirado")
+        self.last_report = report
+        self.last_check = datetime.now().isoformat(sep=" ")
+        return report
+
+    async def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.tick)
+            except Exception as e:
+                logger.error(f"Erro na verificação de drift: {e}")
+            await asyncio.sleep(self.check_interval)
+
+class CacheWarmer:
+    """Aquece os caches em torno da virada do dia.
+
+    Parte de analytics depende de date.today() (dias decorridos, semana,
+    dias restantes, metas da semana), então as chaves em cache mudam à
+    meia-noite. `lead` segundos antes da virada os resultados do dia seguinte
+    são calculados com os dados correntes; `lag` segundos depois, uma nova
+    rodada cobre o que mudou nesse intervalo (só calcula as chaves ausentes).
+    Na subida da API o dia corrente é aquecido uma vez.
+    """
+
+    def __init__(self, service: AnalyticsService, lead: float = 300.0, lag: float = 30.0,
+                 max_users: int = 500, active_days: int = 7):
+        self.service = service
+        self.lead = lead
+        self.lag = lag
+        self.max_users = max_users
+        self.active_days = active_days
+        self.last_run: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def next_run(self, now: Optional[datetime] = None) -> Tuple[datetime, date]:
+        """Próximo disparo e o dia que ele aquece"""
+        now = now or datetime.now()
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        after_today = midnight - timedelta(days=1) + timedelta(seconds=self.lag)
+        if now < after_today:
+            return after_today, now.date()
+        before_tomorrow = midnight - timedelta(seconds=self.lead)
+        if now < before_tomorrow:
+            return before_tomorrow, midnight.date()
+        return midnight + timedelta(seconds=self.lag), midnight.date()
+
+    def warm(self, day: Optional[date] = None) -> Dict[str, Any]:
+        report = self.service.warm_caches(day, self.max_users, self.active_days)
+        day = date.fromisoformat(report["day"])
+        if day.weekday() == 0:
+            report["week_rollover"] = True
+        self.last_run = {**report, "at": datetime.now().isoformat(timespec="seconds")}
+        if day > date.today() and report["seconds"] > self.lead:
+            logger.warning(
+                f"Aquecimento levou {report['seconds']}s, mais que a antecedência de {self.lead}s"
+            )
+        logger.info(f"Caches aquecidos: {report}")
+        return report
+
+    async def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _loop(self):
+        try:
+            await asyncio.to_thread(self.warm)
+        except Exception as e:
+            logger.error(f"Erro no aquecimento inicial dos caches: {e}")
+        while True:
+            when, day = self.next_run()
+            await asyncio.sleep(max(0.0, (when - datetime.now()).total_seconds()))
+            try:
+                await asyncio.to_thread(self.warm, day)
+            except Exception as e:
+                logger.error(f"Erro no aquecimento dos caches: {e}")
+
+# Consumo e compactação do log de eventos
+class EventLogWorker:
+    """Consome o log de eventos em segundo plano e o compacta periodicamente.
+
+    O consumidor `progress_consumers` acompanha o stream de progresso com
+    `EventLog.tail`: cada lote novo (escrito por esta ou por outra instância)
+    alimenta a série de features e o detector de anomalias sem esperar uma
+    leitura da API, e grava as anomalias pendentes. A cada `compact_interval`
+    segundos o log de cada partição é compactado até o menor checkpoint.
+    """
+
+    CONSUMER = "progress_consumers"
+
+    def __init__(self, service: AnalyticsService, events: EventLog, interval: float = 5.0,
+                 compact_interval: float = 3600.0):
+        self.service = service
+        self.events = events
+        self.interval = interval
+        self.compact_interval = compact_interval
+        self.last_compaction: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def poll(self) -> Dict[int, int]:
+        processed = self.events.tail(self.CONSUMER, self._on_progress, ["progress"])
+        # Inclui as anomalias detectadas por leituras da API desde a última rodada
+        self.service.flush_anomalies()
+        return processed
+
+    def _on_progress(self, events: List[Dict[str, Any]]):
+        self.service.sync_progress_consumers()
+
+    def compact(self) -> List[Dict[str, Any]]:
+        results = self.events.compact_all()
+        self.last_compaction = {"at": datetime.now().isoformat(timespec="seconds"), "partitions": results}
+        return results
+
+    async def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        try:
+            await asyncio.to_thread(self.service.flush_anomalies)
+        except Exception as e:
+            logger.error(f"Erro ao gravar anomalias pendentes: {e}")
+
+    async def _loop(self):
+        last_compaction = time.monotonic()
+        while True:
+            try:
+                await asyncio.to_thread(self.poll)
+            except Exception as e:
+                logger.error(f"Erro ao consumir o log de eventos: {e}")
+            if time.monotonic() - last_compaction >= self.compact_interval:
+                last_compaction = time.monotonic()
+                try:
+                    await asyncio.to_thread(self.compact)
+                except Exception as e:
+                    logger.error(f"Erro ao compactar o log de eventos: {e}")
+            await asyncio.sleep(self.interval)
+
+# Controle de admissão por orçamento de latência
+class AdmissionController:
+    """Limita o trabalho caro em andamento e degrada sob sobrecarga.
+
+    Uma requisição roda o caminho completo se houver vaga (`max_in_flight`)
+    e a latência p95 recente estiver dentro do orçamento; senão recebe a
+    resposta degradada, que também é limitada (`max_degraded`). Acima disso o
+    chamador devolve 503 com Retry-After. Com nada em andamento o caminho
+    completo é sempre admitido, para que a latência volte a ser medida.
+    """
+
+    def __init__(self, max_in_flight: int = 8, latency_budget: float = 1.0,
+                 window: float = 30.0, max_degraded: int = 32):
+        self.max_in_flight = max_in_flight
+        self.latency_budget = latency_budget
+        self.window = window
+        self.max_degraded = max_degraded
+        self._lock = threading.Lock()
+        self._latencies: "deque[Tuple[float, float]]" = deque(maxlen=1024)
+        self.in_flight = 0
+        self.degraded_in_flight = 0
+        self.counters = {"full": 0, "degraded": 0, "rejected": 0}
+
+    def _recent(self) -> np.ndarray:
+        since = time.monotonic() - self.window
+        return np.array([seconds for at, seconds in self._latencies if at >= since])
+
+    def _percentile(self, q: float) -> Optional[float]:
+        recent = self._recent()
+        return float(np.percentile(recent, q)) if len(recent) else None
+
+    def acquire(self) -> Tuple[str, Optional[str]]:
+        """Decide o modo da requisição: ('full' | 'degraded' | 'rejected', motivo)"""
+        with self._lock:
+            p95 = self._percentile(95)
+            if self.in_flight >= self.max_in_flight:
+                reason = f"{self.in_flight} análises em andamento (limite {self.max_in_flight})"
+            elif self.in_flight and p95 is not None and p95 > self.latency_budget:
+                reason = f"latência p95 de {p95:.2f}s acima do orçamento de {self.latency_budget:.2f}s"
+            else:
+                self.in_flight += 1
+                self.counters["full"] += 1
+                return "full", None
+            if self.degraded_in_flight >= self.max_degraded:
+                self.counters["rejected"] += 1
+                return "rejected", reason
+            self.degraded_in_flight += 1
+            self.counters["degraded"] += 1
+            return "degraded", reason
+
+    def release(self, mode: str, started: float):
+        with self._lock:
+            if mode == "full":
+                self.in_flight -= 1
+                self._latencies.append((time.monotonic(), time.monotonic() - started))
+            elif mode == "degraded":
+                self.degraded_in_flight -= 1
+
+    def retry_after(self) -> int:
+        """Segundos até haver vaga, estimados pela latência mediana e pela fila"""
+        with self._lock:
+            p50 = self._percentile(50) or self.latency_budget
+            backlog = self.in_flight + self.degraded_in_flight
+        return int(min(30, max(1, np.ceil(p50 * backlog / max(1, self.max_in_flight)))))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            recent = self._recent()
+            return {
+                "in_flight": self.in_flight,
+                "degraded_in_flight": self.degraded_in_flight,
+                "max_in_flight": self.max_in_flight,
+                "max_degraded": self.max_degraded,
+                "latency_budget_seconds": self.latency_budget,
+                "window_seconds": self.window,
+                "samples": len(recent),
+                "p50_seconds": float(np.percentile(recent, 50)) if len(recent) else None,
+                "p95_seconds": float(np.percentile(recent, 95)) if len(recent) else None,
+                **self.counters,
+            }
+
+# Diagnóstico de memória
+def deep_sizeof(obj: Any) -> Tuple[int, int]:
+    """Bytes alcançáveis a partir de `obj`: (heap, mapeados via mmap).
+
+    Percorre contêineres, __dict__/__slots__ e o estado de extensões como a
+    Tree do sklearn; arrays contam o buffer só uma vez (views sobem para o
+    array dono dos dados) e memmaps entram como memória mapeada, que o SO
+    pode descartar e não cresce com o heap.
+    """
+    import types
+    skip = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+            types.MethodType, logging.Logger, threading.Thread, ThreadPoolExecutor)
+    heap = mapped = 0
+    seen = set()
+    # Estados devolvidos por __getstate__ são temporários: mantê-los vivos
+    # impede que o id() seja reaproveitado e confundido com `seen`
+    temporaries = []
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or item is None or isinstance(item, skip):
+            continue
+        seen.add(id(item))
+
+        if isinstance(item, np.ndarray):
+            # getsizeof inclui o buffer só quando o array é dono dos dados
+            heap += sys.getsizeof(item)
+            if item.dtype == object:
+                stack.extend(item.ravel().tolist())
+            if isinstance(item.base, np.ndarray):
+                stack.append(item.base)
+            elif isinstance(item, np.memmap):
+                mapped += item.nbytes
+            elif item.base is not None:
+                # Buffer de outro objeto (ex.: nós da Tree do sklearn)
+                heap += item.nbytes
+            continue
+        if isinstance(item, (pd.DataFrame, pd.Series, pd.Index)):
+            heap += int(np.sum(item.memory_usage(deep=True)))
+            continue
+        if isinstance(item, (str, bytes, bytearray, int, float, bool, complex, np.generic)):
+            heap += sys.getsizeof(item)
+            continue
+
+        heap += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)) or type(item).__name__ == "deque":
+            stack.extend(item)
+        else:
+            state = getattr(item, "__dict__", None)
+            if state is None:
+                try:
+                    state = item.__getstate__()
+                    temporaries.append(state)
+                except Exception:
+                    state = None
+            if state is not None:
+                stack.append(state)
+            for slot in getattr(type(item), "__slots__", ()):
+                stack.append(getattr(item, slot, None))
+    return heap, mapped
+
+def process_memory() -> Dict[str, Any]:
+    """RSS atual (Linux: /proc/self/statm) e pico (getrusage)"""
+    info: Dict[str, Any] = {"rss_bytes": None, "peak_rss_bytes": None}
+    try:
+        with open("/proc/self/statm") as f:
+            pages = f.read().split()
+        info["rss_bytes"] = int(pages[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss vem em KiB no Linux e em bytes no macOS
+        info["peak_rss_bytes"] = peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        pass
+    return info
+
+class MemoryProfiler:
+    """Contabilidade de memória por componente e snapshots de tracemalloc.
+
+    Componentes são registrados como funções que devolvem o objeto a medir
+    (avaliadas na hora, então trocas de engine/caches entram no relatório
+    seguinte). Estruturas alteradas por outras threads são registradas com o
+    lock do dono: o relatório mede uma cópia rasa feita sob ele ou, para
+    estruturas pequenas, o próprio objeto com o lock seguro.
+
+    Os snapshots ficam em memória, limitados a `max_snapshots`, e podem ser
+    comparados dois a dois para achar as linhas que mais cresceram.
+    """
+
+    def __init__(self, max_snapshots: int = 8):
+        self.components: Dict[str, Any] = {}
+        self.max_snapshots = max_snapshots
+        self._snapshots: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._next_snapshot = 1
+        self._lock = threading.Lock()
+
+    def register(self, name: str, getter, lock=None, in_place: bool = False):
+        """`getter()` devolve o objeto cujo tamanho entra como `name`. Com `lock`,
+        o objeto é copiado (cópia rasa) sob ele e medido depois; `in_place` mede
+        o objeto sem cópia, com o lock seguro durante a medição (para estruturas
+        de tamanho limitado, como janelas e detectores, cujo estado mutável uma
+        cópia rasa não isolaria)"""
+        self.components[name] = (getter, lock, in_place)
+
+    @staticmethod
+    def _measure(getter, lock, in_place: bool) -> Tuple[int, int]:
+        if lock is None:
+            return deep_sizeof(getter())
+        with lock:
+            obj = getter()
+            if in_place:
+                return deep_sizeof(obj)
+            obj = dict(obj) if isinstance(obj, dict) else copy.copy(obj)
+        return deep_sizeof(obj)
+
+    def report(self) -> Dict[str, Any]:
+        started = time.perf_counter()
+        components = {}
+        for name, (getter, lock, in_place) in list(self.components.items()):
+            try:
+                heap, mapped = self._measure(getter, lock, in_place)
+                components[name] = {"heap_bytes": heap, "mapped_bytes": mapped}
+            except Exception as e:
+                components[name] = {"error": str(e)}
+        accounted = sum(item.get("heap_bytes", 0) for item in components.values())
+        process = process_memory()
+        traced_current, traced_peak = tracemalloc.get_traced_memory()
+        return {
+            "process": process,
+            "components": components,
+            "accounted_heap_bytes": accounted,
+            "unaccounted_bytes": process["rss_bytes"] - accounted if process["rss_bytes"] else None,
+            "gc": {"counts": gc.get_count(), "tracked_objects": len(gc.get_objects()),
+                   "garbage": len(gc.garbage)},
+            "tracemalloc": {
+                "tracing": tracemalloc.is_tracing(),
+                "frames": tracemalloc.get_traceback_limit(),
+                "traced_bytes": traced_current,
+                "traced_peak_bytes": traced_peak,
+                "snapshots": self.list_snapshots(),
+            },
+            "elapsed_seconds": time.perf_counter() - started,
+        }
 
-        return (result[1] / result[0]) * 100
+    def start_tracing(self, frames: int = 10) -> Dict[str, Any]:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            logger.info(f"tracemalloc iniciado ({frames} frames)")
+        return {"tracing": True, "frames": tracemalloc.get_traceback_limit()}
+
+    def stop_tracing(self) -> Dict[str, Any]:
+        tracemalloc.stop()
+        with self._lock:
+            self._snapshots.clear()
+        logger.info("tracemalloc parado")
+        return {"tracing": False}
+
+    def take_snapshot(self, label: Optional[str] = None) -> Dict[str, Any]:
+        snapshot_id, entry = self._take(label)
+        return {"id": snapshot_id, **self._describe(entry)}
+
+    def _take(self, label: Optional[str]) -> Tuple[int, Dict[str, Any]]:
+        if not tracemalloc.is_tracing():
+            raise ValueError("tracemalloc não está ativo")
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+        entry = {
+            "snapshot": snapshot,
+            "label": label,
+            "taken_at": datetime.now().isoformat(sep=" "),
+            "traced_bytes": sum(trace.size for trace in snapshot.traces),
+            "rss_bytes": process_memory()["rss_bytes"],
+        }
+        with self._lock:
+            snapshot_id = self._next_snapshot
+            self._next_snapshot += 1
+            self._snapshots[snapshot_id] = entry
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        return snapshot_id, entry
+
+    @staticmethod
+    def _describe(entry: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in entry.items() if key != "snapshot"}
+
+    def list_snapshots(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{"id": snapshot_id, **self._describe(entry)}
+                    for snapshot_id, entry in self._snapshots.items()]
+
+    def diff(self, base: int, target: Optional[int] = None, key_type: str = "lineno",
+             limit: int = 25) -> Dict[str, Any]:
+        """Maiores variações de `base` para `target` (ou para um snapshot novo)"""
+        if key_type not in ("lineno", "filename", "traceback"):
+            raise ValueError("key_type deve ser lineno, filename ou traceback")
+        with self._lock:
+            if base not in self._snapshots:
+                raise KeyError(f"Snapshot inexistente: {base}")
+            old = self._snapshots[base]
+            if target is not None:
+                if target not in self._snapshots:
+                    raise KeyError(f"Snapshot inexistente: {target}")
+                new = self._snapshots[target]
+        if target is None:
+            # `base` já está em mãos: o snapshot novo pode descartá-lo do limite
+            target, new = self._take("diff")
+        stats = new["snapshot"].compare_to(old["snapshot"], key_type)
+        return {
+            "base": base,
+            "target": target,
+            "key_type": key_type,
+            "traced_bytes_diff": new["traced_bytes"] - old["traced_bytes"],
+            "rss_bytes_diff": (
+                new["rss_bytes"] - old["rss_bytes"] if new["rss_bytes"] and old["rss_bytes"] else None
+            ),
+            "top": [
+                {
+                    "location": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+                    "size_diff": stat.size_diff,
+                    "size": stat.size,
+                    "count_diff": stat.count_diff,
+                    "count": stat.count,
+                }
+                for stat in stats[:limit]
+            ],
+        }
 
 # FastAPI App
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     logger.info("Iniciando Analytics Backend com ML...")
+    await goal_write_batcher.start()
+    await retention_manager.start()
+    await job_queue.start()
+    await retrain_scheduler.start()
+    await cache_warmer.start()
+    await event_log_worker.start()
     yield
     # Shutdown
+    await event_log_worker.stop()
+    await cache_warmer.stop()
+    await retrain_scheduler.stop()
+    await job_queue.stop()
+    await retention_manager.stop()
+    await goal_write_batcher.stop()
     logger.info("Desligando Analytics Backend...")
 
 app = FastAPI(
@@ -765,7 +5745,87 @@ app.add_middleware(
 
 # Inicializar serviços
 db_manager = DatabaseManager()
+event_log = EventLog(db_manager)
+EVENT_POLL_SECONDS = float(os.getenv("ANALYTICS_EVENT_POLL_SECONDS", "1"))
 analytics_service = AnalyticsService(db_manager)
+goal_write_batcher = GoalWriteBatcher(analytics_service)
+retention_manager = RetentionManager(
+    db_manager,
+    retention_days={
+        "progress_history": int(os.getenv("ANALYTICS_RETENTION_DAYS", "365")),
+        "ml_predictions": int(os.getenv("ANALYTICS_PREDICTION_RETENTION_DAYS", "90")),
+    },
+    compaction_interval=timedelta(hours=float(os.getenv("ANALYTICS_RETENTION_INTERVAL_HOURS", "24"))),
+    vacuum_interval=timedelta(hours=float(os.getenv("ANALYTICS_VACUUM_INTERVAL_HOURS", "168"))),
+)
+job_queue = JobQueue(
+    db_manager,
+    workers=int(os.getenv("ANALYTICS_JOB_WORKERS", "2")),
+    result_ttl=timedelta(hours=float(os.getenv("ANALYTICS_JOB_RESULT_TTL_HOURS", "24"))),
+)
+register_analytics_jobs(job_queue, analytics_service, retention_manager)
+retrain_scheduler = RetrainScheduler(
+    analytics_service,
+    job_queue,
+    check_interval=float(os.getenv("ANALYTICS_DRIFT_CHECK_INTERVAL_HOURS", "6")) * 3600,
+)
+event_log_worker = EventLogWorker(
+    analytics_service,
+    event_log,
+    interval=float(os.getenv("ANALYTICS_EVENT_CONSUMER_SECONDS", "5")),
+    compact_interval=float(os.getenv("ANALYTICS_EVENT_COMPACT_SECONDS", "3600")),
+)
+cache_warmer = CacheWarmer(
+    analytics_service,
+    lead=float(os.getenv("ANALYTICS_WARM_LEAD_SECONDS", "300")),
+    lag=float(os.getenv("ANALYTICS_WARM_LAG_SECONDS", "30")),
+    max_users=int(os.getenv("ANALYTICS_WARM_MAX_USERS", "500")),
+    active_days=int(os.getenv("ANALYTICS_ACTIVE_USER_DAYS", "7")),
+)
+admission = AdmissionController(
+    max_in_flight=int(os.getenv("ANALYTICS_MAX_IN_FLIGHT", "8")),
+    latency_budget=float(os.getenv("ANALYTICS_LATENCY_BUDGET_MS", "1000")) / 1000,
+    window=float(os.getenv("ANALYTICS_LATENCY_WINDOW_SECONDS", "30")),
+    max_degraded=int(os.getenv("ANALYTICS_MAX_DEGRADED_IN_FLIGHT", "32")),
+)
+memory_profiler = MemoryProfiler()
+memory_profiler.register("ml_engine.models", lambda: analytics_service.ml_engine.models)
+memory_profiler.register("ml_engine.compiled", lambda: analytics_service.ml_engine.compiled)
+memory_profiler.register("ml_engine.scalers", lambda: (
+    analytics_service.ml_engine.scalers, analytics_service.ml_engine.compiled_scaler
+))
+memory_profiler.register("ml_engine.selector", lambda: (
+    analytics_service.ml_engine.selector, analytics_service.ml_engine.selection_report
+))
+memory_profiler.register("ml_engine.insights", lambda: (
+    analytics_service.ml_engine.feature_importance, analytics_service.ml_engine.drift_reference
+))
+memory_profiler.register("progress_store", lambda: analytics_service.progress_store._maps,
+                         analytics_service.progress_store._lock)
+memory_profiler.register("progress_series", lambda: analytics_service._progress_series,
+                         analytics_service._series_lock, in_place=True)
+memory_profiler.register("anomaly_detector", lambda: analytics_service.anomaly_detector,
+                         analytics_service._series_lock, in_place=True)
+memory_profiler.register("drift_monitor", lambda: analytics_service.drift_monitor,
+                         analytics_service._series_lock, in_place=True)
+memory_profiler.register("pending_anomalies", lambda: analytics_service._pending_anomalies,
+                         analytics_service._series_lock)
+memory_profiler.register("simulation_cache", lambda: analytics_service._simulation_cache,
+                         analytics_service._simulation_lock)
+memory_profiler.register("single_flight", lambda: analytics_service.flights._flights,
+                         analytics_service.flights._lock)
+memory_profiler.register("result_cache", lambda: analytics_service.results._entries,
+                         analytics_service.results._lock)
+memory_profiler.register("last_analytics", lambda: analytics_service._last_analytics,
+                         analytics_service._analytics_state_lock)
+memory_profiler.register("active_users", lambda: analytics_service._active_users,
+                         analytics_service._analytics_state_lock)
+memory_profiler.register("goal_shard_map", lambda: db_manager._shard_map, db_manager._shard_map_lock)
+memory_profiler.register("tracemalloc_snapshots", lambda: [
+    entry["snapshot"] for entry in memory_profiler._snapshots.values()
+], memory_profiler._lock)
+if int(os.getenv("ANALYTICS_TRACEMALLOC_FRAMES", "0")) > 0:
+    memory_profiler.start_tracing(int(os.getenv("ANALYTICS_TRACEMALLOC_FRAMES")))
 security_bearer = HTTPBearer(auto_error=False)
 security_basic = HTTPBasic(auto_error=False)
 
@@ -800,18 +5860,43 @@ async def root():
         "message": "Futuristic Analytics API com Machine Learning",
         "version": "1.0.0",
         "status": "active",
-        "ml_models_trained": analytics_service.ml_engine.is_trained
+        "ml_models_trained": analytics_service.ml_engine.is_trained,
+        "single_flight": analytics_service.flights.stats()
     }
 
 @app.get("/api/analytics", response_model=AnalyticsResponse)
-async def get_analytics(user_email: str = Depends(verify_user)):
-    """Obtém análise completa com ML"""
+async def get_analytics(response: Response, user_email: str = Depends(verify_user)):
+    """Obtém análise completa com ML; sob sobrecarga responde degradado ou 503"""
+    cached, in_flight = await asyncio.to_thread(analytics_service.lookup_analytics, user_email)
+    if cached is not None:
+        return cached
+    if in_flight:
+        # Junta-se ao cálculo em andamento sem ocupar vaga: não há trabalho novo
+        try:
+            return await asyncio.to_thread(analytics_service.get_analytics, user_email)
+        except Exception as e:
+            logger.error(f"Erro ao gerar analytics: {e}")
+            raise HTTPException(status_code=500, detail="Erro interno do servidor")
+
+    mode, reason = admission.acquire()
+    if mode == "rejected":
+        logger.warning(f"Analytics rejeitado por sobrecarga: {reason}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Serviço sobrecarregado, tente novamente em instantes",
+            headers={"Retry-After": str(admission.retry_after())},
+        )
+    started = time.monotonic()
     try:
-        analytics = analytics_service.get_analytics(user_email)
-        return analytics
+        if mode == "degraded":
+            response.headers["X-Analytics-Degraded"] = "1"
+            return await asyncio.to_thread(analytics_service.get_degraded_analytics, user_email, reason)
+        return await asyncio.to_thread(analytics_service.get_analytics, user_email)
     except Exception as e:
         logger.error(f"Erro ao gerar analytics: {e}")
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
+    finally:
+        admission.release(mode, started)
 
 @app.post("/api/weekly-goals")
 async def create_weekly_goal(
@@ -820,7 +5905,7 @@ async def create_weekly_goal(
 ):
     """Cria nova meta semanal"""
     try:
-        goal_id = analytics_service.create_weekly_goal(goal, user_email)
+        goal_id = await goal_write_batcher.submit("create", goal, user_email)
         return {"success": True, "goal_id": goal_id}
     except Exception as e:
         logger.error(f"Erro ao criar meta: {e}")
@@ -847,7 +5932,7 @@ async def complete_weekly_goal(
 ):
     """Marca meta como completa"""
     try:
-        success = analytics_service.complete_weekly_goal(completion, user_email)
+        success = await goal_write_batcher.submit("complete", completion, user_email)
         if success:
             return {"success": True, "message": "Meta atualizada com sucesso"}
         else:
@@ -858,37 +5943,494 @@ async def complete_weekly_goal(
         logger.error(f"Erro ao completar meta: {e}")
         raise HTTPException(status_code=500, detail="Erro ao atualizar meta")
 
-@app.get("/api/ml-insights")
-async def get_ml_insights(user_email: str = Depends(verify_user)):
-    """Obtém insights avançados de ML"""
+MAX_BULK_GOALS = 500
+
+@app.post("/api/weekly-goals/bulk")
+async def create_weekly_goals_bulk(
+    goals: List[WeeklyGoal],
+    user_email: str = Depends(verify_user)
+):
+    """Cria várias metas semanais em uma única transação"""
+    if len(goals) > MAX_BULK_GOALS:
+        raise HTTPException(status_code=413, detail=f"Máximo de {MAX_BULK_GOALS} metas por lote")
+
+    errors = analytics_service.validate_weekly_goals(goals)
+    if errors:
+        raise HTTPException(status_code=422, detail=errors)
+
     try:
-        # Dados atuais
-        df = analytics_service.get_progress_dataframe()
-        current_progress = df['progress_value'].iloc[-1] if not df.empty else 100
+        outcomes = await asyncio.to_thread(analytics_service.create_weekly_goals, goals, user_email)
+    except Exception as e:
+        logger.error(f"Erro ao criar metas em lote: {e}")
+        raise HTTPException(status_code=500, detail="Erro ao criar metas")
 
-        # Gerar insights
-        insights = {
-            "model_performance": {
-                "is_trained": analytics_service.ml_engine.is_trained,
-                "best_model": getattr(analytics_service.ml_engine, 'best_model', 'none'),
-                "model_scores": {
-                    name: info['score'] for name, info in analytics_service.ml_engine.models.items()
-                } if analytics_service.ml_engine.is_trained else {}
-            },
-            "feature_importance": analytics_service.ml_engine.feature_columns,
-            "prediction_accuracy": "Alta" if analytics_service.ml_engine.is_trained else "Limitada",
-            "data_quality": {
-                "total_days": len(df),
-                "consistency_score": df['daily_increment'].std() if len(df) > 1 else 0,
-                "outliers_detected": len(df[df['daily_increment'] > df['daily_increment'].mean() + 3*df['daily_increment'].std()]) if len(df) > 10 else 0
-            }
+    results = []
+    for index, outcome in enumerate(outcomes):
+        if isinstance(outcome, Exception):
+            results.append({"index": index, "success": False, "error": "Erro ao criar meta"})
+        else:
+            results.append({"index": index, "success": True, "goal_id": outcome})
+
+    return {"success": all(r["success"] for r in results), "results": results}
+
+@app.put("/api/weekly-goals/complete/bulk")
+async def complete_weekly_goals_bulk(
+    completions: List[GoalCompletion],
+    user_email: str = Depends(verify_user)
+):
+    """Atualiza várias metas semanais em uma única transação"""
+    if len(completions) > MAX_BULK_GOALS:
+        raise HTTPException(status_code=413, detail=f"Máximo de {MAX_BULK_GOALS} metas por lote")
+
+    errors = analytics_service.validate_goal_completions(completions)
+    if errors:
+        raise HTTPException(status_code=422, detail=errors)
+
+    try:
+        outcomes = await asyncio.to_thread(analytics_service.complete_weekly_goals, completions, user_email)
+    except Exception as e:
+        logger.error(f"Erro ao completar metas em lote: {e}")
+        raise HTTPException(status_code=500, detail="Erro ao atualizar metas")
+
+    results = []
+    for index, (completion, outcome) in enumerate(zip(completions, outcomes)):
+        if isinstance(outcome, Exception):
+            results.append({"index": index, "goal_id": completion.goal_id, "success": False,
+                            "error": "Erro ao atualizar meta"})
+        elif not outcome:
+            results.append({"index": index, "goal_id": completion.goal_id, "success": False,
+                            "error": "Meta não encontrada"})
+        else:
+            results.append({"index": index, "goal_id": completion.goal_id, "success": True})
+
+    return {"success": all(r["success"] for r in results), "results": results}
+
+@app.get("/api/forecast/simulation")
+async def get_forecast_simulation(
+    paths: int = 20000,
+    user_email: str = Depends(verify_user)
+):
+    """Probabilidade de atingir a meta e trajetórias percentis (Monte Carlo)"""
+    if not 100 <= paths <= 200000:
+        raise HTTPException(status_code=422, detail="paths deve estar entre 100 e 200000")
+    try:
+        return await asyncio.to_thread(analytics_service.simulate_success, n_paths=paths)
+    except Exception as e:
+        logger.error(f"Erro na simulação: {e}")
+        raise HTTPException(status_code=500, detail="Erro ao simular previsão")
+
+@app.get("/api/anomalies")
+async def get_anomalies(
+    limit: int = 50,
+    user_email: str = Depends(verify_user)
+):
+    """Lista anomalias detectadas no progresso diário"""
+    try:
+        return {
+            "anomalies": await asyncio.to_thread(analytics_service.list_anomalies, max(1, min(limit, 500))),
+            "stats": await asyncio.to_thread(analytics_service.get_anomaly_stats)
+        }
+    except Exception as e:
+        logger.error(f"Erro ao listar anomalias: {e}")
+        raise HTTPException(status_code=500, detail="Erro ao listar anomalias")
+
+@app.get("/api/progress/series")
+async def get_progress_series(
+    points: int = 500,
+    metric: str = "progress_value",
+    method: str = "lttb",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    user_email: str = Depends(verify_user)
+):
+    """Série histórica reduzida no servidor (LTTB ou min/max por balde)"""
+    if metric not in ("progress_value", "daily_increment"):
+        raise HTTPException(status_code=422, detail="metric deve ser progress_value ou daily_increment")
+    if method not in ("lttb", "minmax"):
+        raise HTTPException(status_code=422, detail="method deve ser lttb ou minmax")
+    if not 3 <= points <= 10000:
+        raise HTTPException(status_code=422, detail="points deve estar entre 3 e 10000")
+    try:
+        return await asyncio.to_thread(
+            analytics_service.get_downsampled_series, points, metric, method,
+            date.fromisoformat(start) if start else None,
+            date.fromisoformat(end) if end else None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erro ao gerar série: {e}")
+        raise HTTPException(status_code=500, detail="Erro ao gerar série")
+
+@app.get("/api/progress/rollups")
+async def get_progress_rollups(
+    granularity: str = "week",
+    limit: int = 104,
+    user_email: str = Depends(verify_user)
+):
+    """Rollups semanais ou mensais do progresso"""
+    if granularity not in ROLLUP_GRANULARITIES:
+        raise HTTPException(status_code=422, detail="granularity deve ser week ou month")
+    try:
+        rollups = await asyncio.to_thread(analytics_service.get_rollups, granularity, max(1, min(limit, 1000)))
+        return {"granularity": granularity, "rollups": rollups}
+    except Exception as e:
+        logger.error(f"Erro ao buscar rollups: {e}")
+        raise HTTPException(status_code=500, detail="Erro ao buscar rollups")
+
+@app.get("/api/maintenance/retention")
+async def get_retention_status(user_email: str = Depends(verify_user)):
+    """Estado da retenção: linhas quentes, partições arquivadas e últimas manutenções"""
+    try:
+        return await asyncio.to_thread(retention_manager.status)
+    except Exception as e:
+        logger.error(f"Erro ao consultar retenção: {e}")
+        raise HTTPException(status_code=500, detail="Erro ao consultar retenção")
+
+@app.post("/api/maintenance/retention/run")
+async def run_retention(user_email: str = Depends(verify_user)):
+    """Força compactação, ANALYZE e VACUUM imediatamente"""
+    try:
+        return await asyncio.to_thread(retention_manager.run, True)
+    except Exception as e:
+        logger.error(f"Erro na manutenção de retenção: {e}")
+        raise HTTPException(status_code=500, detail="Erro na manutenção de retenção")
+
+@app.get("/api/maintenance/shards")
+async def get_goal_shards(user_email: str = Depends(verify_user)):
+    """Usuários e metas por shard"""
+    try:
+        return {
+            "sharded": db_manager.sharded,
+            "shards": await asyncio.to_thread(db_manager.shard_stats),
+        }
+    except Exception as e:
+        logger.error(f"Erro ao consultar shards: {e}")
+        raise HTTPException(status_code=500, detail="Erro ao consultar shards")
+
+@app.post("/api/maintenance/shards/rebalance")
+async def rebalance_goal_shards(tolerance: float = 0.1, user_email: str = Depends(verify_user)):
+    """Redistribui usuários entre os shards até equilibrar o número de metas"""
+    try:
+        return await asyncio.to_thread(db_manager.rebalance, tolerance)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erro ao rebalancear shards: {e}")
+        raise HTTPException(status_code=500, detail="Erro ao rebalancear shards")
+
+@app.post("/api/maintenance/shards/move")
+async def move_user_shard(user: str, shard: int, user_email: str = Depends(verify_user)):
+    """Move as metas de um usuário para o shard indicado"""
+    try:
+        return await asyncio.to_thread(db_manager.move_user, user, shard)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erro ao mover usuário de shard: {e}")
+        raise HTTPException(status_code=500, detail="Erro ao mover usuário de shard")
+
+def _parse_event_cursor(value: Optional[str]) -> Optional[List[int]]:
+    """Cursor 'partição:seq,...' (id dos eventos SSE) -> último seq por partição"""
+    if not value:
+        return None
+    positions = [0] * len(event_log.partitions)
+    try:
+        for item in value.split(","):
+            partition, seq = item.split(":")
+            if 0 <= int(partition) < len(positions):
+                positions[int(partition)] = int(seq)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Cursor de eventos inválido (esperado 'partição:seq,...')")
+    return positions
+
+def _format_event_cursor(positions: List[int]) -> str:
+    return ",".join(f"{partition}:{seq}" for partition, seq in enumerate(positions))
+
+def _read_user_events(positions: List[int], limit: int, streams: Optional[List[str]],
+                      user_email: str) -> List[Dict[str, Any]]:
+    """Eventos novos de todas as partições visíveis ao usuário; avança `positions`"""
+    events = []
+    for partition in range(len(positions)):
+        batch = event_log.read(partition, positions[partition], limit, streams, user_email)
+        if batch:
+            positions[partition] = batch[-1]["seq"]
+        events += batch
+    return events
+
+@app.get("/api/events")
+async def get_events(
+    after: Optional[str] = None,
+    limit: int = 500,
+    stream: Optional[str] = None,
+    user_email: str = Depends(verify_user)
+):
+    """Eventos de progresso e das metas do usuário após o cursor `after`"""
+    if stream is not None and stream not in ("goals", "progress"):
+        raise HTTPException(status_code=422, detail="stream deve ser goals ou progress")
+    positions = _parse_event_cursor(after) or [0] * len(event_log.partitions)
+    try:
+        events = await asyncio.to_thread(
+            _read_user_events, positions, max(1, min(limit, 5000)), [stream] if stream else None, user_email
+        )
+        return {"events": events, "cursor": _format_event_cursor(positions)}
+    except Exception as e:
+        logger.error(f"Erro ao ler eventos: {e}")
+        raise HTTPException(status_code=500, detail="Erro ao ler eventos")
+
+@app.get("/api/events/stream")
+async def stream_events(
+    request: Request,
+    after: Optional[str] = None,
+    stream: Optional[str] = None,
+    user_email: str = Depends(verify_user)
+):
+    """Server-Sent Events com o log em tempo real; retoma de Last-Event-ID
+    (ou `after`) e, sem cursor, começa pelos eventos novos"""
+    if stream is not None and stream not in ("goals", "progress"):
+        raise HTTPException(status_code=422, detail="stream deve ser goals ou progress")
+    positions = _parse_event_cursor(request.headers.get("last-event-id") or after)
+    if positions is None:
+        positions = await asyncio.to_thread(event_log.heads)
+    streams = [stream] if stream else None
+
+    async def generate():
+        idle = 0.0
+        delivered = list(positions)
+        while not await request.is_disconnected():
+            events = await asyncio.to_thread(_read_user_events, positions, 500, streams, user_email)
+            for event in events:
+                # O id é o cursor completo, para a reconexão retomar todas as partições
+                delivered[event["partition"]] = event["seq"]
+                yield (f"id: {_format_event_cursor(delivered)}\nevent: {event['stream']}\n"
+                       f"data: {json.dumps(event, default=_json_default)}\n\n")
+            if events:
+                idle = 0.0
+                continue
+            idle += EVENT_POLL_SECONDS
+            if idle >= 15:
+                idle = 0.0
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(EVENT_POLL_SECONDS)
+
+    return StreamingResponse(generate(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/api/maintenance/events")
+async def get_event_log_status(user_email: str = Depends(verify_user)):
+    """Último seq de cada partição do log, até onde foi compactado e checkpoints dos consumidores"""
+    try:
+        heads = await asyncio.to_thread(event_log.heads)
+        compacted = await asyncio.to_thread(event_log.compacted_through)
+        return {
+            "partitions": [
+                {"partition": i, "head": head, "compacted_through": compacted[i]} for i, head in enumerate(heads)
+            ],
+            "checkpoints": await asyncio.to_thread(event_log.checkpoints),
+            "last_compaction": event_log_worker.last_compaction,
         }
+    except Exception as e:
+        logger.error(f"Erro ao consultar log de eventos: {e}")
+        raise HTTPException(status_code=500, detail="Erro ao consultar log de eventos")
+
+@app.post("/api/maintenance/events/compact")
+async def compact_event_log(user_email: str = Depends(verify_user)):
+    """Compacta o log de cada partição até o menor checkpoint dos consumidores"""
+    try:
+        return {"partitions": await asyncio.to_thread(event_log_worker.compact)}
+    except Exception as e:
+        logger.error(f"Erro ao compactar o log de eventos: {e}")
+        raise HTTPException(status_code=500, detail="Erro ao compactar o log de eventos")
+
+@app.post("/api/maintenance/events/rebuild/goal_stats")
+async def rebuild_goal_stats_from_events(user_email: str = Depends(verify_user)):
+    """Reconstrói goal_stats_* por replay do log de eventos"""
+    try:
+        return {"partitions": await asyncio.to_thread(event_log.rebuild_goal_stats)}
+    except Exception as e:
+        logger.error(f"Erro ao reconstruir agregados de metas: {e}")
+        raise HTTPException(status_code=500, detail="Erro ao reconstruir agregados de metas")
+
+@app.get("/api/maintenance/cache")
+async def get_cache_status(user_email: str = Depends(verify_user)):
+    """Estado do cache de resultados e do aquecimento em torno da virada do dia"""
+    when, day = cache_warmer.next_run()
+    return {
+        "results": analytics_service.results.stats(),
+        "single_flight": analytics_service.flights.stats(),
+        "last_warm": cache_warmer.last_run,
+        "next_warm": {"at": when.isoformat(timespec="seconds"), "day": day.isoformat()},
+    }
 
+@app.post("/api/maintenance/cache/warm")
+async def warm_caches(day: Optional[str] = None, user_email: str = Depends(verify_user)):
+    """Aquece os caches agora para o dia indicado (padrão: hoje)"""
+    try:
+        target = date.fromisoformat(day) if day else None
+    except ValueError:
+        raise HTTPException(status_code=422, detail="day deve estar no formato AAAA-MM-DD")
+    if target is not None and not date.today() <= target <= date.today() + timedelta(days=1):
+        raise HTTPException(status_code=422, detail="day deve ser hoje ou amanhã")
+    try:
+        return await asyncio.to_thread(cache_warmer.warm, target)
+    except Exception as e:
+        logger.error(f"Erro ao aquecer caches: {e}")
+        raise HTTPException(status_code=500, detail="Erro ao aquecer caches")
+
+@app.get("/api/maintenance/admission")
+async def get_admission_status(user_email: str = Depends(verify_user)):
+    """Trabalho em andamento, latência recente e contadores do controle de admissão"""
+    return admission.stats()
+
+@app.get("/api/maintenance/memory")
+async def get_memory_report(user_email: str = Depends(verify_user)):
+    """Bytes por componente (modelos, caches, séries), RSS do processo e estado do tracemalloc"""
+    try:
+        return await asyncio.to_thread(memory_profiler.report)
+    except Exception as e:
+        logger.error(f"Erro no relatório de memória: {e}")
+        raise HTTPException(status_code=500, detail="Erro no relatório de memória")
+
+@app.post("/api/maintenance/memory/tracemalloc")
+async def start_tracemalloc(frames: int = 10, user_email: str = Depends(verify_user)):
+    """Liga o tracemalloc (custo extra de CPU/memória enquanto ativo)"""
+    return memory_profiler.start_tracing(max(1, min(frames, 100)))
+
+@app.delete("/api/maintenance/memory/tracemalloc")
+async def stop_tracemalloc(user_email: str = Depends(verify_user)):
+    """Desliga o tracemalloc e descarta os snapshots"""
+    return memory_profiler.stop_tracing()
+
+@app.get("/api/maintenance/memory/snapshots")
+async def list_memory_snapshots(user_email: str = Depends(verify_user)):
+    return {"snapshots": memory_profiler.list_snapshots()}
+
+@app.post("/api/maintenance/memory/snapshots")
+async def take_memory_snapshot(label: Optional[str] = None, user_email: str = Depends(verify_user)):
+    """Tira um snapshot do tracemalloc para comparar depois"""
+    try:
+        return await asyncio.to_thread(memory_profiler.take_snapshot, label)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.get("/api/maintenance/memory/diff")
+async def diff_memory_snapshots(
+    base: int,
+    target: Optional[int] = None,
+    key_type: str = "lineno",
+    limit: int = 25,
+    user_email: str = Depends(verify_user)
+):
+    """Maiores crescimentos entre dois snapshots (sem `target`, compara com um snapshot novo)"""
+    try:
+        return await asyncio.to_thread(memory_profiler.diff, base, target, key_type, max(1, min(limit, 200)))
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ValueError as e:
+        raise HTTPException(status_code=409 if "tracemalloc" in str(e) else 422, detail=str(e))
+
+@app.get("/api/archive/{source}")
+async def get_archived_rows(
+    source: str,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    user_email: str = Depends(verify_user)
+):
+    """Linhas brutas arquivadas (descomprimidas sob demanda)"""
+    if source not in RetentionManager.SOURCES:
+        raise HTTPException(status_code=404, detail="Tabela sem arquivo")
+    try:
+        df = await asyncio.to_thread(
+            retention_manager.read_archive, source,
+            date.fromisoformat(start) if start else None,
+            date.fromisoformat(end) if end else None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erro ao ler arquivo: {e}")
+        raise HTTPException(status_code=500, detail="Erro ao ler arquivo")
+    df = df.astype(object).where(df.notna(), None)
+    return {
+        "source": source,
+        "rows": len(df),
+        "data": [_sanitize_dict(record) for record in df.to_dict(orient="records")],
+    }
+
+@app.post("/api/jobs", status_code=202)
+async def submit_job(request: JobRequest, user_email: str = Depends(verify_user)):
+    """Enfileira um job pesado (retrain, simulation, export, goals_report)"""
+    if request.kind not in job_queue.handlers:
+        raise HTTPException(
+            status_code=422,
+            detail=f"kind deve ser um de: {', '.join(sorted(job_queue.handlers))}"
+        )
+    try:
+        job_id = await asyncio.to_thread(job_queue.submit, request.kind, request.params, user_email)
+        return {"job_id": job_id, "status": "queued"}
+    except Exception as e:
+        logger.error(f"Erro ao enfileirar job: {e}")
+        raise HTTPException(status_code=500, detail="Erro ao enfileirar job")
+
+@app.get("/api/jobs")
+async def list_jobs(limit: int = 50, user_email: str = Depends(verify_user)):
+    """Jobs do usuário, mais recentes primeiro"""
+    return {"jobs": await asyncio.to_thread(job_queue.list, user_email, max(1, min(limit, 500)))}
+
+@app.get("/api/jobs/{job_id}")
+async def get_job_status(job_id: str, wait: float = 0, user_email: str = Depends(verify_user)):
+    """Status do job; com `wait` (segundos, até 30) aguarda a conclusão (long polling)"""
+    deadline = asyncio.get_running_loop().time() + min(max(wait, 0), 30)
+    while True:
+        job = await asyncio.to_thread(job_queue.get, job_id, user_email)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job não encontrado")
+        if job["status"] in JOB_FINAL_STATUSES or asyncio.get_running_loop().time() >= deadline:
+            return job
+        await asyncio.sleep(0.25)
+
+@app.get("/api/jobs/{job_id}/result")
+async def get_job_result(job_id: str, user_email: str = Depends(verify_user)):
+    """Resultado de um job concluído (disponível até expires_at)"""
+    job = await asyncio.to_thread(job_queue.get, job_id, user_email, True)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado ou expirado")
+    if job["status"] != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job sem resultado (status: {job['status']})")
+    return job
+
+@app.delete("/api/jobs/{job_id}")
+async def cancel_job(job_id: str, user_email: str = Depends(verify_user)):
+    """Cancela um job na fila ou pede o cancelamento de um em execução"""
+    job_status = await asyncio.to_thread(job_queue.cancel, job_id, user_email)
+    if job_status is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return {"job_id": job_id, "status": job_status, "cancel_requested": job_status == "running"}
+
+@app.get("/api/ml-insights")
+async def get_ml_insights(user_email: str = Depends(verify_user)):
+    """Obtém insights avançados de ML"""
+    try:
+        insights = await asyncio.to_thread(analytics_service.get_ml_insights)
         return insights
     except Exception as e:
         logger.error(f"Erro ao gerar insights ML: {e}")
         raise HTTPException(status_code=500, detail="Erro ao gerar insights")
 
+@app.get("/api/ml/drift")
+async def get_ml_drift(user_email: str = Depends(verify_user)):
+    """Scores de drift das features e dos resíduos contra o treino atual"""
+    try:
+        report = await asyncio.to_thread(analytics_service.check_drift)
+        return _sanitize_dict({
+            **report,
+            "last_scheduled_check": retrain_scheduler.last_check,
+            "retrain_pending": await asyncio.to_thread(job_queue.pending, "retrain"),
+        })
+    except Exception as e:
+        logger.error(f"Erro ao calcular drift: {e}")
+        raise HTTPException(status_code=500, detail="Erro ao calcular drift")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -31,6 +31,7 @@ def create_database():
         import sqlite3
         from datetime import date, timedelta
         import numpy as np
+        from synthetic_data import generate_progress_history, progress_rows
 
         # Criar banco
         conn = sqlite3.connect("analytics.db")
@@ -91,32 +92,13 @@ def create_database():
             start_date = date(2025, 8, 10)
             current_date = date.today()
 
-            progress_data = []
-            current_progress = 100  # Valor inicial
-
-            delta = current_date - start_date
-            for i in range(delta.days + 1):
-                day = start_date + timedelta(days=i)
-
-                # Simular progresso variável mas consistente
-                base_daily = 13.8  # Meta diária para 7k
-                variation = np.random.normal(0, 2.5)  # Variação aleatória
-                daily_increment = max(5, base_daily + variation)  # Mínimo 5
-
-                current_progress += daily_increment
-
-                week_num = day.isocalendar()[1]
-                month_num = day.month
-                goals_completed = np.random.poisson(0.3) if day.weekday() == 6 else 0
-
-                progress_data.append((
-                    day.isoformat(),
-                    current_progress,
-                    daily_increment,
-                    week_num,
-                    month_num,
-                    goals_completed
-                ))
+            # Progresso variável mas consistente: meta diária de 13.8 para 7k,
+            # variação ±2.5 e mínimo de 5 por dia (geração vetorizada)
+            progress = generate_progress_history(
+                np.random.default_rng(), start_date, (current_date - start_date).days + 1,
+                initial=100, daily_mean=13.8, daily_std=2.5, min_increment=5, sunday_goals=0.3,
+            )
+            progress_data = list(progress_rows(progress))
 
             cursor.executemany("""
                 INSERT INTO progress_history
@@ -0,0 +1,191 @@
+"""
+Geradores vetorizados de dados sintéticos do Analytics Backend
+Histórico de progresso e metas semanais como colunas NumPy, mais as tuplas
+nos formatos de INSERT. Usados pela API (dados de exemplo), pelo setup.py e
+pela CLI generate_data.py
+"""
+
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+
+CATEGORIES = np.array(["general", "work", "study", "health"], dtype=object)
+CATEGORY_WEIGHTS = [0.25, 0.45, 0.2, 0.1]
+DESCRIPTIONS = np.array([
+    "Completar módulo de analytics",
+    "Implementar dashboard ML",
+    "Otimizar algoritmos de previsão",
+    "Revisar pull requests pendentes",
+    "Estudar séries temporais",
+    "Escrever documentação da API",
+    "Treinar 4x na semana",
+    "Fechar relatório mensal",
+    "Refatorar camada de dados",
+    "Ler 2 artigos técnicos",
+], dtype=object)
+
+EPOCH = date(1970, 1, 1)
+
+def _epoch_day(d: date) -> int:
+    return (d - EPOCH).days
+
+def iso_calendar(days: np.ndarray):
+    """Semana ISO e mês de cada dia (dias desde 1970-01-01), sem laço Python"""
+    days = np.asarray(days, dtype=np.int64)
+    weekday = (days + 3) % 7  # 1970-01-01 foi quinta-feira; segunda = 0
+    thursday = days - weekday + 3
+    iso_year_start = thursday.astype("datetime64[D]").astype("datetime64[Y]").astype("datetime64[D]").astype(np.int64)
+    week = (thursday - iso_year_start) // 7 + 1
+    month = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64) % 12 + 1
+    return week.astype(np.int32), month.astype(np.int32), weekday.astype(np.int32)
+
+def format_dates(days: np.ndarray) -> np.ndarray:
+    """Dias desde 1970-01-01 -> 'YYYY-MM-DD' (formata cada dia distinto uma única vez)"""
+    unique, inverse = np.unique(np.asarray(days, dtype=np.int64), return_inverse=True)
+    return np.datetime_as_string(unique.astype("datetime64[D]"), unit="D").astype(object)[inverse]
+
+def _uuid4_strings(rng: np.random.Generator, n: int) -> np.ndarray:
+    """UUIDs v4 derivados do gerador (reprodutíveis com a mesma seed)"""
+    raw = rng.integers(0, 256, size=(n, 16), dtype=np.uint8)
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+    hex_digits = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+    chars = np.empty((n, 36), dtype=np.uint8)
+    chars[:, [8, 13, 18, 23]] = ord("-")
+    nibbles = np.stack([raw >> 4, raw & 0x0F], axis=2).reshape(n, 32)
+    positions = [i for i in range(36) if i not in (8, 13, 18, 23)]
+    chars[:, positions] = hex_digits[nibbles]
+    return chars.view("S36").ravel().astype(str)
+
+def generate_progress_history(rng: np.random.Generator, start: date, days: int,
+                              initial: float = 50.0, daily_mean: float = 13.8, daily_std: float = 3.0,
+                              min_increment: Optional[float] = None, weekend_factor: float = 1.0,
+                              missing_rate: float = 0.0, anomaly_rate: float = 0.0,
+                              sunday_goals: float = 1.0) -> Dict[str, np.ndarray]:
+    """Série diária de progresso acumulado.
+
+    O incremento é normal(daily_mean, daily_std), multiplicado por
+    `weekend_factor` aos sábados/domingos; incrementos negativos não reduzem o
+    acumulado (como em `_initialize_sample_data`). `min_increment` limita o
+    valor gravado por baixo. Anomalias são picos (3–8x) ou quedas (lançamento
+    zerado/negativo); dias faltantes simplesmente não têm registro.
+    """
+    day = _epoch_day(start) + np.arange(days, dtype=np.int64)
+    week_number, month_number, weekday = iso_calendar(day)
+
+    increment = rng.normal(daily_mean, daily_std, days)
+    increment[weekday >= 5] *= weekend_factor
+
+    anomalous = rng.random(days) < anomaly_rate
+    if anomalous.any():
+        spike = rng.random(anomalous.sum()) < 0.5
+        values = increment[anomalous]
+        values[spike] *= rng.uniform(3.0, 8.0, spike.sum())
+        values[~spike] = -rng.uniform(0.0, 2.0, (~spike).sum()) * daily_mean
+        increment[anomalous] = values
+
+    if min_increment is not None:
+        increment = np.maximum(increment, min_increment)
+
+    goals_completed = np.where(weekday == 6, rng.poisson(sunday_goals, days), 0).astype(np.int32)
+
+    kept = rng.random(days) >= missing_rate
+    increment = increment[kept]
+    return {
+        "day": day[kept],
+        "progress_value": initial + np.cumsum(np.maximum(increment, 0.0)),
+        "daily_increment": increment,
+        "week_number": week_number[kept],
+        "month_number": month_number[kept],
+        "goals_completed": goals_completed[kept],
+    }
+
+def generate_weekly_goals(rng: np.random.Generator, users: List[str], start: date, weeks: int,
+                          today: Optional[date] = None, goals_per_week: float = 2.0,
+                          completion_rate: float = 0.7, target_median: float = 100.0,
+                          weekly_activity: float = 0.85) -> Dict[str, np.ndarray]:
+    """Metas semanais de cada usuário.
+
+    Cada usuário entra numa semana aleatória da primeira metade do período,
+    fica ativo em ~`weekly_activity` das semanas seguintes e cria
+    Poisson(`goals_per_week` x intensidade própria) metas por semana. Metas de
+    semanas já encerradas são concluídas com a taxa de confiabilidade do
+    usuário (Beta com média `completion_rate`), falhadas ou deixadas sem
+    registro; semanas correntes/futuras ficam em aberto.
+    """
+    today = today or date.today()
+    n_users = len(users)
+    first_monday = _epoch_day(start - timedelta(days=start.weekday()))
+    week_start = first_monday + 7 * np.arange(weeks, dtype=np.int64)
+
+    join_week = rng.integers(0, max(1, weeks // 2), n_users)
+    intensity = rng.gamma(4.0, 0.25, n_users)
+    reliability = rng.beta(8.0 * completion_rate, 8.0 * (1.0 - completion_rate), n_users)
+
+    active = (np.arange(weeks)[None, :] >= join_week[:, None]) & (rng.random((n_users, weeks)) < weekly_activity)
+    counts = rng.poisson(goals_per_week * intensity[:, None] * np.ones((1, weeks))) * active
+
+    user_index = np.repeat(np.repeat(np.arange(n_users), weeks), counts.ravel())
+    week_index = np.repeat(np.tile(np.arange(weeks), n_users), counts.ravel())
+    n = len(user_index)
+
+    starts = week_start[week_index]
+    target = np.round(rng.lognormal(np.log(target_median), 0.35, n), 1)
+
+    closed = starts + 6 < _epoch_day(today)
+    outcome = rng.random(n)
+    completed = closed & (outcome < reliability[user_index])
+    failed = closed & ~completed & (outcome < reliability[user_index] + 0.6 * (1 - reliability[user_index]))
+    reported = completed | failed
+
+    actual = np.where(completed, target * np.clip(rng.normal(1.05, 0.1, n), 1.0, None),
+                      target * rng.uniform(0.2, 0.95, n))
+    completed_at = (starts * 86400 + rng.integers(2 * 86400, 7 * 86400, n)).astype("datetime64[s]")
+    created_at = (starts * 86400 - rng.integers(0, 2 * 86400, n)).astype("datetime64[s]")
+
+    return {
+        "id": _uuid4_strings(rng, n),
+        "week_start": starts,
+        "week_end": starts + 6,
+        "description": DESCRIPTIONS[rng.integers(0, len(DESCRIPTIONS), n)],
+        "target_value": target,
+        "actual_value": np.where(reported, np.round(actual, 1), np.nan),
+        "completed": np.where(reported, completed, None),
+        "completed_date": np.where(completed, np.datetime_as_string(completed_at), None),
+        "created_by": np.asarray(users, dtype=object)[user_index],
+        "category": CATEGORIES[rng.choice(len(CATEGORIES), n, p=CATEGORY_WEIGHTS)],
+        "created_at": np.datetime_as_string(created_at).astype(object),
+    }
+
+def progress_rows(progress: Dict[str, np.ndarray]):
+    """Tuplas no formato do INSERT de progress_history"""
+    return zip(
+        format_dates(progress["day"]).tolist(),
+        progress["progress_value"].tolist(),
+        progress["daily_increment"].tolist(),
+        progress["week_number"].tolist(),
+        progress["month_number"].tolist(),
+        progress["goals_completed"].tolist(),
+    )
+
+def goal_rows(goals: Dict[str, np.ndarray]):
+    """Tuplas no formato do INSERT de weekly_goals, em ordem de chave primária"""
+    order = np.argsort(goals["id"])
+    goals = {name: column[order] for name, column in goals.items()}
+    actual = goals["actual_value"].astype(object)
+    actual[np.isnan(goals["actual_value"])] = None
+    return zip(
+        goals["id"].tolist(),
+        format_dates(goals["week_start"]).tolist(),
+        format_dates(goals["week_end"]).tolist(),
+        goals["description"].tolist(),
+        goals["target_value"].tolist(),
+        actual.tolist(),
+        goals["completed"].tolist(),
+        goals["completed_date"].tolist(),
+        goals["created_by"].tolist(),
+        goals["category"].tolist(),
+        goals["created_at"].tolist(),
+        goals["created_at"].tolist(),
+    )
@@ -0,0 +1,61 @@
+"""Fixtures dos testes do backend.
+
+Importar `main` cria analytics.db (e os serviços globais) no diretório atual,
+então os testes rodam a partir de um diretório temporário e cada teste
+recebe bancos próprios em `tmp_path`.
+"""
+
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+from datetime import date, timedelta
+
+import pytest
+
+for name in ("ANALYTICS_DATABASE_URL", "ANALYTICS_GOAL_SHARDS", "ANALYTICS_COLUMN_STORE_DIR"):
+    os.environ.pop(name, None)
+os.environ.setdefault("ANALYTICS_MODEL_SEARCH_BUDGET", "1")
+
+_workdir = tempfile.mkdtemp(prefix="analytics-tests-")
+atexit.register(shutil.rmtree, _workdir, ignore_errors=True)
+os.chdir(_workdir)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+WEEK_START = date(2025, 9, 1)
+
+def make_goal(user_email: str, description: str = "Meta de teste", target_value: float = 10.0) -> main.WeeklyGoal:
+    return main.WeeklyGoal(
+        week_start=WEEK_START,
+        week_end=WEEK_START + timedelta(days=6),
+        description=description,
+        target_value=target_value,
+        created_by=user_email,
+    )
+
+def goal_counts(db: main.DatabaseManager, user_email: str):
+    """Metas do usuário em cada shard (contando as linhas de weekly_goals)"""
+    def count(backend, conn):
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM weekly_goals WHERE created_by = ?", (user_email,))
+        return cursor.fetchone()[0]
+
+    return db.map_goal_shards(count)
+
+@pytest.fixture
+def db(tmp_path):
+    """Banco principal vazio, sem sharding"""
+    return main.DatabaseManager(str(tmp_path / "analytics.db"), goal_shards=0)
+
+@pytest.fixture
+def sharded_db(tmp_path):
+    """Banco principal com as metas em dois shards"""
+    return main.DatabaseManager(str(tmp_path / "analytics.db"), goal_shards=2)
+
+@pytest.fixture
+def service(sharded_db):
+    """Serviço sobre o banco com shards (modelos ainda não treinados)"""
+    return main.AnalyticsService(sharded_db)
@@ -0,0 +1,97 @@
+"""Controle de admissão do analytics: modo completo, degradado e 503"""
+
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+USER = "yasmin@fradema.com.br"
+AUTH = {"Authorization": "Bearer yasmin-token"}
+
+def test_admits_full_until_the_in_flight_limit():
+    admission = main.AdmissionController(max_in_flight=2, max_degraded=1)
+
+    assert admission.acquire() == ("full", None)
+    assert admission.acquire() == ("full", None)
+    mode, reason = admission.acquire()
+    assert mode == "degraded" and "limite 2" in reason
+    assert admission.acquire()[0] == "rejected"
+    assert admission.stats()["full"] == 2 and admission.stats()["rejected"] == 1
+
+    admission.release("degraded", main.time.monotonic())
+    assert admission.acquire()[0] == "degraded"
+    admission.release("full", main.time.monotonic())
+    assert admission.acquire() == ("full", None)
+
+def test_slow_p95_degrades_only_with_work_in_flight():
+    admission = main.AdmissionController(max_in_flight=4, latency_budget=0.5)
+    for _ in range(3):
+        admission.acquire()
+        admission.release("full", main.time.monotonic() - 2.0)
+
+    # Sem nada em andamento o caminho completo volta a ser medido
+    assert admission.acquire() == ("full", None)
+    mode, reason = admission.acquire()
+    assert mode == "degraded" and "p95" in reason
+    assert 1 <= admission.retry_after() <= 30
+
+def test_lookup_reports_cached_and_in_flight_analytics(service):
+    user = "lookup@example.com"
+    assert service.lookup_analytics(user) == (None, False)
+
+    started, finish = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        finish.wait(5)
+        return "resultado"
+
+    leader = threading.Thread(target=service.flights.do, args=(service._analytics_key(user), slow))
+    leader.start()
+    started.wait(5)
+    try:
+        assert service.lookup_analytics(user) == (None, True)
+    finally:
+        finish.set()
+        leader.join(5)
+
+    result = service.get_analytics(user)
+    assert service.lookup_analytics(user) == (result, False)
+
+@pytest.fixture
+def client(service, monkeypatch):
+    monkeypatch.setattr(main, "analytics_service", service)
+    # Sem o context manager o lifespan (workers e aquecimento) não roda
+    return TestClient(main.app)
+
+def test_endpoint_degrades_when_there_is_no_slot(client, monkeypatch):
+    admission = main.AdmissionController(max_in_flight=0, max_degraded=1)
+    monkeypatch.setattr(main, "admission", admission)
+
+    response = client.get("/api/analytics", headers=AUTH)
+
+    assert response.status_code == 200
+    assert response.headers["X-Analytics-Degraded"] == "1"
+    assert admission.stats()["degraded"] == 1 and admission.degraded_in_flight == 0
+
+def test_endpoint_rejects_with_retry_after(client, monkeypatch):
+    admission = main.AdmissionController(max_in_flight=0, max_degraded=0)
+    monkeypatch.setattr(main, "admission", admission)
+
+    response = client.get("/api/analytics", headers=AUTH)
+
+    assert response.status_code == 503
+    assert 1 <= int(response.headers["Retry-After"]) <= 30
+    assert admission.stats()["rejected"] == 1
+
+def test_endpoint_serves_cached_analytics_without_admission(client, service, monkeypatch):
+    admission = main.AdmissionController(max_in_flight=0, max_degraded=0)
+    monkeypatch.setattr(main, "admission", admission)
+    service.get_analytics(USER)
+
+    response = client.get("/api/analytics", headers=AUTH)
+
+    assert response.status_code == 200 and "X-Analytics-Degraded" not in response.headers
+    assert admission.stats()["rejected"] == 0
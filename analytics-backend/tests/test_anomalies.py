@@ -0,0 +1,62 @@
+"""Detector de anomalias em streaming e as anomalias pendentes do serviço"""
+
+import numpy as np
+import pytest
+
+import main
+
+def feed(detector, increments, start_day: int = 20000):
+    progress = np.concatenate([[0.0], np.cumsum(increments)])
+    return [
+        anomaly for day, value in enumerate(progress.tolist(), start_day)
+        if (anomaly := detector.update(day, value)) is not None
+    ]
+
+def test_spike_after_warmup_is_flagged_by_both_methods():
+    increments = np.tile([13.0, 14.0], 30)
+    increments[40] = 80.0
+    detector = main.StreamingAnomalyDetector()
+
+    anomalies = feed(detector, increments)
+
+    assert len(anomalies) == 1
+    assert anomalies[0]["day"] == str(np.datetime64(20000 + 41, "D"))
+    assert anomalies[0]["value"] == pytest.approx(80.0)
+    assert anomalies[0]["method"] == "both"
+    stats = detector.stats()
+    assert stats["observations"] == 60 and stats["anomalies_detected"] == 1
+    assert stats["last_anomaly"] == anomalies[0]
+
+def test_nothing_is_flagged_during_warmup():
+    increments = np.full(20, 10.0)
+    increments[5] = 500.0
+    assert feed(main.StreamingAnomalyDetector(warmup=14), increments) == []
+
+def test_api_reads_keep_anomalies_pending_until_flush(service):
+    def stored():
+        conn = service.db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT day FROM progress_anomalies")
+        days = [str(row[0])[:10] for row in cursor.fetchall()]
+        conn.close()
+        return days
+
+    arrays = service.get_progress_arrays()
+    day = str(np.datetime64(int(arrays["day"][-1]) + 1, "D"))
+    conn = service.db.get_connection()
+    conn.cursor().execute("""
+        INSERT INTO progress_history (date, progress_value, daily_increment, week_number, month_number)
+        VALUES (?, ?, ?, ?, ?)
+    """, (day, float(arrays["progress_value"][-1]) + 500.0, 500.0, 1, 1))
+    conn.commit()
+    conn.close()
+
+    listed = service.list_anomalies(limit=500)
+    assert listed[0]["day"] == day and listed[0]["detected_at"] is None
+    assert day not in stored()
+
+    flushed = service.flush_anomalies()
+    assert flushed >= 1 and day in stored()
+    # Depois de gravada aparece uma única vez
+    assert [a["day"][:10] for a in service.list_anomalies(limit=500)].count(day) == 1
+    assert service.flush_anomalies() == 0
@@ -0,0 +1,109 @@
+"""ProgressColumnStore: anexação incremental e reconstrução do cache colunar"""
+
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+import main
+
+START = date(2025, 8, 10)
+
+def insert_progress(db, days, start_value: float = 100.0):
+    """Grava uma linha por dia em `days` (offsets a partir de START)"""
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    rows = []
+    for offset in days:
+        day = START + timedelta(days=offset)
+        rows.append((day.isoformat(), start_value + 10 * offset, 10.0, day.isocalendar()[1], day.month, 0))
+    cursor.executemany("""
+        INSERT INTO progress_history
+        (date, progress_value, daily_increment, week_number, month_number, goals_completed)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, rows)
+    conn.commit()
+    conn.close()
+
+def execute(db, query: str, params: tuple = ()):
+    conn = db.get_connection()
+    conn.cursor().execute(query, params)
+    conn.commit()
+    conn.close()
+
+def day_offsets(arrays):
+    return (arrays["day"] - np.datetime64(START, "D").astype(np.int64)).tolist()
+
+@pytest.fixture
+def store(db, tmp_path):
+    return main.ProgressColumnStore(db, str(tmp_path / "columns"))
+
+def test_inserts_are_appended_without_rebuild(db, store):
+    insert_progress(db, range(3))
+    meta, arrays = store.snapshot()
+    assert meta["rows"] == 3 and meta["epoch"] == 1
+    generation = meta["generation"]
+
+    insert_progress(db, range(3, 5))
+    meta, arrays = store.snapshot()
+
+    assert meta["rows"] == 5
+    assert (meta["epoch"], meta["generation"]) == (1, generation)
+    assert day_offsets(arrays) == [0, 1, 2, 3, 4]
+    assert arrays["progress_value"].tolist() == [100.0, 110.0, 120.0, 130.0, 140.0]
+    # Sem mudanças no banco, sync devolve os mesmos metadados
+    assert store.sync() == meta
+
+def test_growing_past_capacity_keeps_rows(db, store, monkeypatch):
+    monkeypatch.setattr(store, "MIN_CAPACITY", 4)
+    insert_progress(db, range(2))
+    meta = store.sync()
+    assert meta["capacity"] == 4
+
+    insert_progress(db, range(2, 7))
+    meta, arrays = store.snapshot()
+
+    assert meta["rows"] == 7 and meta["capacity"] >= 7
+    assert meta["epoch"] == 1 and meta["generation"] == 2
+    assert day_offsets(arrays) == list(range(7))
+
+def test_update_and_delete_force_rebuild(db, store):
+    insert_progress(db, range(4))
+    assert store.sync()["epoch"] == 1
+
+    execute(db, "UPDATE progress_history SET progress_value = 999 WHERE date = ?", (START.isoformat(),))
+    meta, arrays = store.snapshot()
+    assert meta["epoch"] == 2
+    assert arrays["progress_value"][0] == 999
+
+    execute(db, "DELETE FROM progress_history WHERE date = ?", (START.isoformat(),))
+    meta, arrays = store.snapshot()
+    assert meta["epoch"] == 3 and meta["rows"] == 3
+    assert day_offsets(arrays) == [1, 2, 3]
+
+def test_out_of_order_insert_rebuilds_sorted(db, store):
+    insert_progress(db, [5, 6])
+    store.sync()
+
+    insert_progress(db, [2])
+    meta, arrays = store.snapshot()
+
+    assert meta["epoch"] == 2
+    assert day_offsets(arrays) == [2, 5, 6]
+
+def test_recreated_database_rebuilds(tmp_path):
+    path = str(tmp_path / "analytics.db")
+    columns = str(tmp_path / "columns")
+    db = main.DatabaseManager(path, goal_shards=0)
+    insert_progress(db, range(3))
+    main.ProgressColumnStore(db, columns).sync()
+
+    # Banco novo no mesmo caminho: contadores recomeçam e podem coincidir com os antigos
+    for suffix in ("", "-wal", "-shm"):
+        (tmp_path / f"analytics.db{suffix}").unlink(missing_ok=True)
+    db = main.DatabaseManager(path, goal_shards=0)
+    insert_progress(db, range(3), start_value=500.0)
+
+    meta, arrays = main.ProgressColumnStore(db, columns).snapshot()
+    assert meta["epoch"] == 2
+    assert arrays["progress_value"].tolist() == [500.0, 510.0, 520.0]
@@ -0,0 +1,83 @@
+"""Inferência compilada: mesmas previsões do sklearn, bit a bit nas árvores"""
+
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import LinearRegression, Ridge
+from sklearn.preprocessing import StandardScaler
+
+import main
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(11)
+    X = rng.normal(size=(300, 7))
+    y = X @ rng.normal(size=7) + np.sin(X[:, 0] * 3) + rng.normal(scale=0.1, size=300)
+    return X[:200], y[:200], X[200:]
+
+@pytest.mark.parametrize("model", [
+    RandomForestRegressor(n_estimators=25, max_depth=6, random_state=0),
+    RandomForestRegressor(n_estimators=10, random_state=1),
+    GradientBoostingRegressor(n_estimators=40, max_depth=3, random_state=0),
+    GradientBoostingRegressor(n_estimators=15, init="zero", random_state=0),
+], ids=["rf-depth6", "rf-full", "gbr", "gbr-zero-init"])
+def test_tree_ensembles_are_bit_identical(model, data):
+    X_train, y_train, X_test = data
+    model.fit(X_train, y_train)
+    compiled = main.compile_model(model)
+
+    for X in (X_train, X_test, X_test[:1]):
+        assert np.array_equal(compiled.predict(X), model.predict(X))
+
+def test_split_thresholds_route_like_sklearn(data):
+    X_train, y_train, _ = data
+    model = RandomForestRegressor(n_estimators=5, random_state=0).fit(X_train, y_train)
+    compiled = main.compile_model(model)
+    # Amostras exatamente sobre os limiares dos splits
+    tree = model.estimators_[0].tree_
+    split = tree.feature >= 0
+    X = np.tile(X_train[:1], (split.sum(), 1))
+    X[np.arange(split.sum()), tree.feature[split]] = tree.threshold[split]
+
+    assert np.array_equal(compiled.predict(X), model.predict(X))
+
+@pytest.mark.parametrize("model", [LinearRegression(), Ridge(alpha=0.5)], ids=["linear", "ridge"])
+def test_linear_models_match(model, data):
+    X_train, y_train, X_test = data
+    model.fit(X_train, y_train)
+    np.testing.assert_allclose(main.compile_model(model).predict(X_test), model.predict(X_test), rtol=1e-12)
+
+def test_compiled_scaler_matches(data):
+    X_train, _, X_test = data
+    scaler = StandardScaler().fit(X_train)
+    assert np.array_equal(main.CompiledScaler(scaler).transform(X_test), scaler.transform(X_test))
+
+def test_unsupported_model_is_rejected():
+    with pytest.raises(TypeError):
+        main.CompiledTreeEnsemble.from_sklearn(object())
+
+@pytest.mark.parametrize("model", [
+    RandomForestRegressor(n_estimators=15, max_depth=5, random_state=0),
+    GradientBoostingRegressor(n_estimators=30, max_depth=3, random_state=0),
+    GradientBoostingRegressor(n_estimators=10, init="zero", random_state=0),
+    Ridge(alpha=0.5),
+], ids=["rf", "gbr", "gbr-zero-init", "ridge"])
+def test_contributions_sum_to_the_prediction(model, data):
+    X_train, y_train, X_test = data
+    compiled = main.compile_model(model.fit(X_train, y_train))
+
+    base, contrib = compiled.contributions(X_test)
+    assert contrib.shape == X_test.shape
+    np.testing.assert_allclose(base + contrib.sum(axis=1), model.predict(X_test), rtol=1e-9, atol=1e-9)
+
+def test_engine_explanation_matches_best_model_prediction(service):
+    engine = main.MLAnalyticsEngine()
+    assert engine.train_models(service.get_progress_dataframe())
+    features = service.ml_engine.prepare_features(service.get_progress_dataframe())[engine.feature_columns]
+    row = features.to_numpy(dtype=np.float64)[-1:]
+
+    explanation = engine.explain(row)
+    assert explanation["model"] == engine.best_model
+    assert list(explanation["values"]) == engine.feature_columns
+    total = explanation["base_value"] + sum(explanation["values"].values())
+    assert total == pytest.approx(engine.predict_batch(row)[engine.best_model][0], rel=1e-9, abs=1e-9)
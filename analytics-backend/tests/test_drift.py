@@ -0,0 +1,65 @@
+"""DriftMonitor: janela circular, estatísticas e o retreino condicionado ao drift"""
+
+from datetime import timedelta
+
+import numpy as np
+import pytest
+
+import main
+
+def test_window_keeps_the_latest_rows_in_order():
+    monitor = main.DriftMonitor(window=5)
+    X = np.arange(16, dtype=np.float64).reshape(8, 2)
+    monitor.observe(X[:3], np.arange(3))
+    monitor.observe(X[3:], np.arange(3, 8))
+
+    recent_X, recent_y = monitor.recent()
+    assert monitor.count == 5
+    np.testing.assert_array_equal(recent_X, X[3:])
+    np.testing.assert_array_equal(recent_y, np.arange(3, 8))
+
+def test_statistics():
+    proportions = np.array([0.25, 0.25, 0.5])
+    assert main.DriftMonitor.psi(proportions, proportions) == 0.0
+    assert main.DriftMonitor.psi(proportions, np.array([0.5, 0.25, 0.25])) > 0.25
+    assert main.DriftMonitor.ks(proportions, np.array([0.5, 0.25, 0.25])) == pytest.approx(0.25)
+
+    noise = np.random.default_rng(0).normal(size=400)
+    assert main.DriftMonitor.effective_size(noise) == pytest.approx(400, rel=0.15)
+    # Série acumulada: fortemente autocorrelacionada
+    assert main.DriftMonitor.effective_size(np.cumsum(noise)) < 10
+
+def test_untrained_or_warming_up_never_asks_for_retrain():
+    engine = main.MLAnalyticsEngine()
+    monitor = main.DriftMonitor(min_observations=10)
+    assert monitor.evaluate(engine)["status"] == "no_reference"
+
+    engine.is_trained, engine.drift_reference = True, object()
+    monitor.observe(np.zeros((5, 7)), np.zeros(5))
+    report = monitor.evaluate(engine)
+    assert report["status"] == "warming_up" and not report["should_retrain"]
+
+def test_retrain_only_after_the_data_drifts(service):
+    service.retrain_models()
+    assert service.check_drift()["status"] == "stable"
+    result = service.retrain_if_drifted()
+    assert not result["retrained"] and service.ml_engine.model_version == 1
+
+    # Um mês com o progresso deslocado em +3000: os resíduos do modelo explodem
+    arrays = service.get_progress_arrays()
+    last_day = np.datetime64(int(arrays["day"][-1]), "D").astype(object)
+    progress = float(arrays["progress_value"][-1]) + 3000
+    conn = service.db.get_connection()
+    conn.cursor().executemany("""
+        INSERT INTO progress_history (date, progress_value, daily_increment, week_number, month_number)
+        VALUES (?, ?, ?, ?, ?)
+    """, [((last_day + timedelta(days=i)).isoformat(), progress + 14 * i, 14.0,
+           (last_day + timedelta(days=i)).isocalendar()[1], (last_day + timedelta(days=i)).month)
+          for i in range(1, 31)])
+    conn.commit()
+    conn.close()
+
+    report = service.check_drift()
+    assert report["should_retrain"] and "residuals:mae" in report["reasons"]
+    result = service.retrain_if_drifted()
+    assert result["retrained"] and service.ml_engine.model_version == 2
@@ -0,0 +1,109 @@
+"""Log de eventos: replay, tail com checkpoints, compactação e rebuild de goal_stats"""
+
+import pytest
+
+import main
+from conftest import make_goal
+
+def goal_partition(service, user_email: str) -> int:
+    return service.db.goal_shard(user_email) + 1
+
+def goal_stats_rows(backend):
+    conn = backend.connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT created_by, goals_set FROM goal_stats_user ORDER BY created_by")
+        return cursor.fetchall()
+    finally:
+        conn.close()
+
+def test_materialize_replays_goal_writes(service):
+    user = "replay@example.com"
+    ids = service.create_weekly_goals([make_goal(user, target_value=v) for v in (5.0, 7.0, 9.0)], user)
+    service.complete_weekly_goal(main.GoalCompletion(goal_id=ids[0], completed=True, actual_value=6.0), user)
+    log = main.EventLog(service.db)
+    partition = goal_partition(service, user)
+
+    goals, last = log.materialize(partition, "goals")
+
+    assert sorted(goals) == sorted(ids)
+    assert sorted(goal["target_value"] for goal in goals.values()) == [5.0, 7.0, 9.0]
+    assert goals[ids[0]]["completed"] and goals[ids[0]]["actual_value"] == 6.0
+    assert last == log.heads()[partition]
+
+def test_tail_advances_checkpoints_and_delivers_once(service):
+    user = "tail@example.com"
+    service.create_weekly_goals([make_goal(user), make_goal(user)], user)
+    log = main.EventLog(service.db, batch_size=1)
+    partition = goal_partition(service, user)
+    delivered = []
+
+    processed = log.tail("test", delivered.extend, streams=["goals"])
+
+    assert processed[partition] == 2
+    assert [event["kind"] for event in delivered] == ["insert", "insert"]
+    assert log.get_checkpoint("test", partition) == log.heads()[partition]
+    assert log.tail("test", delivered.extend, streams=["goals"]) == {0: 0, 1: 0, 2: 0}
+    assert len(delivered) == 2
+
+def test_compact_keeps_the_replayed_state(service):
+    user = "compact@example.com"
+    ids = service.create_weekly_goals([make_goal(user) for _ in range(3)], user)
+    log = main.EventLog(service.db)
+    partition = goal_partition(service, user)
+    # Sem consumidores nada é compactado
+    assert log.compact(partition)["events"] == 0
+
+    log.tail("test", lambda events: None)
+    service.complete_weekly_goal(main.GoalCompletion(goal_id=ids[0], completed=True, actual_value=4.0), user)
+    before, head = log.materialize(partition, "goals")
+
+    result = log.compact(partition)
+
+    # A conclusão veio depois do checkpoint e continua no log
+    assert result["events"] == 3 and result["compacted_through"] < head
+    assert log.compacted_through()[partition] == result["compacted_through"]
+    assert log.read(partition) == log.read(partition, after=result["compacted_through"])
+    assert len(log.read(partition)) == 1
+    assert log.materialize(partition, "goals") == (before, head)
+
+def test_rebuild_goal_stats_matches_triggers(service):
+    users = ["a@example.com", "b@example.com"]
+    for user in users:
+        service.create_weekly_goals([make_goal(user), make_goal(user)], user)
+    log = main.EventLog(service.db)
+    expected = [goal_stats_rows(backend) for backend in log.partitions]
+
+    results = log.rebuild_goal_stats()
+
+    assert all(result["consistent"] for result in results)
+    assert sum(result["goals"] for result in results) == 4
+    assert [goal_stats_rows(backend) for backend in log.partitions] == expected
+
+def test_rebuild_goal_stats_keeps_aggregates_when_replay_diverges(service):
+    user = "diverge@example.com"
+    service.create_weekly_goals([make_goal(user), make_goal(user)], user)
+    log = main.EventLog(service.db)
+    partition = goal_partition(service, user)
+    backend = log.partitions[partition]
+    conn = backend.connect()
+    conn.cursor().execute("DELETE FROM event_log WHERE seq = (SELECT MIN(seq) FROM event_log)")
+    conn.commit()
+    conn.close()
+
+    result = log.rebuild_goal_stats()[partition]
+
+    assert not result["consistent"] and result["goals"] == 1
+    assert goal_stats_rows(backend) == [(user, 2)]
+
+def test_event_origin_is_cleared_after_an_error(db):
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    with pytest.raises(RuntimeError):
+        with main.event_origin(cursor, "move"):
+            raise RuntimeError("falha")
+    # Mesmo com commit depois da exceção, a origem não vaza para outras escritas
+    conn.commit()
+    cursor.execute("SELECT value FROM event_log_context WHERE name = 'origin'")
+    assert cursor.fetchone()[0] is None
+    conn.close()
@@ -0,0 +1,126 @@
+"""Roteamento de metas entre shards: move_user, rebalance e a trava de rota"""
+
+import threading
+import time
+
+import pytest
+
+import main
+from conftest import goal_counts, make_goal
+
+def create_goals(service, user_email: str, count: int):
+    results = service.create_weekly_goals([make_goal(user_email) for _ in range(count)], user_email)
+    assert all(isinstance(result, str) for result in results)
+    return results
+
+def test_move_user_copies_goals_and_updates_map(service, sharded_db):
+    user = "move@example.com"
+    goal_ids = create_goals(service, user, 3)
+    source = sharded_db.goal_shard(user)
+    target = 1 - source
+
+    result = sharded_db.move_user(user, target)
+
+    assert result == {"user": user, "from": source, "to": target, "goals_moved": 3}
+    assert sharded_db.goal_shard(user) == target
+    counts = goal_counts(sharded_db, user)
+    assert counts[source] == 0 and counts[target] == 3
+    assert sorted(goal["id"] for goal in service.get_weekly_goals(user)) == sorted(goal_ids)
+    # Os triggers de cada lado mantêm os agregados
+    assert service.get_goal_stats(user)["goals_set"] == 3
+
+    # O mapa persistido vale para uma nova instância
+    reopened = main.DatabaseManager(sharded_db.db_path, goal_shards=2)
+    assert reopened.goal_shard(user) == target
+
+def test_move_user_to_current_shard_moves_nothing(service, sharded_db):
+    user = "stay@example.com"
+    create_goals(service, user, 2)
+    shard = sharded_db.goal_shard(user)
+
+    assert sharded_db.move_user(user, shard)["goals_moved"] == 0
+    assert goal_counts(sharded_db, user)[shard] == 2
+
+def test_move_user_rejects_invalid_shard(sharded_db, db):
+    with pytest.raises(ValueError):
+        sharded_db.move_user("someone@example.com", 2)
+    with pytest.raises(ValueError):
+        db.move_user("someone@example.com", 0)
+
+def test_rebalance_evens_goals_across_shards(service, sharded_db):
+    users = [f"user{i}@example.com" for i in range(6)]
+    for user in users:
+        # Fixa todos no shard 0 antes da primeira meta
+        sharded_db._set_shard(user, 0)
+        create_goals(service, user, 2)
+    assert [shard["goals"] for shard in sharded_db.shard_stats()] == [12, 0]
+
+    result = sharded_db.rebalance(tolerance=0.1)
+
+    assert [shard["goals"] for shard in result["shards"]] == [6, 6]
+    assert len(result["moves"]) == 3
+    for move in result["moves"]:
+        assert (move["from"], move["to"], move["goals_moved"]) == (0, 1, 2)
+        assert goal_counts(sharded_db, move["user"]) == [0, 2]
+        assert service.get_goal_stats(move["user"])["goals_set"] == 2
+
+def test_rebalance_moves_users_off_removed_shards(tmp_path):
+    path = str(tmp_path / "analytics.db")
+    three = main.DatabaseManager(path, goal_shards=3)
+    user = "orphan@example.com"
+    three._set_shard(user, 2)
+    create_goals(main.AnalyticsService(three), user, 2)
+
+    # Com um shard a menos, o start realoca o usuário do arquivo antigo
+    two = main.DatabaseManager(path, goal_shards=2)
+    shard = two.goal_shard(user)
+    assert shard < 2
+    assert goal_counts(two, user)[shard] == 2
+
+def test_exclusive_route_lock_waits_for_shared_holders():
+    lock = main._RouteLock()
+    events = []
+
+    def exclusive():
+        with lock.exclusive():
+            events.append("exclusive")
+
+    def shared():
+        with lock.shared():
+            events.append("shared")
+
+    with lock.shared():
+        writer = threading.Thread(target=exclusive)
+        writer.start()
+        time.sleep(0.1)
+        # A exclusiva pendente barra novas leituras (não há inanição do movimento)
+        reader = threading.Thread(target=shared)
+        reader.start()
+        time.sleep(0.1)
+        assert events == []
+
+    writer.join(2)
+    reader.join(2)
+    assert events == ["exclusive", "shared"]
+
+def test_goal_writes_wait_for_move_and_follow_new_shard(service, sharded_db):
+    user = "routed@example.com"
+    create_goals(service, user, 1)
+    target = 1 - sharded_db.goal_shard(user)
+    results = []
+
+    with sharded_db.route_lock.exclusive():
+        writer = threading.Thread(
+            target=lambda: results.extend(service.create_weekly_goals([make_goal(user)], user))
+        )
+        writer.start()
+        time.sleep(0.1)
+        assert results == []
+        sharded_db._move_user_goals(
+            sharded_db.goal_backends[1 - target], sharded_db.goal_backends[target], user, target
+        )
+
+    writer.join(5)
+    assert len(results) == 1 and isinstance(results[0], str)
+    assert goal_counts(sharded_db, user)[target] == 2
+    assert goal_counts(sharded_db, user)[1 - target] == 0
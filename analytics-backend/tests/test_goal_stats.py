@@ -0,0 +1,60 @@
+"""goal_stats_weekly/goal_stats_user mantidos por triggers na escrita"""
+
+from datetime import timedelta
+
+import main
+from conftest import WEEK_START, make_goal
+
+USER = "stats@example.com"
+
+def read_stats(db, user_email: str = USER):
+    conn = db.get_goal_connection(user_email)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT week_start, goals_set, goals_completed, target_sum, actual_sum
+        FROM goal_stats_weekly WHERE created_by = ? ORDER BY week_start
+    """, (user_email,))
+    weekly = cursor.fetchall()
+    cursor.execute("""
+        SELECT goals_set, goals_completed, target_sum, actual_sum
+        FROM goal_stats_user WHERE created_by = ?
+    """, (user_email,))
+    user = cursor.fetchone()
+    conn.close()
+    return weekly, user
+
+def test_aggregates_follow_creates_completions_and_deletes(service, sharded_db):
+    later = make_goal(USER, target_value=30.0).model_copy(update={
+        "week_start": WEEK_START + timedelta(days=7), "week_end": WEEK_START + timedelta(days=13),
+    })
+    first, second, third = service.create_weekly_goals([make_goal(USER), make_goal(USER, target_value=20.0), later], USER)
+
+    weekly, user = read_stats(sharded_db)
+    assert [row[1:] for row in weekly] == [(2, 0, 30.0, 0.0), (1, 0, 30.0, 0.0)]
+    assert user == (3, 0, 60.0, 0.0)
+
+    service.complete_weekly_goal(main.GoalCompletion(goal_id=first, completed=True, actual_value=8.0), USER)
+    # Reabrir a meta desfaz a contagem de concluídas
+    service.complete_weekly_goal(main.GoalCompletion(goal_id=third, completed=True, actual_value=31.0), USER)
+    service.complete_weekly_goal(main.GoalCompletion(goal_id=third, completed=False, actual_value=None), USER)
+    assert read_stats(sharded_db)[1] == (3, 1, 60.0, 8.0)
+
+    conn = sharded_db.get_goal_connection(USER)
+    conn.cursor().execute("DELETE FROM weekly_goals WHERE id = ?", (second,))
+    conn.commit()
+    conn.close()
+    weekly, user = read_stats(sharded_db)
+    assert [row[1:] for row in weekly] == [(1, 1, 10.0, 8.0), (1, 0, 30.0, 0.0)]
+    assert user == (2, 1, 40.0, 8.0)
+
+def test_rebuild_matches_trigger_maintained_aggregates(service, sharded_db):
+    goal_id = service.create_weekly_goals([make_goal(USER), make_goal(USER)], USER)[0]
+    service.complete_weekly_goal(main.GoalCompletion(goal_id=goal_id, completed=True, actual_value=4.0), USER)
+    before = read_stats(sharded_db)
+
+    conn = sharded_db.get_goal_connection(USER)
+    sharded_db._rebuild_goal_stats(conn.cursor())
+    conn.commit()
+    conn.close()
+
+    assert read_stats(sharded_db) == before
@@ -0,0 +1,98 @@
+"""GoalWriteBatcher: agrupamento das escritas e drenagem no desligamento"""
+
+import asyncio
+import sqlite3
+
+import pytest
+
+import main
+from conftest import make_goal
+
+USER = "batcher@example.com"
+
+@pytest.fixture
+def batches(service, monkeypatch):
+    """Tamanho de cada lote que chegou a apply_goal_writes"""
+    sizes = []
+    apply = service.apply_goal_writes
+
+    def record(writes):
+        sizes.append(len(writes))
+        return apply(writes)
+
+    monkeypatch.setattr(service, "apply_goal_writes", record)
+    return sizes
+
+def test_concurrent_submits_share_one_commit(service, batches):
+    async def run():
+        batcher = main.GoalWriteBatcher(service, max_delay=0.05)
+        await batcher.start()
+        try:
+            return await asyncio.gather(*(batcher.submit("create", make_goal(USER), USER) for _ in range(5)))
+        finally:
+            await batcher.stop()
+
+    goal_ids = asyncio.run(run())
+    assert len(set(goal_ids)) == 5
+    assert batches == [5]
+    assert len(service.get_weekly_goals(USER)) == 5
+
+def test_failed_item_raises_only_for_its_request(service, batches):
+    invalid = make_goal(USER).model_copy(update={"description": None})
+
+    async def run():
+        batcher = main.GoalWriteBatcher(service, max_delay=0.05)
+        await batcher.start()
+        try:
+            return await asyncio.gather(
+                batcher.submit("create", make_goal(USER), USER),
+                batcher.submit("create", invalid, USER),
+                return_exceptions=True,
+            )
+        finally:
+            await batcher.stop()
+
+    ok, error = asyncio.run(run())
+    assert isinstance(ok, str) and isinstance(error, sqlite3.IntegrityError)
+    assert batches == [2]
+
+def test_stop_drains_queued_writes(service, batches):
+    async def run():
+        # Janela longa: só o desligamento fecha o lote
+        batcher = main.GoalWriteBatcher(service, max_delay=30.0)
+        await batcher.start()
+        pending = [asyncio.create_task(batcher.submit("create", make_goal(USER), USER)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        assert not any(task.done() for task in pending)
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await batcher.stop()
+        assert loop.time() - started < 5
+        assert all(task.done() for task in pending)
+
+        # Depois do stop as escritas vão direto ao banco
+        direct = await batcher.submit("create", make_goal(USER), USER)
+        return [task.result() for task in pending] + [direct]
+
+    goal_ids = asyncio.run(run())
+    assert len(set(goal_ids)) == 4
+    assert batches == [3, 1]
+    assert len(service.get_weekly_goals(USER)) == 4
+
+def test_cancelled_worker_still_answers_its_batch(service, batches):
+    async def run():
+        batcher = main.GoalWriteBatcher(service, max_delay=30.0)
+        await batcher.start()
+        pending = [asyncio.create_task(batcher.submit("create", make_goal(USER), USER)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        batcher._task.cancel()
+        results = await asyncio.wait_for(asyncio.gather(*pending), 5)
+        with pytest.raises(asyncio.CancelledError):
+            await batcher._task
+        return results
+
+    goal_ids = asyncio.run(run())
+    assert all(isinstance(goal_id, str) for goal_id in goal_ids)
+    assert batches == [2]
+    assert len(service.get_weekly_goals(USER)) == 2
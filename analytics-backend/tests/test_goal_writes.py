@@ -0,0 +1,63 @@
+"""apply_goal_writes: um SAVEPOINT por item e resultados na posição de cada escrita"""
+
+import sqlite3
+
+import pytest
+
+import main
+from conftest import goal_counts, make_goal
+
+def test_failed_items_roll_back_alone(service, sharded_db):
+    user = "savepoint@example.com"
+    invalid = make_goal(user).model_copy(update={"description": None})
+    missing = main.GoalCompletion(goal_id="nao-existe", completed=True, actual_value=5.0)
+
+    results = service.apply_goal_writes([
+        ("create", make_goal(user, "primeira"), user),
+        ("create", invalid, user),
+        ("archive", make_goal(user), user),
+        ("complete", missing, user),
+        ("create", make_goal(user, "segunda"), user),
+    ])
+
+    assert isinstance(results[0], str) and isinstance(results[4], str)
+    assert isinstance(results[1], sqlite3.IntegrityError)
+    assert isinstance(results[2], ValueError)
+    assert results[3] is False
+
+    goals = service.get_weekly_goals(user)
+    assert sorted(goal["description"] for goal in goals) == ["primeira", "segunda"]
+    # O item desfeito não deixou rastro nos agregados mantidos por trigger
+    assert service.get_goal_stats(user)["goals_set"] == 2
+
+def test_complete_updates_only_own_goals(service):
+    owner, other = "owner@example.com", "other@example.com"
+    goal_id = service.create_weekly_goal(make_goal(owner), owner)
+    completion = main.GoalCompletion(goal_id=goal_id, completed=True, actual_value=12.0)
+
+    assert service.apply_goal_writes([("complete", completion, other), ("complete", completion, owner)]) == [False, True]
+    stats = service.get_goal_stats(owner)
+    assert stats["goals_completed"] == 1 and stats["actual_sum"] == 12.0
+
+def test_batch_spanning_shards_returns_results_in_order(service, sharded_db):
+    users = ["left@example.com", "right@example.com"]
+    sharded_db._set_shard(users[0], 0)
+    sharded_db._set_shard(users[1], 1)
+    invalid = make_goal(users[1]).model_copy(update={"description": None})
+
+    results = service.apply_goal_writes([
+        ("create", make_goal(users[1]), users[1]),
+        ("create", make_goal(users[0]), users[0]),
+        ("create", invalid, users[1]),
+        ("create", make_goal(users[0]), users[0]),
+    ])
+
+    assert [type(result) for result in results] == [str, str, sqlite3.IntegrityError, str]
+    assert goal_counts(sharded_db, users[0]) == [2, 0]
+    assert goal_counts(sharded_db, users[1]) == [0, 1]
+
+def test_single_write_helpers_raise_item_errors(service):
+    user = "single@example.com"
+    with pytest.raises(sqlite3.IntegrityError):
+        service.create_weekly_goal(make_goal(user).model_copy(update={"description": None}), user)
+    assert service.get_weekly_goals(user) == []
@@ -0,0 +1,117 @@
+"""JobQueue: reivindicação, cancelamento e recuperação de leases vencidos"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import main
+
+USER = "jobs@example.com"
+
+@pytest.fixture
+def queue(db):
+    queue = main.JobQueue(db, workers=1)
+    queue.register("echo", lambda ctx: {"value": ctx.params["value"]})
+    return queue
+
+def status(queue, job_id, user_email=USER):
+    return queue.get(job_id, user_email)["status"]
+
+def test_run_one_claims_oldest_job_and_stores_result(queue):
+    first = queue.submit("echo", {"value": 1}, USER)
+    second = queue.submit("echo", {"value": 2}, USER)
+
+    assert queue.run_one()
+    assert status(queue, first) == "succeeded" and status(queue, second) == "queued"
+    assert queue.get(first, USER, include_result=True)["result"] == {"value": 1}
+    assert queue.run_one()
+    assert not queue.run_one()
+
+def test_submit_rejects_unknown_kind(queue):
+    with pytest.raises(ValueError):
+        queue.submit("nope", {}, USER)
+
+def test_handler_error_marks_job_failed(queue):
+    def fail(ctx):
+        raise RuntimeError("boom")
+
+    queue.register("fail", fail)
+    job_id = queue.submit("fail", {}, USER)
+    assert queue.run_one()
+    job = queue.get(job_id, USER)
+    assert job["status"] == "failed" and job["error"] == "boom"
+
+def test_claim_is_exclusive_between_instances(queue, db):
+    other = main.JobQueue(db)
+    job_id = queue.submit("echo", {"value": 1}, USER)
+
+    assert queue._claim()[0] == job_id
+    assert other._claim() is None
+
+def test_cancel_queued_job_is_never_run(queue):
+    job_id = queue.submit("echo", {"value": 1}, USER)
+
+    assert queue.cancel(job_id, "intruso@example.com") is None
+    assert queue.cancel(job_id, USER) == "cancelled"
+    assert not queue.run_one()
+    assert status(queue, job_id) == "cancelled"
+
+def test_cancel_running_job_is_cooperative(queue):
+    def cancel_itself(ctx):
+        assert queue.cancel(ctx.job_id, ctx.user_email) == "running"
+        ctx.check_cancelled(force=True)
+        return "nunca"
+
+    queue.register("slow", cancel_itself)
+    job_id = queue.submit("slow", {}, USER)
+    assert queue.run_one()
+    assert status(queue, job_id) == "cancelled"
+
+def test_late_cancel_counts_until_commit(queue):
+    def late(ctx):
+        # Pedido depois da última verificação do handler
+        queue.cancel(ctx.job_id, ctx.user_email)
+        return "ok"
+
+    def committed(ctx):
+        ctx.commit()
+        queue.cancel(ctx.job_id, ctx.user_email)
+        return "ok"
+
+    queue.register("late", late)
+    queue.register("committed", committed)
+    late_id = queue.submit("late", {}, USER)
+    committed_id = queue.submit("committed", {}, USER)
+    assert queue.run_one() and queue.run_one()
+
+    assert status(queue, late_id) == "cancelled"
+    assert status(queue, committed_id) == "succeeded"
+
+def test_recover_requeues_only_expired_leases(queue, db):
+    crashed = main.JobQueue(db, lease=60.0)
+    job_id = queue.submit("echo", {"value": 7}, USER)
+    assert crashed._claim()[0] == job_id
+
+    # Lease ainda válido: o job continua com a outra instância
+    assert queue.recover() == 0
+    assert status(queue, job_id) == "running"
+
+    stale = (datetime.now() - timedelta(seconds=120)).isoformat(sep=" ")
+    queue._execute("UPDATE analytics_jobs SET heartbeat_at = ? WHERE id = ?", (stale, job_id))
+    assert queue.recover() == 1
+    assert status(queue, job_id) == "queued"
+
+    assert queue.run_one()
+    assert queue.get(job_id, USER, include_result=True)["result"] == {"value": 7}
+    # A instância antiga não sobrescreve o desfecho de quem assumiu o job
+    assert not crashed._finish(job_id, "failed", error="tarde demais")
+    assert status(queue, job_id) == "succeeded"
+
+def test_recover_ignores_own_running_jobs(queue):
+    job_id = queue.submit("echo", {"value": 1}, USER)
+    queue._claim()
+    stale = (datetime.now() - timedelta(hours=1)).isoformat(sep=" ")
+    queue._execute("UPDATE analytics_jobs SET heartbeat_at = ? WHERE id = ?", (stale, job_id))
+
+    assert queue.recover() == 0
+    assert queue.heartbeat() == 1
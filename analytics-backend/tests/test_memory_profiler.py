@@ -0,0 +1,57 @@
+"""MemoryProfiler: medição por componente e diffs de tracemalloc"""
+
+import threading
+import tracemalloc
+
+import numpy as np
+import pytest
+
+import main
+
+def test_components_are_measured_with_their_locks(monkeypatch):
+    lock = threading.Lock()
+    measured = {}
+    sizeof = main.deep_sizeof
+
+    def recording_sizeof(obj):
+        measured[type(obj).__name__] = lock.locked()
+        return sizeof(obj)
+
+    monkeypatch.setattr(main, "deep_sizeof", recording_sizeof)
+    shared = {"a": np.zeros(1000), "b": np.zeros(10)}
+    window = main.StreamingAnomalyDetector()
+    profiler = main.MemoryProfiler()
+    profiler.register("shared", lambda: shared, lock)
+    profiler.register("window", lambda: window, lock, in_place=True)
+    profiler.register("broken", lambda: 1 / 0)
+
+    components = profiler.report()["components"]
+    assert components["shared"]["heap_bytes"] >= 8000 + 80
+    assert components["window"]["heap_bytes"] > 0
+    assert "error" in components["broken"]
+    # A cópia rasa é medida fora do lock; a janela, no lugar e com o lock seguro
+    assert measured == {"dict": False, "StreamingAnomalyDetector": True}
+    assert not lock.locked()
+
+def test_snapshot_diff_finds_new_allocations():
+    profiler = main.MemoryProfiler(max_snapshots=2)
+    with pytest.raises(ValueError):
+        profiler.take_snapshot()
+
+    profiler.start_tracing(5)
+    try:
+        base = profiler.take_snapshot("base")["id"]
+        kept = [bytearray(4096) for _ in range(200)]
+        diff = profiler.diff(base, limit=5)
+        assert diff["base"] == base and diff["traced_bytes_diff"] >= 4096 * 200
+        assert any(__file__ in frame for item in diff["top"] for frame in item["location"])
+        # O limite descarta os snapshots mais antigos
+        profiler.take_snapshot()
+        profiler.take_snapshot()
+        assert base not in [entry["id"] for entry in profiler.list_snapshots()]
+        with pytest.raises(KeyError):
+            profiler.diff(base)
+        del kept
+    finally:
+        profiler.stop_tracing()
+    assert not tracemalloc.is_tracing()
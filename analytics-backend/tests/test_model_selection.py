@@ -0,0 +1,56 @@
+"""ModelSelector (successive halving com orçamento) e o treino inicial em segundo plano"""
+
+import math
+
+import numpy as np
+import pytest
+
+import main
+
+FAMILIES = {"baseline", "linear", "random_forest", "gradient_boost"}
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(5)
+    X = rng.normal(size=(160, 7))
+    return X, X[:, 0] * 3 + X[:, 1] ** 2 + rng.normal(scale=0.2, size=160)
+
+def test_zero_budget_still_returns_one_model_per_family(data):
+    result = main.ModelSelector(budget_seconds=0).select(*data)
+
+    assert set(result["best_per_family"]) == FAMILIES
+    assert result["report"]["evaluations"] == len(FAMILIES)
+    assert result["report"]["budget_exhausted"]
+    # Devolve estimadores novos, não os treinados na busca
+    for _, estimator in result["best_per_family"].values():
+        assert not hasattr(estimator, "n_features_in_")
+
+def test_halving_keeps_the_best_fraction_each_rung(data):
+    selector = main.ModelSelector(budget_seconds=600, eta=3, min_resource=20)
+    result = selector.select(*data)
+    rungs = result["report"]["rungs"]
+
+    assert not result["report"]["budget_exhausted"]
+    assert rungs[0]["evaluated"] == len(selector.candidates())
+    for previous, current in zip(rungs, rungs[1:]):
+        assert current["evaluated"] == math.ceil(previous["evaluated"] / 3)
+        assert current["samples"] > previous["samples"]
+    assert set(result["best_per_family"]) == FAMILIES
+
+def test_service_construction_does_not_train(service):
+    assert not service.ml_engine.is_trained
+    assert service.ml_engine.model_version == 0
+
+def test_scheduler_queues_the_initial_training(service, sharded_db):
+    queue = main.JobQueue(sharded_db)
+    main.register_analytics_jobs(queue, service, main.RetentionManager(sharded_db))
+    scheduler = main.RetrainScheduler(service, queue)
+
+    assert "job_id" in scheduler.tick()
+    # Já há retreino na fila: não enfileira outro
+    assert "job_id" not in scheduler.tick()
+    assert queue.run_one()
+
+    assert service.ml_engine.is_trained and service.ml_engine.model_version == 1
+    assert service.ml_engine.models
+    assert "job_id" not in scheduler.tick()
@@ -0,0 +1,84 @@
+"""SingleFlight, ResultCache e as chaves dos caches de analytics"""
+
+import threading
+import time
+from datetime import date
+
+import pytest
+
+import main
+from conftest import make_goal
+
+def test_single_flight_shares_one_execution():
+    flights = main.SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(2)
+        return object()
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flights.do("k", compute)))
+    leader.start()
+    started.wait(2)
+    followers = [threading.Thread(target=lambda: results.append(flights.do("k", compute))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    while flights.stats()["shared"] < 3:
+        time.sleep(0.01)
+    assert flights.in_flight("k")
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(2)
+
+    assert len(calls) == 1 and len(results) == 4
+    assert all(result is results[0] for result in results)
+    assert not flights.in_flight("k")
+    # Nada fica guardado: a próxima chamada calcula de novo
+    flights.do("k", compute)
+    assert len(calls) == 2
+
+def test_single_flight_propagates_errors_and_clears_the_key():
+    flights = main.SingleFlight()
+    with pytest.raises(ZeroDivisionError):
+        flights.do("k", lambda: 1 / 0)
+    assert not flights.in_flight("k")
+    assert flights.do("k", lambda: 5) == 5
+
+def test_result_cache_lru_and_prune():
+    cache = main.ResultCache(max_entries=2)
+    cache.put("a", 1, date(2025, 1, 1))
+    cache.put("b", 2, date(2025, 1, 2))
+    assert cache.get("a") == 1  # "a" passa a ser a mais recente
+    cache.put("c", 3, date(2025, 1, 2))
+
+    assert not cache.contains("b") and cache.contains("a")
+    assert cache.get("b") is main.ResultCache._MISSING
+    assert cache.get("c", count=False) == 3
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+    assert cache.prune(date(2025, 1, 2)) == 1
+    assert not cache.contains("a") and cache.contains("c")
+
+def test_analytics_key_follows_goal_writes_from_other_processes(service, sharded_db):
+    user = "cached@example.com"
+    service.create_weekly_goals([make_goal(user)], user)
+    first = service.get_analytics(user)
+    assert service.get_analytics(user) is first
+
+    # Outro processo (outra instância sobre os mesmos arquivos) grava uma meta
+    other = main.AnalyticsService(main.DatabaseManager(sharded_db.db_path, goal_shards=2))
+    other.create_weekly_goals([make_goal(user, target_value=20.0)], user)
+
+    second = service.get_analytics(user)
+    assert second is not first
+    assert service.get_analytics(user) is second
+    # Escritas no shard de outro usuário também mudam a versão só desse shard
+    shard = sharded_db.goal_shard(user)
+    before = sharded_db.goal_version(user)
+    neighbour = next(f"n{i}@example.com" for i in range(100)
+                     if sharded_db.goal_shard(f"n{i}@example.com") != shard)
+    service.create_weekly_goals([make_goal(neighbour)], neighbour)
+    assert sharded_db.goal_version(user) == before
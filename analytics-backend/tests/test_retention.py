@@ -0,0 +1,92 @@
+"""Arquivamento do histórico: rollups, cache colunar e a parte arquivada da semana"""
+
+from datetime import date
+
+import numpy as np
+import pytest
+
+import main
+
+TODAY = date(2026, 10, 19)
+
+def rollups(service, granularity: str = "week"):
+    return {r["period_start"]: r for r in service.get_rollups(granularity, limit=10000)}
+
+def archived_state(db):
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT granularity, period_start, days FROM progress_rollup_archived ORDER BY granularity")
+    parts = cursor.fetchall()
+    cursor.execute("SELECT last_run FROM retention_state WHERE name = 'progress_rollup_archived'")
+    marked = cursor.fetchone()
+    conn.close()
+    return parts, marked
+
+@pytest.fixture
+def archived(service, sharded_db):
+    """Serviço com o histórico anterior a 2025-10-01 arquivado (365 dias antes de TODAY)"""
+    before = {name: np.array(values) for name, values in service.get_progress_arrays().items()}
+    weeks, months = rollups(service), rollups(service, "month")
+    retention = main.RetentionManager(sharded_db)
+    result = retention.compact("progress_history", today=TODAY)
+    assert result["cutoff"] == "2025-10-01" and result["archived_rows"] > 0
+    return retention, before, weeks, months
+
+def test_default_retention_keeps_a_year_hot(sharded_db):
+    retention = main.RetentionManager(sharded_db)
+    assert retention.retention_days["progress_history"] == 365
+    assert retention.cutoff("progress_history", TODAY) == date(2025, 10, 1)
+
+def test_archiving_keeps_the_analysed_history(service, archived):
+    _, before, weeks, months = archived
+
+    after = service.get_progress_arrays()
+    for name, values in before.items():
+        np.testing.assert_array_equal(after[name], values, err_msg=name)
+    assert len(service.get_progress_dataframe()) == len(before["day"])
+    # A semana que atravessa a marca d'água é recalculada (a soma muda de ordem)
+    for granularity, expected in (("week", weeks), ("month", months)):
+        actual = rollups(service, granularity)
+        assert sorted(actual) == sorted(expected)
+        for period, row in expected.items():
+            assert actual[period] == pytest.approx(row), period
+
+def test_straddling_week_follows_hot_updates(service, archived):
+    # A semana de 2025-09-29 tem dois dias arquivados e cinco quentes
+    assert archived_state(service.db)[0] == [("week", "2025-09-29", 2)]
+    week = rollups(service)["2025-09-29"]
+
+    conn = service.db.get_connection()
+    cursor = conn.cursor()
+    cursor.execute("UPDATE progress_history SET daily_increment = daily_increment + 100 WHERE date = '2025-10-02'")
+    cursor.execute("DELETE FROM progress_history WHERE date = '2025-10-03'")
+    conn.commit()
+    conn.close()
+
+    updated = rollups(service)["2025-09-29"]
+    assert updated["days"] == week["days"] - 1
+    frame = service.get_progress_dataframe()
+    days = frame[(frame["date"] >= "2025-09-29") & (frame["date"] < "2025-10-06")]
+    assert len(days) == updated["days"]
+    assert updated["increment_sum"] == pytest.approx(days["daily_increment"].sum())
+
+def test_archived_rollups_are_rewritten_only_when_needed(service, sharded_db, archived):
+    retention = archived[0]
+    state = archived_state(sharded_db)
+
+    # Mesma marca d'água e nada novo para arquivar: nada é regravado
+    main.RetentionManager(sharded_db)
+    assert retention.compact("progress_history", today=TODAY)["archived_rows"] == 0
+    assert archived_state(sharded_db) == state
+
+    # Linha retroativa na parte arquivada da semana: entra na próxima compactação
+    conn = sharded_db.get_connection()
+    conn.cursor().execute("""
+        INSERT INTO progress_history (date, progress_value, daily_increment, week_number, month_number)
+        VALUES ('2025-09-30', 1.0, 1.0, 40, 9)
+    """)
+    conn.commit()
+    conn.close()
+    assert retention.compact("progress_history", today=TODAY)["archived_rows"] == 1
+    assert archived_state(sharded_db)[0] == [("week", "2025-09-29", 3)]
+    assert rollups(service)["2025-09-29"]["days"] == 8
@@ -0,0 +1,88 @@
+"""RollingProgressSeries e análises sobre as colunas: mesmos valores do caminho pandas"""
+
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import main
+
+FEATURES = ["days_elapsed", "week_number", "month_number", "goals_completed_week",
+            "avg_daily_progress", "momentum_score", "consistency_score"]
+
+def progress_arrays(days: int, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    dates = [main.PROJECT_START_DATE + timedelta(days=i) for i in range(days)]
+    return {
+        "day": np.array([(d - date(1970, 1, 1)).days for d in dates], dtype=np.int32),
+        "progress_value": 50 + np.cumsum(rng.normal(13.8, 3.0, days)),
+        "daily_increment": rng.normal(13.8, 3.0, days),
+        "week_number": np.array([d.isocalendar()[1] for d in dates], dtype=np.int32),
+        "month_number": np.array([d.month for d in dates], dtype=np.int32),
+        "goals_completed": rng.integers(0, 3, days).astype(np.int32),
+    }
+
+def as_frame(arrays):
+    return pd.DataFrame({
+        "date": arrays["day"].astype("datetime64[D]").astype("datetime64[ns]"),
+        **{name: arrays[name] for name in arrays if name != "day"},
+    })
+
+def test_features_match_prepare_features_for_every_prefix():
+    arrays = progress_arrays(60)
+    engine = main.MLAnalyticsEngine()
+    series = main.RollingProgressSeries()
+
+    for rows in range(1, 61):
+        series.extend(arrays, rows - 1, rows)
+        expected = engine.prepare_features(as_frame({k: v[:rows] for k, v in arrays.items()})).iloc[-1]
+        actual = series.features()
+        for name in FEATURES:
+            assert actual[name] == pytest.approx(float(expected[name]), rel=1e-9, abs=1e-9), (rows, name)
+
+def test_extend_in_chunks_equals_one_pass():
+    arrays = progress_arrays(100)
+    whole, chunks = main.RollingProgressSeries(), main.RollingProgressSeries()
+    whole.extend(arrays)
+    for start in range(0, 100, 13):
+        chunks.extend(arrays, start, start + 13)
+
+    assert chunks.count == whole.count == 100
+    np.testing.assert_allclose(chunks.feature_vector(FEATURES), whole.feature_vector(FEATURES))
+
+def test_ring_window_drops_values_leaving_the_window():
+    window = main._RingWindow(3)
+    for value in [1.0, 2.0, 3.0, 10.0]:
+        window.push(value)
+
+    assert window.full
+    assert window.mean() == pytest.approx(5.0)
+    assert window.std() == pytest.approx(np.std([2.0, 3.0, 10.0], ddof=1))
+
+def test_trends_and_weekly_performance_from_columns(service):
+    arrays = progress_arrays(40)
+    arrays["daily_increment"][-3] = np.nan
+    frame = as_frame(arrays)
+
+    trends = service._analyze_trends(arrays)
+    assert trends["recent_7_days_avg"] == pytest.approx(frame["daily_increment"].tail(7).mean())
+    assert trends["recent_14_days_avg"] == pytest.approx(frame["daily_increment"].tail(14).mean())
+    assert trends["overall_average"] == pytest.approx(frame["daily_increment"].mean())
+    assert service._analyze_trends({name: values[:13] for name, values in arrays.items()}) == {
+        "status": "insufficient_data"
+    }
+
+    weekly_avg = frame.tail(28).groupby("week_number")["daily_increment"].mean()
+    weekly = service._analyze_weekly_performance(arrays, "nobody@example.com")
+    assert weekly["avg_weekly_progress"] == pytest.approx(weekly_avg.mean())
+    assert weekly["best_week"] == pytest.approx(weekly_avg.max())
+    assert weekly["worst_week"] == pytest.approx(weekly_avg.min())
+    assert weekly["consistency"] == pytest.approx(weekly_avg.std())
+    assert weekly["goals_set"] == 0
+
+def test_service_features_follow_the_stored_history(service):
+    features = service.get_progress_features()
+    expected = service.ml_engine.prepare_features(service.get_progress_dataframe()).iloc[-1]
+    for name in FEATURES:
+        assert features[name] == pytest.approx(float(expected[name]), rel=1e-9, abs=1e-9), name
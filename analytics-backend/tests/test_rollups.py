@@ -0,0 +1,106 @@
+"""Rollups mantidos por trigger e a redução de séries (LTTB e min/max)"""
+
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import main
+
+def history(service) -> pd.DataFrame:
+    conn = service.db.get_connection()
+    frame = pd.read_sql_query(
+        "SELECT id, date, progress_value, daily_increment, goals_completed FROM progress_history", conn
+    )
+    conn.close()
+    frame["date"] = pd.to_datetime(frame["date"])
+    return frame.sort_values(["date", "id"])
+
+def expected_rollups(frame: pd.DataFrame, granularity: str) -> pd.DataFrame:
+    if granularity == "week":
+        period = frame["date"] - pd.to_timedelta(frame["date"].dt.weekday, unit="D")
+    else:
+        period = frame["date"].dt.to_period("M").dt.start_time
+    return frame.groupby(period.dt.strftime("%Y-%m-%d")).agg(
+        increment_sum=("daily_increment", "sum"),
+        increment_count=("daily_increment", "count"),
+        increment_min=("daily_increment", "min"),
+        increment_max=("daily_increment", "max"),
+        last_progress=("progress_value", "last"),
+        goals_completed=("goals_completed", "sum"),
+        days=("date", "size"),
+    )
+
+def assert_rollups_match(service, granularity: str):
+    expected = expected_rollups(history(service), granularity)
+    rollups = {r["period_start"]: r for r in service.get_rollups(granularity, limit=10000)}
+
+    assert sorted(rollups) == list(expected.index)
+    for period, row in expected.iterrows():
+        actual = rollups[period]
+        for column in ("increment_sum", "increment_min", "increment_max", "last_progress"):
+            assert actual[column] == pytest.approx(row[column]), (period, column)
+        for column in ("increment_count", "goals_completed", "days"):
+            assert actual[column] == row[column], (period, column)
+
+@pytest.mark.parametrize("granularity", main.ROLLUP_GRANULARITIES)
+def test_rollups_follow_inserts_updates_and_deletes(service, granularity):
+    assert_rollups_match(service, granularity)
+
+    conn = service.db.get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM progress_history ORDER BY date LIMIT 3")
+    first, second, third = (row[0] for row in cursor.fetchall())
+    cursor.execute("UPDATE progress_history SET daily_increment = 99.5, goals_completed = 4 WHERE id = ?", (first,))
+    # Move um dia para outro período: os dois rollups são recalculados
+    cursor.execute("UPDATE progress_history SET date = '2024-01-15' WHERE id = ?", (second,))
+    cursor.execute("DELETE FROM progress_history WHERE id = ?", (third,))
+    conn.commit()
+    conn.close()
+
+    assert_rollups_match(service, granularity)
+
+def test_rollups_endpoint_order_and_limit(service):
+    rollups = service.get_rollups("week", limit=5)
+    starts = [r["period_start"] for r in rollups]
+    assert len(rollups) == 5 and starts == sorted(starts)
+    assert starts[-1] == service.get_rollups("week", limit=10000)[-1]["period_start"]
+    with pytest.raises(ValueError):
+        service.get_rollups("day")
+
+def test_lttb_keeps_the_ends_and_the_peak():
+    x = np.arange(1000)
+    y = np.sin(x / 50.0)
+    y[537] = 40.0
+
+    index = main.downsample_lttb(x, y, 50)
+
+    assert len(index) == 50
+    assert index[0] == 0 and index[-1] == 999
+    assert np.all(np.diff(index) > 0)
+    assert 537 in index
+    assert np.array_equal(main.downsample_lttb(x[:30], y[:30], 50), np.arange(30))
+
+def test_minmax_keeps_each_bucket_extremes():
+    y = np.random.default_rng(2).normal(size=1000)
+    y[123], y[876] = -50.0, 50.0
+
+    index = main.downsample_minmax(y, 40)
+
+    assert len(index) <= 40 and np.all(np.diff(index) > 0)
+    assert {123, 876} <= set(index.tolist())
+    for bucket in np.array_split(np.arange(1000), 20):
+        assert y[bucket].argmin() + bucket[0] in index
+        assert y[bucket].argmax() + bucket[0] in index
+
+def test_downsampled_series_respects_range(service):
+    arrays = service.get_progress_arrays()
+    days = arrays["day"].astype("datetime64[D]")
+    start, end = date.fromisoformat(str(days[10])), date.fromisoformat(str(days[200]))
+
+    result = service.get_downsampled_series(20, "daily_increment", "minmax", start, end)
+
+    assert result["source_points"] == 191
+    assert result["points"] <= 20
+    assert str(start) <= result["dates"][0] and result["dates"][-1] <= str(end)
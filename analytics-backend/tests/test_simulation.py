@@ -0,0 +1,72 @@
+"""MonteCarloSimulator e o cache de simulate_success"""
+
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+import main
+
+def test_constant_increments_give_a_deterministic_forecast():
+    simulator = main.MonteCarloSimulator(n_paths=1000, chunk_size=300)
+    progress = 100 + 10.0 * np.arange(60)
+
+    result = simulator.simulate(progress, days_remaining=30, target=progress[-1] + 300)
+    assert result["expected_final"] == pytest.approx(progress[-1] + 300)
+    assert result["success_probability"] == 100.0
+    assert result["n_paths"] == 1000
+
+    assert simulator.simulate(progress, days_remaining=30, target=progress[-1] + 301)["success_probability"] == 0.0
+
+def test_same_seed_same_result_and_trajectory_shape():
+    rng = np.random.default_rng(3)
+    progress = np.cumsum(rng.normal(13.8, 3.0, 200))
+    simulator = main.MonteCarloSimulator(n_paths=4000, chunk_size=1500, max_points=20, trajectory_paths=1000)
+
+    first = simulator.simulate(progress, days_remaining=90, seed=5)
+    assert simulator.simulate(progress, days_remaining=90, seed=5) == first
+    assert 0.0 <= first["success_probability"] <= 100.0
+    assert first["trajectory"]["days_ahead"][-1] == 90
+    assert len(first["trajectory"]["days_ahead"]) <= 20
+    percentiles = [first["final_percentiles"][str(p)] for p in main.MonteCarloSimulator.PERCENTILES]
+    assert percentiles == sorted(percentiles)
+
+def test_past_deadline_reports_current_state():
+    simulator = main.MonteCarloSimulator()
+    result = simulator.simulate(np.array([6900.0, 7000.0]), days_remaining=0)
+    assert result["success_probability"] == 100.0 and result["n_paths"] == 0
+    assert simulator.simulate(np.array([10.0, 20.0]), days_remaining=-3)["success_probability"] == 0.0
+
+def test_custom_path_counts_do_not_evict_the_request_path_cache(service):
+    service.simulator = main.MonteCarloSimulator(n_paths=500)
+    # Antes do prazo, para a simulação de fato sortear trajetórias
+    today = date(2025, 10, 1)
+    tomorrow = today + timedelta(days=1)
+
+    current = service.simulate_success(today=today)
+    warmed = service.simulate_success(today=tomorrow)
+    custom = service.simulate_success(n_paths=800, today=today)
+
+    assert custom["n_paths"] == 800 and current["n_paths"] == 500
+    assert len(service._simulation_cache) == 2
+    assert service.simulate_success(today=today, cached_only=True) is current
+    assert service.simulate_success(today=tomorrow, cached_only=True) is warmed
+    # Contagem própria nunca é servida do cache
+    assert service.simulate_success(n_paths=800, today=today, cached_only=True) is None
+    assert service.simulate_success(n_paths=500, today=today) is current
+
+def test_cache_follows_progress_writes(service):
+    service.simulator = main.MonteCarloSimulator(n_paths=500)
+    today = date(2025, 10, 1)
+    before = service.simulate_success(today=today)
+
+    conn = service.db.get_connection()
+    conn.cursor().execute("""
+        INSERT INTO progress_history (date, progress_value, daily_increment, week_number, month_number)
+        VALUES (?, ?, ?, ?, ?)
+    """, (date.today().isoformat(), 1e6, 10.0, 1, 1))
+    conn.commit()
+    conn.close()
+
+    after = service.simulate_success(today=today)
+    assert after is not before and after["expected_final"] > before["expected_final"]
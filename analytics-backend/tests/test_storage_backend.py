@@ -0,0 +1,179 @@
+"""Contrato dos StorageBackend: os mesmos cenários no SQLite e no PostgreSQL.
+
+O PostgreSQL vem de ANALYTICS_TEST_DATABASE_URL ou de um servidor embutido
+(pgserver); sem psycopg, ou sem nenhum dos dois, esses casos são pulados.
+"""
+
+import logging
+import os
+from datetime import date
+
+import pytest
+
+import main
+
+@pytest.fixture(scope="session")
+def postgres_url(tmp_path_factory):
+    pytest.importorskip("psycopg")
+    pytest.importorskip("psycopg_pool")
+    url = os.getenv("ANALYTICS_TEST_DATABASE_URL")
+    if url:
+        yield url
+        return
+    pgserver = pytest.importorskip("pgserver")
+    # O pgserver também loga no atexit, depois que o pytest fechou a captura
+    logging.getLogger("pgserver").setLevel(logging.WARNING)
+    server = pgserver.get_server(str(tmp_path_factory.mktemp("pgdata")), cleanup_mode="stop")
+    yield server.get_uri()
+    server.cleanup()
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+def manager(request, tmp_path):
+    if request.param == "sqlite":
+        yield main.DatabaseManager(str(tmp_path / "analytics.db"), goal_shards=0)
+        return
+
+    import psycopg
+    url = request.getfixturevalue("postgres_url")
+    with psycopg.connect(url, autocommit=True) as conn:
+        conn.execute("DROP SCHEMA public CASCADE")
+        conn.execute("CREATE SCHEMA public")
+    backend = main.PostgresBackend(url, max_size=4)
+    try:
+        yield main.DatabaseManager(str(tmp_path / "analytics.db"), backend=backend)
+    finally:
+        backend.close()
+
+def fetch(db, query: str, params: tuple = ()):
+    conn = db.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        return cursor.fetchall()
+    finally:
+        conn.close()
+
+def execute(db, query: str, params: tuple = ()):
+    conn = db.get_connection()
+    try:
+        conn.cursor().execute(query, params)
+        conn.commit()
+    finally:
+        conn.close()
+
+def insert_progress(db, rows):
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    cursor.executemany("""
+        INSERT INTO progress_history
+        (date, progress_value, daily_increment, week_number, month_number, goals_completed)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, [(day.isoformat(), value, increment, day.isocalendar()[1], day.month, 0)
+          for day, value, increment in rows])
+    conn.commit()
+    conn.close()
+
+def test_translate_only_rewrites_placeholders_outside_literals():
+    translate = main._PostgresCursor._translate
+    query = "SELECT '?', \"a?\" FROM t -- ?\nWHERE a = ? AND b LIKE 'x%' /* ? */ AND c = ?"
+    assert translate(query, (1, 2)) == (
+        "SELECT '?', \"a?\" FROM t -- ?\nWHERE a = %s AND b LIKE 'x%%' /* ? */ AND c = %s"
+    )
+    assert translate("SELECT 'it''s ?' WHERE x = ?", (1,)) == "SELECT 'it''s ?' WHERE x = %s"
+    body = "CREATE FUNCTION f() RETURNS trigger AS $body$ BEGIN RAISE NOTICE '?'; END $body$ LANGUAGE plpgsql"
+    assert translate(body, (1,)) == body
+
+def test_query_without_params_is_sent_verbatim():
+    query = "SELECT '50%' AS pct WHERE 1 = 1"
+    assert main._PostgresCursor._translate(query) == query
+    assert main._PostgresCursor._translate(query, ()) == query
+
+def test_schema_is_created_and_detected(manager):
+    conn = manager.get_connection()
+    cursor = conn.cursor()
+    for table in ("weekly_goals", "progress_history", "data_versions", "event_log", "progress_rollup_week"):
+        assert manager.backend.table_exists(cursor, table)
+    assert not manager.backend.table_exists(cursor, "nao_existe")
+    conn.close()
+
+def test_literals_with_placeholders_and_percent_round_trip(manager):
+    execute(manager, """
+        INSERT INTO weekly_goals (id, week_start, week_end, description, target_value, created_by)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, ("g1", "2025-09-01", "2025-09-07", "50% feito?", 10.0, "pg@example.com"))
+
+    rows = fetch(manager, """
+        SELECT id, '?' AS literal FROM weekly_goals
+        WHERE description LIKE '50%feito?' AND created_by = ?
+    """, ("pg@example.com",))
+    assert rows == [("g1", "?")]
+    assert fetch(manager, "SELECT COUNT(*) FROM weekly_goals WHERE description LIKE '%?'")[0][0] == 1
+
+    conn = manager.get_connection()
+    df = manager.read_dataframe(conn, "SELECT id FROM weekly_goals WHERE created_by = ?", ("pg@example.com",))
+    conn.close()
+    assert df["id"].tolist() == ["g1"]
+
+def test_goal_triggers_maintain_stats_and_event_log(manager):
+    execute(manager, """
+        INSERT INTO weekly_goals (id, week_start, week_end, description, target_value, created_by)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, ("g1", "2025-09-01", "2025-09-07", "meta", 10.0, "pg@example.com"))
+    execute(manager, "UPDATE weekly_goals SET completed = ?, actual_value = ? WHERE id = ?", (True, 7.0, "g1"))
+
+    assert fetch(manager, "SELECT goals_set, goals_completed, target_sum, actual_sum FROM goal_stats_user") == [
+        (1, 1, 10.0, 7.0)
+    ]
+    events = fetch(manager, "SELECT stream, kind, entity_id, user_email FROM event_log ORDER BY seq")
+    assert events == [("goals", "insert", "g1", "pg@example.com"), ("goals", "update", "g1", "pg@example.com")]
+
+def test_goal_writes_bump_the_goal_version(manager):
+    _, instance, start = manager.goal_version("pg@example.com")
+    execute(manager, """
+        INSERT INTO weekly_goals (id, week_start, week_end, description, target_value, created_by)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, ("g1", "2025-09-01", "2025-09-07", "meta", 10.0, "pg@example.com"))
+    execute(manager, "UPDATE weekly_goals SET description = ? WHERE id = ?", ("outra", "g1"))
+    execute(manager, "DELETE FROM weekly_goals WHERE id = ?", ("g1",))
+
+    assert manager.goal_version("pg@example.com") == (0, instance, start + 3)
+    # Escritas de metas não movem as versões acompanhadas pelo cache colunar
+    conn = manager.get_connection()
+    versions = manager.get_data_versions(conn.cursor(), main.PROGRESS_VERSION_NAMES)
+    conn.close()
+    assert main.GOAL_VERSION_NAME not in versions
+
+def test_progress_writes_bump_versions_and_rollups(manager):
+    conn = manager.get_connection()
+    before = manager.get_data_versions(conn.cursor())
+    conn.close()
+
+    # Quarta, quinta e a segunda seguinte: duas semanas ISO, um mês
+    insert_progress(manager, [
+        (date(2025, 9, 3), 100.0, 10.0), (date(2025, 9, 4), 112.0, 12.0), (date(2025, 9, 8), 120.0, 8.0),
+    ])
+    execute(manager, "UPDATE progress_history SET daily_increment = ? WHERE date = ?", (11.0, "2025-09-04"))
+
+    conn = manager.get_connection()
+    after = manager.get_data_versions(conn.cursor())
+    conn.close()
+    assert after["progress_history"] - before["progress_history"] == 4
+    assert after["progress_history_rewrites"] - before["progress_history_rewrites"] == 1
+    assert after[main.DB_INSTANCE_NAME] == before[main.DB_INSTANCE_NAME]
+
+    weeks = fetch(manager, """
+        SELECT period_start, increment_sum, increment_count, last_progress FROM progress_rollup_week
+        ORDER BY period_start
+    """)
+    assert [(str(row[0])[:10], row[1], row[2], row[3]) for row in weeks] == [
+        ("2025-09-01", 21.0, 2, 112.0), ("2025-09-08", 8.0, 1, 120.0),
+    ]
+    months = fetch(manager, "SELECT period_start, increment_sum, days FROM progress_rollup_month")
+    assert [(str(row[0])[:10], row[1], row[2]) for row in months] == [("2025-09-01", 29.0, 3)]
+
+def test_period_bounds_agree(manager):
+    insert_progress(manager, [(date(2025, 12, 31), 100.0, 1.0)])
+    for granularity, expected in [("week", ("2025-12-29", "2026-01-05")), ("month", ("2025-12-01", "2026-01-01"))]:
+        start, end = manager.backend.period_bounds("date", granularity)
+        row = fetch(manager, f"SELECT {start}, {end} FROM progress_history")[0]
+        assert (str(row[0])[:10], str(row[1])[:10]) == expected
@@ -0,0 +1,55 @@
+"""Geradores de synthetic_data e a carga em massa do generate_data.py"""
+
+import sqlite3
+from datetime import date, timedelta
+
+import numpy as np
+
+import generate_data
+import synthetic_data
+
+def test_iso_calendar_matches_date_isocalendar():
+    start = date(2023, 12, 25)
+    days = np.arange(800) + (start - synthetic_data.EPOCH).days
+    week, month, weekday = synthetic_data.iso_calendar(days)
+    for offset in range(0, 800, 3):
+        d = start + timedelta(days=offset)
+        assert (week[offset], month[offset], weekday[offset]) == (d.isocalendar()[1], d.month, d.weekday()), d
+
+def test_progress_history_is_cumulative_and_skips_missing_days():
+    rng = np.random.default_rng(0)
+    progress = synthetic_data.generate_progress_history(
+        rng, date(2025, 1, 1), 365, initial=50.0, missing_rate=0.1, anomaly_rate=0.05
+    )
+
+    assert 250 < len(progress["day"]) < 365
+    assert np.all(np.diff(progress["day"]) > 0)
+    assert np.all(np.diff(progress["progress_value"]) >= 0)
+    assert progress["progress_value"][0] == 50.0 + max(progress["daily_increment"][0], 0.0)
+    rows = list(synthetic_data.progress_rows(progress))
+    assert rows[0][0] == str(np.datetime64(int(progress["day"][0]), "D"))
+    assert len(rows[0]) == 6
+
+def test_weekly_goals_leave_open_weeks_unreported():
+    rng = np.random.default_rng(1)
+    today = date(2025, 6, 1)
+    goals = synthetic_data.generate_weekly_goals(rng, ["a@x", "b@x"], date(2025, 1, 6), 30, today=today)
+
+    open_weeks = goals["week_start"] + 6 >= (today - synthetic_data.EPOCH).days
+    assert open_weeks.any() and not open_weeks.all()
+    assert all(value is None for value in goals["completed"][open_weeks])
+    assert len(set(goals["id"])) == len(goals["id"])
+    assert {row[8] for row in synthetic_data.goal_rows(goals)} == {"a@x", "b@x"}
+
+def test_cli_loads_until_today(tmp_path):
+    path = str(tmp_path / "loadtest.db")
+    assert generate_data.main(["--db", path, "--users", "3", "--days", "20", "--no-dev-user"]) == 0
+    # Continuar a série não gera dias depois de hoje
+    assert generate_data.main(["--db", path, "--users", "3", "--days", "20", "--no-dev-user"]) == 0
+
+    conn = sqlite3.connect(path)
+    count, last = conn.execute("SELECT COUNT(*), MAX(date) FROM progress_history").fetchone()
+    users = conn.execute("SELECT COUNT(DISTINCT created_by) FROM weekly_goals").fetchone()[0]
+    conn.close()
+    assert count == 20 and last == date.today().isoformat()
+    assert users == 3